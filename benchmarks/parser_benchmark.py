@@ -0,0 +1,305 @@
+# Import libraries
+import argparse
+import glob
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# Compares the bulk log parser in dashboard_data_parser.py with the per-line parser
+# it replaced, on synthetic logs shaped like honeypot traffic (a few IPs, usernames
+# and passwords make up most attempts). Both parsers read the same files, the script
+# exits non-zero if their dataframes differ or if the bulk parser is not at least
+# --target times faster. The time to build the compact (categorical and datetime)
+# dataframes and their memory footprint against the legacy object columns are
+# reported next to it.
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import dashboard_data_parser  # noqa: E402
+from log_generator import synthetic_lines  # noqa: E402
+
+
+# Legacy per-line parsers, copied unchanged from dashboard_data_parser.py
+def legacy_parse_creds_audits_log(creds_audits_log_file):
+    """Parse SSH credentials log file, including rotated files."""
+    try:
+        data = []
+        # Get base directory of the log file
+        base_dir = str(Path(creds_audits_log_file).parent)
+        # Use glob with correct pattern to find all rotated files
+        log_files = glob.glob(f"{base_dir}/audits.log*")
+
+        for log_file in log_files:
+            with open(log_file, "r") as file:
+                for line in file:
+                    # Parse log format: "timestamp Client IP connection attempt username: user, password: pass"
+                    match = re.match(
+                        r"(?:(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) )?Client (.*?) connection attempt username: (.*?), password: (.*?)$",
+                        line.strip(),
+                    )
+                    if match:
+                        timestamp, ip_address, username, password = match.groups()
+                        # Missing timestamp handling
+                        if not timestamp:
+                            timestamp = "No timestamp"
+                        data.append(
+                            {
+                                "timestamp": timestamp,
+                                "ip_address": ip_address,
+                                "username": username,
+                                "password": password,
+                            }
+                        )
+
+        return pd.DataFrame(data)
+    except Exception as e:
+        print(f"Error parsing credentials log: {e}")
+        return pd.DataFrame(columns=["timestamp", "ip_address", "username", "password"])
+
+
+def legacy_clean_command_text(command):
+    """Clean command text by removing b prefix and apostrophes"""
+    if isinstance(command, str):
+        # Remove b prefix and clean apostrophes
+        pattern = re.compile(r"^b'(.*)'$|^b\"(.*)\"$|^'(.*)'$|^\"(.*)\"$")
+        match = pattern.match(command)
+        if match:
+            # Return the first non-None group
+            return next(group for group in match.groups() if group is not None)
+    return command
+
+
+def legacy_parse_cmd_audits_log(cmd_audits_log_file):
+    """Parse SSH command log file, including rotated files."""
+    try:
+        data = []
+        base_dir = str(Path(cmd_audits_log_file).parent)
+        log_files = glob.glob(f"{base_dir}/cmd_audits.log*")
+
+        for log_file in log_files:
+            with open(log_file, "r") as file:
+                for line in file:
+                    # Parse log format: "timestamp Command: command Client: IP"
+                    match = re.match(
+                        r"(?:(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) )?Command: (.*?) Client: (.*?)$",
+                        line.strip(),
+                    )
+                    if match:
+                        timestamp, command, ip = match.groups()
+                        if not timestamp:
+                            timestamp = "No timestamp"
+                        # Clean the command text before adding to data
+                        cleaned_command = legacy_clean_command_text(command)
+                        data.append(
+                            {
+                                "timestamp": timestamp,
+                                "Command": cleaned_command,
+                                "Client": ip,
+                            }
+                        )
+
+        return pd.DataFrame(data)
+    except Exception as e:
+        print(f"Error parsing commands log: {e}")
+        return pd.DataFrame(columns=["timestamp", "Command", "Client"])
+
+
+def legacy_parse_http_url_audits_log(http_url_audits_log_file):
+    """Parse HTTP URL log file, including rotated files."""
+    try:
+        data = []
+        base_dir = str(Path(http_url_audits_log_file).parent)
+        log_files = glob.glob(f"{base_dir}/http_url_audits.log*")
+
+        for log_file in log_files:
+            with open(log_file, "r") as file:
+                for line in file:
+                    match = re.match(
+                        r"(.*?) Client (.*?) \| Method: (.*?) \| URL: (.*?) \| Args: (.*)$",
+                        line.strip(),
+                    )
+                    if match:
+                        timestamp, ip_address, method, url, args = match.groups()
+                        data.append(
+                            {
+                                "timestamp": timestamp,
+                                "ip_address": ip_address,
+                                "method": method,
+                                "url": url,
+                                "args": args,
+                            }
+                        )
+
+        return pd.DataFrame(data)
+    except Exception as e:
+        print(f"Error parsing HTTP URL log: {e}")
+        return pd.DataFrame(
+            columns=["timestamp", "ip_address", "method", "url", "args"]
+        )
+
+
+def legacy_parse_http_creds_audits_log(http_audits_log_file):
+    """Parse HTTP credentials log file, including rotated files."""
+    try:
+        data = []
+        base_dir = str(Path(http_audits_log_file).parent)
+        log_files = glob.glob(f"{base_dir}/http_audits.log*")
+
+        for log_file in log_files:
+            with open(log_file, "r") as file:
+                for line in file:
+                    match = re.match(
+                        r"(.*?) Client (.*?) attempted login with username: (.*?) and password: (.*?)$",
+                        line.strip(),
+                    )
+                    if match:
+                        timestamp, ip_address, username, password = match.groups()
+                        data.append(
+                            {
+                                "timestamp": timestamp,
+                                "ip_address": ip_address,
+                                "username": username,
+                                "password": password,
+                            }
+                        )
+        return pd.DataFrame(data)
+    except Exception as e:
+        print(f"Error parsing HTTP credentials log: {e}")
+        return pd.DataFrame(columns=["timestamp", "ip_address", "username", "password"])
+
+
+# Log name, legacy parser, log format and bulk parser of each log family
+FAMILIES = {
+    "ssh_creds": (
+        "audits.log",
+        legacy_parse_creds_audits_log,
+        dashboard_data_parser.SSH_CREDS_FORMAT,
+        dashboard_data_parser.parse_creds_audits_log,
+    ),
+    "ssh_cmds": (
+        "cmd_audits.log",
+        legacy_parse_cmd_audits_log,
+        dashboard_data_parser.SSH_CMD_FORMAT,
+        dashboard_data_parser.parse_cmd_audits_log,
+    ),
+    "http_url": (
+        "http_url_audits.log",
+        legacy_parse_http_url_audits_log,
+        dashboard_data_parser.HTTP_URL_FORMAT,
+        dashboard_data_parser.parse_http_url_audits_log,
+    ),
+    "http_creds": (
+        "http_audits.log",
+        legacy_parse_http_creds_audits_log,
+        dashboard_data_parser.HTTP_CREDS_FORMAT,
+        dashboard_data_parser.parse_http_creds_audits_log,
+    ),
+}
+
+
+def string_parser(log_format):
+    """Return a bulk parser producing string columns, like the legacy parsers."""
+    return lambda path: dashboard_data_parser.parse_log_files(
+        dashboard_data_parser.rotated_log_files(path), log_format, compact=False
+    )
+
+
+def downstream_time(dataframe, column):
+    """Return the time of a value_counts() and a sort by timestamp, as the dashboard does."""
+    start = time.perf_counter()
+    dataframe[column].value_counts()
+    dataframe.sort_values(by="timestamp", ascending=False)
+    return time.perf_counter() - start
+
+
+def memory_mb(dataframe):
+    """Return the memory used by a dataframe, including its strings, in MB."""
+    return dataframe.memory_usage(deep=True).sum() / 1e6
+
+
+def best_time(function, path, runs):
+    """Return the fastest of runs calls and the dataframe of the last one."""
+    # Untimed first call, so file caches and lazy imports do not count
+    function(path)
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        dataframe = function(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, dataframe
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Buzzpy log parser benchmark")
+    parser.add_argument(
+        "--lines", type=int, default=2000000, help="Synthetic lines per log"
+    )
+    parser.add_argument("--runs", type=int, default=2, help="Runs per parser")
+    parser.add_argument(
+        "--target",
+        type=float,
+        default=5.0,
+        help="Minimum speedup of the bulk parser over the legacy parser",
+    )
+    args = parser.parse_args()
+
+    failed = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for family, (
+            log_name,
+            legacy_parse,
+            log_format,
+            compact_parse,
+        ) in FAMILIES.items():
+            # One directory per family so the legacy globs only see their own log
+            log_file = Path(work_dir) / family / log_name
+            log_file.parent.mkdir()
+            log_file.write_text("\n".join(synthetic_lines(family, args.lines)) + "\n")
+
+            legacy_time, legacy_df = best_time(legacy_parse, log_file, args.runs)
+            bulk_time, bulk_df = best_time(
+                string_parser(log_format), log_file, args.runs
+            )
+            compact_time, compact_df = best_time(compact_parse, log_file, args.runs)
+            speedup = legacy_time / bulk_time
+
+            status = "OK"
+            if not legacy_df.equals(bulk_df.astype(object)) or not compact_df.equals(
+                dashboard_data_parser.compact_dataframe(legacy_df, log_format)
+            ):
+                status = "MISMATCH"
+                failed.append(family)
+            elif speedup < args.target:
+                status = "TOO SLOW"
+                failed.append(family)
+
+            print(
+                f"{family:<11} {len(bulk_df):>9} rows  legacy {legacy_time:7.2f} s "
+                f"({args.lines / legacy_time / 1e6:5.2f} M lines/s)  bulk {bulk_time:6.2f} s "
+                f"({args.lines / bulk_time / 1e6:5.2f} M lines/s)  {speedup:5.1f}x  {status}"
+            )
+            column = log_format["columns"][1]
+            print(
+                f"{'':<11} compact dtypes {compact_time:6.2f} s  "
+                f"memory {memory_mb(legacy_df):8.1f} MB object -> "
+                f"{memory_mb(compact_df):7.1f} MB compact  "
+                f"value_counts+sort {downstream_time(legacy_df, column):6.2f} s -> "
+                f"{downstream_time(compact_df, column):6.2f} s"
+            )
+
+    if failed:
+        print(f"[!] Results differ or below {args.target}x: {', '.join(failed)}")
+        sys.exit(1)
+    print(
+        f"[+] Bulk parser matches the legacy parser and is at least {args.target}x faster"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# Import libraries
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Measures the cold start cost of each buzzpy service using `python -X importtime`.
+# Every service is imported in a fresh interpreter and the script exits non-zero if
+# a honeypot goes over its time budget. Importing creates log files: the honeypots
+# create log_files in the working directory and the dashboard creates LOG_DIR, its
+# log files and its event store, so both point to an empty temporary directory
+# rather than the repository.
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+# Module imported by `buzzpy.py` when each service is selected
+SERVICES = {
+    "cli": "buzzpy",
+    "ssh": "ssh_honeypot",
+    "web": "web_honeypot",
+    "dashboard": "web_dashboard",
+}
+
+# Only the honeypots are held to the budget, the dashboard is reported for reference
+BUDGETED_SERVICES = ["cli", "ssh", "web"]
+
+
+def parse_importtime(stderr):
+    """Parse `-X importtime` output into (self_us, cumulative_us, module) tuples."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        try:
+            prefix, cumulative_us, module = line.split("|")
+            self_us = prefix.replace("import time:", "")
+            rows.append((int(self_us), int(cumulative_us), module.strip()))
+        except ValueError:
+            continue
+    return rows
+
+
+def measure_service(module, runs=5):
+    """Import a module in fresh interpreters, return best wall time and importtime rows."""
+    code = f"import sys; sys.path.insert(0, {str(REPO_DIR)!r}); import {module}"
+    best_wall = None
+    best_rows = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", code],
+                cwd=work_dir,
+                capture_output=True,
+                text=True,
+                env={
+                    **os.environ,
+                    "PYTHONDONTWRITEBYTECODE": "1",
+                    "LOG_DIR": str(Path(work_dir) / "log_files"),
+                    "EVENT_STORE": str(Path(work_dir) / "log_files" / "events.db"),
+                },
+            )
+            wall = time.perf_counter() - start
+            if result.returncode != 0:
+                raise RuntimeError(
+                    f"Importing {module} failed:\n{result.stderr.splitlines()[-1]}"
+                )
+            if best_wall is None or wall < best_wall:
+                best_wall = wall
+                best_rows = parse_importtime(result.stderr)
+    return best_wall, best_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Buzzpy startup time benchmark")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=0.5,
+        help="Maximum cold start in seconds for the CLI and honeypots",
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Runs per service")
+    parser.add_argument(
+        "--top", type=int, default=8, help="Slowest imports to show per service"
+    )
+    args = parser.parse_args()
+
+    over_budget = []
+    for service, module in SERVICES.items():
+        try:
+            wall, rows = measure_service(module, runs=args.runs)
+        except RuntimeError as e:
+            print(f"[ERROR] {e}")
+            over_budget.append(service)
+            continue
+
+        # Modules that cost the most on their own, excluding what they import
+        slowest = sorted(rows, reverse=True)
+        budgeted = service in BUDGETED_SERVICES
+        status = ""
+        if budgeted:
+            status = "OK" if wall <= args.budget else "OVER BUDGET"
+            if wall > args.budget:
+                over_budget.append(service)
+
+        print(f"{service:<10} import {module:<14} {wall * 1000:8.1f} ms  {status}")
+        for self_us, cumulative_us, name in slowest[: args.top]:
+            print(
+                f"    {self_us / 1000:8.1f} ms self {cumulative_us / 1000:8.1f} ms total  {name}"
+            )
+
+    if over_budget:
+        print(f"[!] Over the {args.budget}s budget: {', '.join(over_budget)}")
+        sys.exit(1)
+    print(f"[+] All honeypot services start within {args.budget}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,16 @@
 # Import Libraries
 import argparse
-from ssh_honeypot import honeypot
-from web_honeypot import web_honeypot
-from web_dashboard import app as dashboard_app
+
+# Service modules are imported inside their run_* function so that starting one
+# service does not pay for the dependencies (and import side effects) of the others.
 
 
 def run_ssh_honeypot(address, port, username, password, demo_mode):
     """Run SSH honeypot"""
     print("[!] Running SSH honeypot...")
     try:
+        from ssh_honeypot import honeypot
+
         honeypot(address, port, username, password, demo_mode=demo_mode)
     except Exception as e:
         print(f"SSH honeypot error: {e}")
@@ -18,6 +20,8 @@ def run_web_honeypot(address, port, username, password, demo_mode):
     """Run Web honeypot"""
     print("[!] Running web honeypot...")
     try:
+        from web_honeypot import web_honeypot
+
         web_honeypot(address, port, username, password, demo_mode=demo_mode)
     except Exception as e:
         print(f"Web honeypot error: {e}")
@@ -27,17 +31,49 @@ def run_dashboard(host, port):
     """Run the dashboard"""
     print("[+] Starting dashboard...")
     try:
+        from web_dashboard import app as dashboard_app
+
         dashboard_app.run(debug=False, host=host, port=port)
     except Exception as e:
         print(f"Dashboard error: {e}")
 
 
+def run_compact():
+    """Archive the closed rotation segments of the dashboard's logs"""
+    print("[+] Compacting rotated logs...")
+    try:
+        import os
+        from pathlib import Path
+
+        from dotenv import load_dotenv
+
+        load_dotenv(dotenv_path=Path("public.env"))
+        # Same locations as the dashboard, see web_dashboard.py
+        log_dir = Path(os.getenv("LOG_DIR", Path(__file__).parent / "log_files"))
+        store_path = os.getenv("EVENT_STORE", str(log_dir / "events.db"))
+
+        from log_archive import compact_logs
+
+        archived = compact_logs(log_dir, store_path)
+        for segment, archive, rows in archived:
+            print(f"[+] {segment} -> {archive} ({rows} events)")
+        print(f"[+] Archived {len(archived)} segments")
+    except Exception as e:
+        print(f"Compaction error: {e}")
+
+
 # Argument Parsing
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Buzzpy - A configurable SSH and Web honeypot"
     )
 
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=["compact"],
+        help="compact: archive closed log rotations into Parquet files",
+    )
     parser.add_argument("-a", "--address", type=str, help="IP address to bind")
     parser.add_argument("-p", "--port", type=int, help="Port number")
     parser.add_argument(
@@ -53,7 +89,7 @@ if __name__ == "__main__":
         help="Run in demo mode with obvious honeypot strings",
     )
 
-    service_group = parser.add_mutually_exclusive_group(required=True)
+    service_group = parser.add_mutually_exclusive_group()
     service_group.add_argument(
         "-s", "--ssh", action="store_true", help="Run SSH honeypot"
     )
@@ -65,9 +101,15 @@ if __name__ == "__main__":
     )
 
     args = parser.parse_args()
+    # A service or the compact command, not both
+    if bool(args.command) == any([args.ssh, args.web, args.dashboard]):
+        parser.error("one of compact, -s/--ssh, -w/--web or -D/--dashboard is required")
 
     try:
-        if args.ssh:
+        if args.command == "compact":
+            run_compact()
+
+        elif args.ssh:
             if not all([args.address, args.port, args.username, args.password]):
                 print(
                     "Error: SSH honeypot requires address, port, username, and password"
@@ -1,10 +1,43 @@
 # Import library dependencies.
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 import re
-import requests
+import sqlite3
 import glob
+import gzip
+import mmap
+import multiprocessing
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack
 from pathlib import Path
-from functools import lru_cache
+
+# Import project python file dependencies.
+from geoip import (
+    DEFAULT_CACHE_TTL,
+    DEFAULT_NEGATIVE_CACHE_TTL,
+    EnrichmentClient,
+    GeoCache,
+    GeoIPDatabase,
+    PrefixTable,
+    address_key,
+    load_database,
+    load_prefixes,
+    network_label,
+)
+
+try:
+    import zstandard
+except ImportError:  # .zst segments are skipped without it
+    zstandard = None
 
 # This file parses the various log files. The log files have different "formats" or information provided, so needed to create unique parsers for each.
 # Each of these parsers takes the log file, gathers the specific information provided in the log, then returns the data in columns/rows Pandas dataframe type.
@@ -15,153 +48,1238 @@ cmd_audits_log_file = "log_files/ssh_cmd_audits.log"
 http_url_audits_log_file = "log_files/http_url_audits.log"
 
 
+# Log line formats written by ssh_honeypot.py and web_honeypot.py, compiled once.
+SSH_CREDS_PATTERN = re.compile(
+    r"(?:(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) )?Client (.*?) connection attempt username: (.*?), password: (.*?)$"
+)
+SSH_CMD_PATTERN = re.compile(
+    r"(?:(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) )?Command: (.*?) Client: (.*?)$"
+)
+HTTP_URL_PATTERN = re.compile(
+    r"(.*?) Client (.*?) \| Method: (.*?) \| URL: (.*?) \| Args: (.*)$"
+)
+HTTP_CREDS_PATTERN = re.compile(
+    r"(.*?) Client (.*?) attempted login with username: (.*?) and password: (.*?)$"
+)
+COMMAND_QUOTES_PATTERN = re.compile(r"^b'(.*)'$|^b\"(.*)\"$|^'(.*)'$|^\"(.*)\"$")
+
+# Columns of the dataframe each parser returns
+SSH_CREDS_COLUMNS = ["timestamp", "ip_address", "username", "password"]
+SSH_CMD_COLUMNS = ["timestamp", "Command", "Client"]
+HTTP_URL_COLUMNS = ["timestamp", "ip_address", "method", "url", "args"]
+HTTP_CREDS_COLUMNS = ["timestamp", "ip_address", "username", "password"]
+
+# Every line is a timestamp followed by fields split by fixed separators. Each lazy
+# (.*?) group in the patterns above ends at the first occurrence of the next
+# separator, so the bulk parser finds the fields by searching for the separators.
+# The SSH lines may start without a timestamp, the HTTP lines take whatever comes
+# before the first separator as the timestamp.
+SSH_CREDS_FORMAT = {
+    "pattern": SSH_CREDS_PATTERN,
+    "columns": SSH_CREDS_COLUMNS,
+    "optional_timestamp": True,
+    "separators": [b"Client ", b" connection attempt username: ", b", password: "],
+    "categorical": ["ip_address", "username", "password"],
+}
+SSH_CMD_FORMAT = {
+    "pattern": SSH_CMD_PATTERN,
+    "columns": SSH_CMD_COLUMNS,
+    "optional_timestamp": True,
+    "separators": [b"Command: ", b" Client: "],
+    # Commands are logged as repr() of the received bytes
+    "unquote": "Command",
+    "categorical": ["Command", "Client"],
+}
+HTTP_URL_FORMAT = {
+    "pattern": HTTP_URL_PATTERN,
+    "columns": HTTP_URL_COLUMNS,
+    "optional_timestamp": False,
+    "separators": [b" Client ", b" | Method: ", b" | URL: ", b" | Args: "],
+    "categorical": ["ip_address", "method", "url", "args"],
+}
+HTTP_CREDS_FORMAT = {
+    "pattern": HTTP_CREDS_PATTERN,
+    "columns": HTTP_CREDS_COLUMNS,
+    "optional_timestamp": False,
+    "separators": [
+        b" Client ",
+        b" attempted login with username: ",
+        b" and password: ",
+    ],
+    "categorical": ["ip_address", "username", "password"],
+}
+
+# First day (days since 1970-01-01) and length of every month of the years 0 to 9999,
+# year 0 is not a valid date for strptime() so its months are empty
+MONTH_START_DAYS = (
+    np.arange(-1970 * 12, (10000 - 1970) * 12 + 1)
+    .astype("datetime64[M]")
+    .astype("datetime64[D]")
+    .astype(np.int64)
+)
+MONTH_LENGTHS = np.diff(MONTH_START_DAYS)
+MONTH_LENGTHS[:12] = 0
+
+# Lines are parsed in blocks so the intermediate numpy arrays stay in the CPU cache
+BULK_BLOCK_LINES = 65536
+BULK_SCAN_BYTES = 1 << 20
+
+# Lines starting in the last bytes of the data are parsed with the regex
+SEARCH_MARGIN = 128
+
+# Bytes are compared 8 at a time by reading unaligned little-endian 64-bit words
+WORD = 8
+LOW_BITS = np.uint64(0x0101010101010101)
+HIGH_BITS = np.uint64(0x8080808080808080)
+ZERO_BYTES = np.uint64(0x3030303030303030)
+# BYTE_MASKS[n] keeps the first n bytes of a word
+BYTE_MASKS = np.array([(1 << (8 * n)) - 1 for n in range(WORD + 1)], dtype=np.uint64)
+# "0" stands for any ASCII digit
+TIMESTAMP_SHAPE = b"0000-00-00 00:00:00,000 "
+TIMESTAMP_LENGTH = len(TIMESTAMP_SHAPE) - 1
+# Bytes str.strip() may remove: ASCII whitespace and anything non-ASCII
+STRIPPED_BYTES = np.zeros(256, dtype=bool)
+STRIPPED_BYTES[[9, 10, 11, 12, 13, 28, 29, 30, 31, 32]] = True
+STRIPPED_BYTES[128:] = True
+
+# Logs are parsed in worker processes only when there is enough new data to make
+# up for handing it over, each task gets at most PARSE_TASK_BYTES of whole lines
+# and only one task per worker is in flight at a time.
+PARALLEL_MIN_BYTES = 16 << 20
+PARSE_TASK_BYTES = 32 << 20
+
+
+# Compressed rotation segments, opened as streams of their decompressed bytes
+COMPRESSED_SUFFIXES = ["gz", "zst"]
+
+# Closed rotation segments compacted by `buzzpy.py compact` (see log_archive.py)
+# are kept as Parquet files in this directory next to the logs, their rows have
+# the string columns of the log format and an event_time timestamp column
+ARCHIVE_DIR_NAME = "archive"
+
+
 # Handling rotating files
-def parse_creds_audits_log(creds_audits_log_file):
-    """Parse SSH credentials log file, including rotated files."""
-    try:
-        data = []
-        # Get base directory of the log file
-        base_dir = str(Path(creds_audits_log_file).parent)
-        # Use glob with correct pattern to find all rotated files
-        log_files = glob.glob(f"{base_dir}/audits.log*")
-
-        for log_file in log_files:
-            with open(log_file, "r") as file:
-                for line in file:
-                    # Parse log format: "timestamp Client IP connection attempt username: user, password: pass"
-                    match = re.match(
-                        r"(?:(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) )?Client (.*?) connection attempt username: (.*?), password: (.*?)$",
-                        line.strip(),
-                    )
-                    if match:
-                        timestamp, ip_address, username, password = match.groups()
-                        # Missing timestamp handling
-                        if not timestamp:
-                            timestamp = "No timestamp"
-                        data.append(
-                            {
-                                "timestamp": timestamp,
-                                "ip_address": ip_address,
-                                "username": username,
-                                "password": password,
-                            }
-                        )
-
-        return pd.DataFrame(data)
-    except Exception as e:
-        print(f"Error parsing credentials log: {e}")
-        return pd.DataFrame(columns=["timestamp", "ip_address", "username", "password"])
+def rotation_index(log_file):
+    """Return the rotation number of a log file, 0 for the live file (audits.log.3.gz -> 3)."""
+    suffix = Path(log_file).name.split(".")
+    if suffix[-1] in COMPRESSED_SUFFIXES:
+        suffix.pop()
+    return int(suffix[-1]) if suffix[-1].isdigit() else 0
+
+
+def rotated_log_files(log_file_path):
+    """Return a log file and its rotated copies ordered oldest first.
+
+    Only the live file and its rotation segments (audits.log.N, optionally
+    compressed as audits.log.N.gz or audits.log.N.zst) are returned, other files
+    starting with the same name such as audits.log.bak are not.
+    """
+    path = Path(log_file_path)
+    segment = re.compile(
+        re.escape(path.name)
+        + r"(\.[0-9]+)?(\.(?:"
+        + "|".join(COMPRESSED_SUFFIXES)
+        + r"))?"
+    )
+    log_files = [
+        log_file
+        for log_file in glob.glob(f"{glob.escape(str(path))}*")
+        if segment.fullmatch(Path(log_file).name)
+        # A compressed live file is not a rotation segment
+        and (rotation_index(log_file) or not is_compressed(log_file))
+    ]
+    # RotatingFileHandler renames audits.log -> audits.log.1 -> audits.log.2 ...
+    # so the highest number holds the oldest lines and the live file the newest.
+    # A segment being compressed exists twice for a moment, its lines are only
+    # read once because LogTail recognises them by their first line.
+    return sorted(log_files, key=lambda f: (rotation_index(f), f), reverse=True)
+
+
+def archive_dir(log_file_path):
+    """Return the directory of a log's Parquet archives."""
+    return Path(log_file_path).parent / ARCHIVE_DIR_NAME
+
+
+def archived_log_files(log_file_path):
+    """Return the Parquet archives of a log's compacted segments, oldest first.
+
+    Archives are named audits.log.<modification time>.<source id>.parquet, the
+    zero padded modification time of the segment they were made from keeps
+    them in the order the segments were written.
+    """
+    pattern = archive_dir(log_file_path) / Path(log_file_path).name
+    return sorted(glob.glob(f"{glob.escape(str(pattern))}.*.parquet"))
+
+
+def archive_time_range(archive):
+    """Return the first and last event_time of an archive in milliseconds, from its metadata."""
+    metadata = pq.read_schema(archive).metadata or {}
+    return tuple(
+        int(metadata[key]) if metadata.get(key) else None
+        for key in (b"min_event_time", b"max_event_time")
+    )
+
+
+def read_archives(archives, log_format, columns=None, start=None, end=None):
+    """Read rows of Parquet archives as one Arrow string array per column.
+
+    Only the given columns (default all of the log format) are read. With start
+    and/or end (milliseconds since 1970) only the events in [start, end) are
+    returned: archives whose min/max event_time is outside the range are not
+    opened and the filter skips the row groups whose statistics are outside it,
+    so a narrow range reads a small part of the history.
+    """
+    columns = columns or log_format["columns"]
+    if start is not None or end is not None:
+        selected = []
+        for archive in archives:
+            first, last = archive_time_range(archive)
+            if first is None or (start is not None and last < start):
+                continue
+            if end is not None and first >= end:
+                continue
+            selected.append(archive)
+        archives = selected
+    if not archives:
+        return {column: pa.array([], type=pa.large_string()) for column in columns}
+
+    condition = None
+    event_time = ds.field("event_time")
+    if start is not None:
+        condition = event_time >= pa.scalar(start, type=pa.timestamp("ms"))
+    if end is not None:
+        before_end = event_time < pa.scalar(end, type=pa.timestamp("ms"))
+        condition = before_end if condition is None else condition & before_end
+    table = ds.dataset(archives, format="parquet").to_table(
+        columns=columns, filter=condition
+    )
+    return {
+        column: table[column].combine_chunks().cast(pa.large_string())
+        for column in columns
+    }
+
+
+def is_compressed(log_file):
+    """Return whether a log file is a compressed rotation segment."""
+    return Path(log_file).suffix.lstrip(".") in COMPRESSED_SUFFIXES
+
+
+def open_log(log_file):
+    """Open a log file for reading bytes, decompressing .gz and .zst segments as they are read."""
+    if Path(log_file).suffix == ".gz":
+        return gzip.open(log_file, "rb")
+    if Path(log_file).suffix == ".zst":
+        if zstandard is None:
+            raise OSError(f"zstandard is not installed, cannot read {log_file}")
+        return zstandard.ZstdDecompressor().stream_reader(open(log_file, "rb"))
+    return open(log_file, "rb")
+
+
+def read_log_chunks(log_files):
+    """Return the contents of each log file.
+
+    Uncompressed rotation segments are memory mapped and returned as
+    memoryviews, so they are parsed from the page cache (shared with any other
+    process reading the logs) without being copied into this process. The live
+    file is read instead: truncating a mapped file kills the process reading
+    the mapping with SIGBUS, and the live file may be truncated (copytruncate)
+    at any time.
+    """
+    chunks = []
+    for log_file in log_files:
+        with open_log(log_file) as file:
+            if is_compressed(log_file) or not rotation_index(log_file):
+                chunks.append(file.read())
+            elif os.fstat(file.fileno()).st_size:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                chunks.append(memoryview(mapped))
+    return chunks
 
 
 def clean_command_text(command):
     """Clean command text by removing b prefix and apostrophes"""
     if isinstance(command, str):
         # Remove b prefix and clean apostrophes
-        pattern = re.compile(r"^b'(.*)'$|^b\"(.*)\"$|^'(.*)'$|^\"(.*)\"$")
-        match = pattern.match(command)
+        match = COMMAND_QUOTES_PATTERN.match(command)
         if match:
             # Return the first non-None group
             return next(group for group in match.groups() if group is not None)
     return command
 
 
+def parse_line(line, log_format):
+    """Parse one log line with the format's regex, return the field values or None."""
+    match = log_format["pattern"].match(line.strip())
+    if not match:
+        return None
+    values = list(match.groups())
+    # Missing timestamp handling
+    if log_format["optional_timestamp"] and not values[0]:
+        values[0] = "No timestamp"
+    if "unquote" in log_format:
+        index = log_format["columns"].index(log_format["unquote"])
+        values[index] = clean_command_text(values[index])
+    return values
+
+
+def word_view(data):
+    """Return a uint64 array whose element i holds the 8 bytes of data starting at i."""
+    count = max(len(data) - WORD + 1, 0)
+    return np.ndarray((count,), dtype="<u8", buffer=data, strides=(1,))
+
+
+def literal_word(literal):
+    """Pack up to 8 bytes into a word comparable with word_view() elements."""
+    return np.uint64(int.from_bytes(literal.ljust(WORD, b"\0"), "little"))
+
+
+def bytes_equal_at(words, positions, literal):
+    """Return a mask of the positions where literal starts."""
+    equal = np.ones(len(positions), dtype=bool)
+    for i in range(0, len(literal), WORD):
+        part = literal[i : i + WORD]
+        word = words[positions + i] & BYTE_MASKS[len(part)]
+        equal &= word == literal_word(part)
+    return equal
+
+
+def word_matches_shape(word, part):
+    """Return a mask of the words matching part, where "0" stands for any ASCII digit."""
+    # A digit is 0x3X and stays 0x3X after adding 6, other bytes must be equal
+    high = literal_word(bytes(0xF0 if byte == 0x30 else 0xFF for byte in part))
+    six = literal_word(bytes(6 if byte == 0x30 else 0 for byte in part))
+    expected = literal_word(part)
+    return ((word & high) == expected) & (((word + six) & high) == expected)
+
+
+def timestamp_at(words, positions):
+    """Return a mask of the positions where a "YYYY-MM-DD HH:MM:SS,mmm " timestamp starts."""
+    matches = np.ones(len(positions), dtype=bool)
+    for i in range(0, len(TIMESTAMP_SHAPE), WORD):
+        part = TIMESTAMP_SHAPE[i : i + WORD]
+        matches &= word_matches_shape(words[positions + i], part)
+    return matches
+
+
+def lowest_byte(flags):
+    """Return the index of the lowest byte with its high bit set in each word, 8 if none."""
+    return np.bitwise_count((flags & (~flags + np.uint64(1))) - np.uint64(1)) >> 3
+
+
+def find_first(words, line_ends, starts, literal, anchor=0):
+    """Return the position of the first literal at or after each start that ends
+    before the line end, or -1 where the line does not contain it.
+
+    Lines are scanned 16 bytes at a time for literal[anchor], so picking a byte that
+    is rare in the logs leaves few candidates to compare with the whole literal.
+    """
+    found = np.full(len(starts), -1, dtype=np.int64)
+    last_anchors = line_ends - len(literal) + anchor
+    rows = np.flatnonzero(starts + anchor <= last_anchors)
+    positions = starts[rows] + anchor
+    anchor_bytes = LOW_BITS * np.uint64(literal[anchor])
+    while len(rows):
+        # Flag the bytes equal to the anchor byte (exact for the lowest one)
+        first = words[positions] ^ anchor_bytes
+        second = words[positions + WORD] ^ anchor_bytes
+        first = (first - LOW_BITS) & ~first & HIGH_BITS
+        second = (second - LOW_BITS) & ~second & HIGH_BITS
+        # Move to the lowest flagged byte, or 16 bytes on when there is none
+        offsets = lowest_byte(first)
+        offsets += (offsets >> 3) * lowest_byte(second)
+        hit = offsets < 2 * WORD
+        positions += offsets
+        searching = positions <= last_anchors[rows]
+        candidates = np.flatnonzero(searching & hit)
+        literal_starts = positions[candidates] - anchor
+        matched = candidates[bytes_equal_at(words, literal_starts, literal)]
+        found[rows[matched]] = positions[matched] - anchor
+        searching[matched] = False
+        positions[candidates] += 1
+        rows, positions = rows[searching], positions[searching]
+    return found
+
+
+def rarest_byte(literal, byte_counts):
+    """Return the index of the literal byte that occurs least in the data."""
+    return min(range(len(literal)), key=lambda index: byte_counts[literal[index]])
+
+
+def unquote_bounds(buffer, starts, ends):
+    """Narrow field bounds the way clean_command_text() strips b'...' and '...'."""
+    size = ends - starts
+    first = buffer[starts]
+    second = buffer[np.minimum(starts + 1, len(buffer) - 1)]
+    last = buffer[np.maximum(ends - 1, 0)]
+    quote = (last == ord("'")) | (last == ord('"'))
+    prefixed = (size >= 3) & (first == ord("b")) & (second == last) & quote
+    quoted = (size >= 2) & ~prefixed & (first == last) & quote
+    starts = starts + np.where(prefixed, 2, np.where(quoted, 1, 0))
+    ends = ends - (prefixed | quoted)
+    return starts, ends
+
+
+def string_array(data_buffer, starts, ends):
+    """Copy the byte ranges [starts, ends) of the data into an Arrow string array."""
+    count = len(starts)
+    if count == 0:
+        return pa.array([], type=pa.large_string())
+    # The ranges and the gaps between them are consecutive strings of one array
+    offsets = np.empty(2 * count, dtype=np.int64)
+    offsets[0::2] = starts
+    offsets[1::2] = ends
+    segments = pa.LargeStringArray.from_buffers(
+        2 * count - 1, pa.py_buffer(offsets), data_buffer
+    )
+    return segments.take(pa.array(np.arange(0, 2 * count - 1, 2)))
+
+
+def insert_rows(strings, positions, values):
+    """Return the strings with values inserted before the given (sorted) positions."""
+    values = pa.array(values, type=pa.large_string())
+    pieces = []
+    previous = 0
+    for index, position in enumerate(positions):
+        pieces.append(strings.slice(previous, position - previous))
+        pieces.append(values.slice(index, 1))
+        previous = position
+    pieces.append(strings.slice(previous))
+    return pa.concat_arrays(pieces)
+
+
+def string_dataframe(arrays, columns):
+    """Build a dataframe of pandas string columns backed by the Arrow arrays."""
+    return pd.DataFrame(
+        {column: pd.arrays.ArrowStringArray(arrays[column]) for column in columns}
+    )
+
+
+def parse_timestamps(strings):
+    """Parse "YYYY-MM-DD HH:MM:SS,mmm" Arrow strings into datetime64[ms], NaT if malformed."""
+    strings = strings.cast(pa.large_string())
+    timestamps = np.full(len(strings), np.datetime64("NaT"), dtype="datetime64[ms]")
+    _, offsets, data = strings.buffers()
+    if data is None:
+        return timestamps
+    offsets = np.frombuffer(offsets, dtype=np.int64)
+    offsets = offsets[strings.offset : strings.offset + len(strings) + 1]
+    rows = np.flatnonzero(np.diff(offsets) == TIMESTAMP_LENGTH)
+    if strings.null_count:
+        rows = rows[strings.is_valid().to_numpy(zero_copy_only=False)[rows]]
+
+    # "YYYY-MM-", "DD HH:MM" and "M:SS,mmm", the digits reduced to their value
+    words = word_view(data)
+    starts = offsets[rows]
+    valid = np.ones(len(rows), dtype=bool)
+    pairs = []
+    for first in (0, WORD, TIMESTAMP_LENGTH - WORD):
+        part = TIMESTAMP_SHAPE[first : first + WORD]
+        word = words[starts + first]
+        valid &= word_matches_shape(word, part)
+        word = (word ^ ZERO_BYTES) & literal_word(
+            bytes(0x0F if byte == 0x30 else 0 for byte in part)
+        )
+        # Byte i becomes the two digit number of bytes i and i + 1
+        pairs.append((word * np.uint64(10) + (word >> np.uint64(8)), word))
+
+    def pair(index, byte):
+        return ((pairs[index][0] >> np.uint64(8 * byte)) & np.uint64(0xFF)).astype(
+            np.int64
+        )
+
+    year = pair(0, 0) * 100 + pair(0, 2)
+    month, day = pair(0, 5), pair(1, 0)
+    hour, minute, second = pair(1, 3), pair(1, 6), pair(2, 2)
+    millisecond = pair(2, 5) * 10 + (pairs[2][1] >> np.uint64(56)).astype(np.int64)
+
+    # Days since 1970 of the first day of each month, from the table of all months
+    month_index = year * 12 + np.clip(month - 1, 0, 11)
+    days = MONTH_START_DAYS[month_index] + day - 1
+    # Reject out of range fields instead of letting them carry over
+    valid &= (month >= 1) & (month <= 12) & (day >= 1)
+    valid &= day <= MONTH_LENGTHS[month_index]
+    valid &= (hour < 24) & (minute < 60) & (second < 60)
+    milliseconds = (
+        ((days * 24 + hour) * 60 + minute) * 60 + second
+    ) * 1000 + millisecond
+    timestamps[rows[valid]] = milliseconds[valid].astype("datetime64[ms]")
+    return timestamps
+
+
+def local_utc_offset(seconds, local=True):
+    """Return the UTC offset in seconds of the local time zone at a time, given
+    in seconds since 1970 of the local wall clock (or of UTC without local)."""
+    try:
+        if not local:
+            return time.localtime(seconds).tm_gmtoff
+        return seconds - int(time.mktime(time.gmtime(seconds)[:8] + (-1,)))
+    except (OverflowError, ValueError, OSError):
+        return 0
+
+
+def shift_time_zone(timestamps, to_utc):
+    """Convert datetime64[ms] timestamps from the local time zone to UTC, or
+    from UTC to the local time zone, with the offset each one had (daylight
+    saving time included). NaT stays NaT."""
+    timestamps = np.asarray(timestamps, dtype="datetime64[ms]").copy()
+    valid = ~np.isnat(timestamps)
+    milliseconds = timestamps[valid].astype(np.int64)
+    # Offsets only change on the hour, each hour is looked up once
+    hours, inverse = np.unique(milliseconds // 3_600_000, return_inverse=True)
+    offsets = np.array(
+        [local_utc_offset(int(hour) * 3600, local=to_utc) for hour in hours],
+        dtype=np.int64,
+    )
+    shift = offsets[inverse.reshape(-1)] * 1000
+    milliseconds = milliseconds - shift if to_utc else milliseconds + shift
+    timestamps[valid] = milliseconds.astype("datetime64[ms]")
+    return timestamps
+
+
+def utc_timestamps(strings):
+    """parse_timestamps() of log timestamps, which the honeypots write in local
+    time (logging's asctime), converted to UTC like time.time()."""
+    return shift_time_zone(parse_timestamps(strings), to_utc=True)
+
+
+def sorted_categorical(strings):
+    """Dictionary-encode Arrow strings into a pandas Categorical with sorted categories.
+
+    Sorted categories keep sort_values() in alphabetical order, as with strings.
+    """
+    encoded = strings.dictionary_encode()
+    order = pc.array_sort_indices(encoded.dictionary).to_numpy()
+    ranks = np.empty(len(order), dtype=np.int32)
+    ranks[order] = np.arange(len(order), dtype=np.int32)
+    codes = ranks[encoded.indices.to_numpy(zero_copy_only=False)]
+    categories = pd.Index(encoded.dictionary.take(order).to_pylist(), dtype=object)
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def log_dataframe(arrays, log_format):
+    """Build a compact dataframe from parsed Arrow string arrays.
+
+    The timestamp column becomes datetime64[ms] (NaT for "No timestamp" and
+    other malformed values), the format's high-repetition columns become
+    categoricals and the other columns stay Arrow-backed strings.
+    """
+    columns = {}
+    for column in log_format["columns"]:
+        strings = arrays[column]
+        if isinstance(strings, pa.ChunkedArray):
+            strings = strings.combine_chunks()
+        if column == "timestamp":
+            columns[column] = parse_timestamps(strings)
+        elif column in log_format["categorical"]:
+            columns[column] = sorted_categorical(strings)
+        else:
+            columns[column] = pd.arrays.ArrowStringArray(strings)
+    return pd.DataFrame(columns)
+
+
+def compact_dataframe(dataframe, log_format):
+    """Convert a dataframe of string columns into log_dataframe() dtypes."""
+    return log_dataframe(
+        {
+            column: pa.array(dataframe[column], type=pa.large_string())
+            for column in log_format["columns"]
+        },
+        log_format,
+    )
+
+
+def newline_positions(buffer):
+    """Return the positions of the newlines in a uint8 array."""
+    return np.concatenate(
+        [np.empty(0, dtype=np.int64)]
+        + [
+            np.flatnonzero(buffer[start : start + BULK_SCAN_BYTES] == 10) + start
+            for start in range(0, len(buffer), BULK_SCAN_BYTES)
+        ]
+    )
+
+
+def locate_fields(buffer, words, starts, ends, log_format, byte_counts):
+    """Find the fields of a block of lines.
+
+    Returns the field bounds, a mask of the parsed lines, a mask of the lines without
+    a timestamp and a mask of the lines that must go through parse_line() because
+    the byte search cannot decide them (whitespace or non-ASCII at either end).
+    """
+    separators = log_format["separators"]
+    not_empty = ends > starts
+    slow = not_empty & (
+        STRIPPED_BYTES[buffer[starts]] | STRIPPED_BYTES[buffer[np.maximum(ends - 1, 0)]]
+    )
+
+    bounds = []
+    if log_format["optional_timestamp"]:
+        has_timestamp = (ends - starts > TIMESTAMP_LENGTH) & timestamp_at(words, starts)
+        # \d also matches non-ASCII digits
+        rows = np.flatnonzero(~has_timestamp)
+        head = words[starts[rows]] | words[starts[rows] + WORD]
+        head |= words[starts[rows] + 2 * WORD]
+        slow[rows[(head & HIGH_BITS) != 0]] = True
+        bounds.append(
+            (starts, np.where(has_timestamp, starts + TIMESTAMP_LENGTH, starts))
+        )
+        cursor = np.where(has_timestamp, starts + TIMESTAMP_LENGTH + 1, starts)
+        parsed = (cursor + len(separators[0]) <= ends) & bytes_equal_at(
+            words, cursor, separators[0]
+        )
+        cursor = cursor + len(separators[0])
+        separators = separators[1:]
+        no_timestamp = ~has_timestamp
+    else:
+        # The logging timestamp cannot contain " Client ", so the first separator is
+        # only searched for on lines where it does not follow a timestamp
+        first = separators[0]
+        after_timestamp = starts + TIMESTAMP_LENGTH
+        follows = (after_timestamp + len(first) <= ends) & timestamp_at(words, starts)
+        follows &= bytes_equal_at(words, after_timestamp, first)
+        found = np.where(follows, after_timestamp, -1)
+        others = np.flatnonzero(~follows)
+        found[others] = find_first(
+            words,
+            ends[others],
+            starts[others],
+            first,
+            rarest_byte(first, byte_counts),
+        )
+        parsed = found >= 0
+        bounds.append((starts, found))
+        cursor = found + len(first)
+        separators = separators[1:]
+        no_timestamp = np.zeros(len(starts), dtype=bool)
+
+    for separator in separators:
+        anchor = rarest_byte(separator, byte_counts)
+        found = find_first(
+            words, ends, np.where(parsed, cursor, ends), separator, anchor
+        )
+        parsed &= found >= 0
+        bounds.append((cursor, found))
+        cursor = found + len(separator)
+    bounds.append((cursor, ends))
+
+    if "unquote" in log_format:
+        index = log_format["columns"].index(log_format["unquote"])
+        field_starts, field_ends = bounds[index]
+        # Bounds of lines that did not parse may point anywhere
+        bounds[index] = unquote_bounds(
+            buffer,
+            np.where(parsed, field_starts, 0),
+            np.where(parsed, field_ends, 0),
+        )
+    return bounds, parsed & ~slow, no_timestamp, slow
+
+
+def contains_byte(data, byte):
+    """Return whether a bytes-like object (bytes, memoryview, mmap) holds a byte value."""
+    if isinstance(data, bytes):
+        return bytes([byte]) in data
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    return any(
+        (buffer[start : start + BULK_SCAN_BYTES] == byte).any()
+        for start in range(0, len(buffer), BULK_SCAN_BYTES)
+    )
+
+
+def is_utf8(data):
+    """Return whether a bytes-like object is valid UTF-8, without copying it."""
+    if isinstance(data, bytes) and data.isascii():
+        return True
+    offsets = np.array([0, len(data)], dtype=np.int64)
+    text = pa.LargeStringArray.from_buffers(
+        1, pa.py_buffer(offsets), pa.py_buffer(data)
+    )
+    try:
+        text.validate(full=True)
+    except pa.ArrowInvalid:
+        return False
+    return True
+
+
+def parse_log_columns(data, log_format):
+    """Parse log lines into one Arrow string array per column.
+
+    data is any bytes-like object, a memoryview of a memory mapped log is scanned
+    in place and only the bytes of the parsed fields are copied.
+    """
+    columns = log_format["columns"]
+    # Text mode reading also ended lines at \r and \r\n
+    if contains_byte(data, 13):
+        data = bytes(data).replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    if not is_utf8(data):
+        data = bytes(data).decode("utf-8", errors="replace").encode("utf-8")
+
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    words = word_view(data)
+    data_buffer = pa.py_buffer(data)
+    byte_counts = np.bincount(buffer[:BULK_SCAN_BYTES], minlength=256)
+    line_ends = newline_positions(buffer)
+    if len(buffer) and buffer[-1] != 10:
+        # The last line ends with the data instead of a newline
+        line_ends = np.append(line_ends, len(buffer))
+    line_starts = np.empty(len(line_ends), dtype=np.int64)
+    line_starts[:1] = 0
+    line_starts[1:] = line_ends[:-1] + 1
+    # The byte search reads a few words past the timestamp of a line and two words
+    # past any other byte of it, lines too close to the end of the data are left
+    # to parse_line()
+    searchable = min(
+        np.searchsorted(line_starts, len(data) - SEARCH_MARGIN, side="right"),
+        np.searchsorted(line_ends, len(data) - 2 * WORD, side="right"),
+    )
+
+    chunks = {column: [] for column in columns}
+    parsed_lines = [np.empty(0, dtype=np.int64)]
+    regex_lines = [np.arange(searchable, len(line_ends))]
+    for block in range(0, searchable, BULK_BLOCK_LINES):
+        block_end = min(block + BULK_BLOCK_LINES, searchable)
+        starts = line_starts[block:block_end]
+        ends = line_ends[block:block_end]
+
+        bounds, parsed, missing, slow = locate_fields(
+            buffer, words, starts, ends, log_format, byte_counts
+        )
+        rows = np.flatnonzero(parsed)
+        for column, (field_starts, field_ends) in zip(columns, bounds):
+            chunks[column].append(
+                string_array(data_buffer, field_starts[rows], field_ends[rows])
+            )
+        if missing[rows].any():
+            chunks[columns[0]][-1] = pc.if_else(
+                missing[rows], "No timestamp", chunks[columns[0]][-1]
+            )
+        parsed_lines.append(rows + block)
+        regex_lines.append(np.flatnonzero(slow) + block)
+
+    arrays = {
+        column: pa.concat_arrays(
+            [pa.array([], type=pa.large_string())] + chunks[column]
+        )
+        for column in columns
+    }
+
+    # Lines the byte search left out go through the regex and are put back in order
+    slow_lines, slow_rows = [], []
+    for line in np.sort(np.concatenate(regex_lines)):
+        text = str(data[line_starts[line] : line_ends[line]], "utf-8")
+        row = parse_line(text, log_format)
+        if row is not None:
+            slow_lines.append(line)
+            slow_rows.append(row)
+    if slow_rows:
+        # Number of rows parsed by the byte search before each slow line
+        positions = np.searchsorted(np.concatenate(parsed_lines), slow_lines)
+        for index, column in enumerate(columns):
+            arrays[column] = insert_rows(
+                arrays[column], positions, [row[index] for row in slow_rows]
+            )
+    return arrays
+
+
+def parse_log_bytes(data, log_format):
+    """Parse log lines (bytes) into a compact dataframe."""
+    return log_dataframe(parse_log_columns(data, log_format), log_format)
+
+
+# Parallel parsing
+parse_pool = None
+parse_pool_lock = threading.Lock()
+
+
+def parser_workers():
+    """Return the number of parser processes, set with PARSER_WORKERS in public.env."""
+    default = min(4, os.cpu_count() or 1)
+    try:
+        return max(1, int(os.getenv("PARSER_WORKERS", default)))
+    except ValueError:
+        print(f"[ERROR] Invalid PARSER_WORKERS, using {default} parser workers")
+        return default
+
+
+def get_parse_pool(workers):
+    """Return the shared parser process pool, starting it on first use."""
+    global parse_pool
+    with parse_pool_lock:
+        if parse_pool is None:
+            # Spawned workers do not inherit the locks of the dashboard's threads
+            parse_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return parse_pool
+
+
+def reset_parse_pool():
+    """Shut down the parser pool, the next parallel parse starts a new one."""
+    global parse_pool
+    with parse_pool_lock:
+        if parse_pool is not None:
+            parse_pool.shutdown(wait=False, cancel_futures=True)
+            parse_pool = None
+
+
+def next_line_start(buffer, position):
+    """Return the position after the first newline at or after position, 0 if none."""
+    for start in range(position, len(buffer), BULK_SCAN_BYTES):
+        found = np.flatnonzero(buffer[start : start + BULK_SCAN_BYTES] == 10)
+        if len(found):
+            return start + int(found[0]) + 1
+    return 0
+
+
+def split_lines(data, size=None):
+    """Split complete lines (bytes-like) into pieces of about size bytes ending at a newline."""
+    size = size or PARSE_TASK_BYTES
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    pieces = []
+    start = 0
+    while len(data) - start > size:
+        end = next_line_start(buffer, start + size)
+        if end == 0:
+            break
+        pieces.append(data[start:end])
+        start = end
+    if start < len(data):
+        pieces.append(data[start:] if start else data)
+    return pieces
+
+
+def parse_tasks(tasks):
+    """Parse a list of (chunks, log_format) tasks, where chunks are bytes-like
+    objects of whole lines, and return the column arrays of each task.
+
+    Small inputs are parsed in this process, larger ones are split into pieces
+    spread over the parser pool. Lines never span two pieces, so the results
+    only need to be concatenated in order.
+    """
+    workers = parser_workers()
+    total = sum(len(chunk) for chunks, _ in tasks for chunk in chunks)
+    if workers < 2 or total < PARALLEL_MIN_BYTES:
+        return parse_tasks_serially(tasks)
+
+    pieces = [
+        (index, piece)
+        for index, (chunks, _) in enumerate(tasks)
+        for chunk in chunks
+        for piece in split_lines(chunk)
+    ]
+    results = [None] * len(pieces)
+    try:
+        pool = get_parse_pool(workers)
+        pending = {}
+        for position, (index, piece) in enumerate(pieces):
+            # Wait for a free worker so only a few copies of the data exist at once
+            if len(pending) >= workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+            # Memory mapped pieces are copied only to be sent to a worker
+            future = pool.submit(parse_log_columns, bytes(piece), tasks[index][1])
+            pending[future] = position
+        for future, position in pending.items():
+            results[position] = future.result()
+    except (BrokenProcessPool, OSError) as e:
+        print(f"[ERROR] Parser pool failed, parsing serially: {e}")
+        reset_parse_pool()
+        return parse_tasks_serially(tasks)
+    return [
+        concat_columns(
+            [result for (owner, _), result in zip(pieces, results) if owner == index],
+            log_format["columns"],
+        )
+        for index, (_, log_format) in enumerate(tasks)
+    ]
+
+
+def parse_tasks_serially(tasks):
+    """Parse (chunks, log_format) tasks in this process, scanning each chunk in place."""
+    return [
+        concat_columns(
+            [parse_log_columns(chunk, log_format) for chunk in chunks or [b""]],
+            log_format["columns"],
+        )
+        for chunks, log_format in tasks
+    ]
+
+
+def concat_columns(results, columns):
+    """Concatenate the column arrays of consecutive parse results."""
+    if len(results) == 1:
+        return results[0]
+    return {
+        column: pa.concat_arrays(
+            [pa.array([], type=pa.large_string())]
+            + [arrays[column] for arrays in results]
+        )
+        for column in columns
+    }
+
+
+def parse_log_files(log_files, log_format, compact=True):
+    """Parse log files (oldest first) into a compact dataframe, or string columns."""
+    arrays = parse_tasks([(read_log_chunks(log_files), log_format)])[0]
+    if not compact:
+        return string_dataframe(arrays, log_format["columns"])
+    return log_dataframe(arrays, log_format)
+
+
+def parse_log_history(log_file_path, log_format):
+    """Parse the whole history of a log, its archives then its rotated files, into a compact dataframe."""
+    arrays = concat_columns(
+        [
+            read_archives(archived_log_files(log_file_path), log_format),
+            parse_tasks(
+                [(read_log_chunks(rotated_log_files(log_file_path)), log_format)]
+            )[0],
+        ],
+        log_format["columns"],
+    )
+    return log_dataframe(arrays, log_format)
+
+
+def parse_creds_audits_log(creds_audits_log_file):
+    """Parse SSH credentials log file, including rotated and archived files."""
+    try:
+        return parse_log_history(creds_audits_log_file, SSH_CREDS_FORMAT)
+    except Exception as e:
+        print(f"Error parsing credentials log: {e}")
+        return pd.DataFrame(columns=SSH_CREDS_COLUMNS)
+
+
 def parse_cmd_audits_log(cmd_audits_log_file):
-    """Parse SSH command log file, including rotated files."""
+    """Parse SSH command log file, including rotated and archived files."""
     try:
-        data = []
-        base_dir = str(Path(cmd_audits_log_file).parent)
-        log_files = glob.glob(f"{base_dir}/cmd_audits.log*")
-
-        for log_file in log_files:
-            with open(log_file, "r") as file:
-                for line in file:
-                    # Parse log format: "timestamp Command: command Client: IP"
-                    match = re.match(
-                        r"(?:(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) )?Command: (.*?) Client: (.*?)$",
-                        line.strip(),
-                    )
-                    if match:
-                        timestamp, command, ip = match.groups()
-                        if not timestamp:
-                            timestamp = "No timestamp"
-                        # Clean the command text before adding to data
-                        cleaned_command = clean_command_text(command)
-                        data.append(
-                            {
-                                "timestamp": timestamp,
-                                "Command": cleaned_command,
-                                "Client": ip,
-                            }
-                        )
-
-        return pd.DataFrame(data)
+        return parse_log_history(cmd_audits_log_file, SSH_CMD_FORMAT)
     except Exception as e:
         print(f"Error parsing commands log: {e}")
-        return pd.DataFrame(columns=["timestamp", "Command", "Client"])
+        return pd.DataFrame(columns=SSH_CMD_COLUMNS)
 
 
 def parse_http_url_audits_log(http_url_audits_log_file):
-    """Parse HTTP URL log file, including rotated files."""
+    """Parse HTTP URL log file, including rotated and archived files."""
     try:
-        data = []
-        base_dir = str(Path(http_url_audits_log_file).parent)
-        log_files = glob.glob(f"{base_dir}/http_url_audits.log*")
-
-        for log_file in log_files:
-            with open(log_file, "r") as file:
-                for line in file:
-                    match = re.match(
-                        r"(.*?) Client (.*?) \| Method: (.*?) \| URL: (.*?) \| Args: (.*)$",
-                        line.strip(),
-                    )
-                    if match:
-                        timestamp, ip_address, method, url, args = match.groups()
-                        data.append(
-                            {
-                                "timestamp": timestamp,
-                                "ip_address": ip_address,
-                                "method": method,
-                                "url": url,
-                                "args": args,
-                            }
-                        )
-
-        return pd.DataFrame(data)
+        return parse_log_history(http_url_audits_log_file, HTTP_URL_FORMAT)
     except Exception as e:
         print(f"Error parsing HTTP URL log: {e}")
-        return pd.DataFrame(
-            columns=["timestamp", "ip_address", "method", "url", "args"]
-        )
+        return pd.DataFrame(columns=HTTP_URL_COLUMNS)
 
 
 def parse_http_creds_audits_log(http_audits_log_file):
-    """Parse HTTP credentials log file, including rotated files."""
+    """Parse HTTP credentials log file, including rotated and archived files."""
     try:
-        data = []
-        base_dir = str(Path(http_audits_log_file).parent)
-        log_files = glob.glob(f"{base_dir}/http_audits.log*")
-
-        for log_file in log_files:
-            with open(log_file, "r") as file:
-                for line in file:
-                    match = re.match(
-                        r"(.*?) Client (.*?) attempted login with username: (.*?) and password: (.*?)$",
-                        line.strip(),
-                    )
-                    if match:
-                        timestamp, ip_address, username, password = match.groups()
-                        data.append(
-                            {
-                                "timestamp": timestamp,
-                                "ip_address": ip_address,
-                                "username": username,
-                                "password": password,
-                            }
-                        )
-        return pd.DataFrame(data)
+        return parse_log_history(http_audits_log_file, HTTP_CREDS_FORMAT)
     except Exception as e:
         print(f"Error parsing HTTP credentials log: {e}")
-        return pd.DataFrame(columns=["timestamp", "ip_address", "username", "password"])
+        return pd.DataFrame(columns=HTTP_CREDS_COLUMNS)
+
+
+class LogTail:
+    """Follows a log file and its rotated copies, returning only newly appended lines.
+
+    Read positions are remembered per inode, so when RotatingFileHandler renames
+    audits.log to audits.log.1 the bytes already read are not read again and the
+    new audits.log is read from the start. A file that shrinks below the saved
+    offset or whose first line changed (truncated, or inode reused by a new file)
+    is read again from the start.
+
+    Compressed segments (.gz, .zst) are decompressed as they are read and their
+    positions count decompressed bytes. A segment compressed after it was read
+    has the first line of the file it was made from, so it continues from that
+    file's position instead of being read again, and segments read to the end
+    are listed in finished and not decompressed again.
+    """
+
+    # Bytes of the first line used to fingerprint a file
+    FINGERPRINT_SIZE = 256
+    # Bytes read at a time to finish a line longer than the read limit, or
+    # decompressed at a time to skip to a read position
+    BLOCK_SIZE = 1 << 16
+
+    def __init__(self, log_file_path):
+        self.log_file_path = log_file_path
+        # (st_dev, st_ino) -> (byte offset of the first unread byte, fingerprint)
+        self.offsets = {}
+        # (st_dev, st_ino) of the compressed segments read to the end
+        self.finished = set()
+        # (st_dev, st_ino) -> (stream, position, bytes read past position) of the
+        # compressed segments a read limit stopped in, to continue without
+        # decompressing them from the start again
+        self.streams = {}
+
+    @classmethod
+    def fingerprint(cls, head):
+        """Return a checksum of the first line in head, None until it is complete."""
+        end = head.find(b"\n")
+        if end == -1:
+            if len(head) < cls.FINGERPRINT_SIZE:
+                return None
+            # The first FINGERPRINT_SIZE bytes of a long line do not change either
+            end = len(head)
+        return zlib.crc32(head[:end])
+
+    @classmethod
+    def read_lines(cls, file, size):
+        """Read size bytes (all with size -1), or on to the end of the line they stop in."""
+        chunk = file.read(size)
+        if len(chunk) == size and chunk.rfind(b"\n") == -1:
+            # A line longer than the read limit
+            parts = [chunk]
+            while parts[-1] and b"\n" not in parts[-1]:
+                parts.append(file.read(cls.BLOCK_SIZE))
+            chunk = b"".join(parts)
+        return chunk
+
+    def read_new_chunks(self, limit=None):
+        """Return the complete lines written to each file since the previous call, oldest first.
+
+        Lines of uncompressed files are memoryviews of the memory mapped file,
+        read from the page cache as they are parsed instead of being copied. With
+        a limit, reading stops after about limit bytes (at least one line) and the
+        following lines are returned by the next calls.
+        """
+        chunks = []
+        size = 0
+        # Start from the previous positions so a file that could not be opened
+        # (renamed while listing) keeps its offset for the next read.
+        offsets = dict(self.offsets)
+        finished = set(self.finished)
+
+        for log_file in rotated_log_files(self.log_file_path):
+            if limit is not None and size >= limit:
+                break
+            budget = -1 if limit is None else limit - size
+            try:
+                if is_compressed(log_file):
+                    file_id = self.file_id(os.stat(log_file))
+                    if file_id in finished:
+                        continue
+                    chunk, offset, fingerprint, complete = self.read_compressed(
+                        log_file, file_id, offsets, budget
+                    )
+                    if complete:
+                        finished.add(file_id)
+                else:
+                    file_id, chunk, offset, fingerprint, complete = self.read_plain(
+                        log_file, offsets, budget
+                    )
+            except FileNotFoundError:
+                # Rotated away while listing, read under its new name next time
+                continue
+            except (OSError, EOFError, zlib.error) as e:
+                print(f"[ERROR] Failed to read log segment {log_file}: {e}")
+                continue
+
+            if len(chunk):
+                chunks.append(chunk)
+                size += len(chunk)
+            offsets[file_id] = (offset + len(chunk), fingerprint)
+            # Newer files wait until the limit let this one be read
+            if not complete:
+                break
+
+        # Forget only the files that rotation has deleted
+        live_files = set()
+        for log_file in rotated_log_files(self.log_file_path):
+            try:
+                live_files.add(self.file_id(os.stat(log_file)))
+            except FileNotFoundError:
+                continue
+        self.offsets = {
+            file_id: position
+            for file_id, position in offsets.items()
+            if file_id in live_files
+        }
+        self.finished = finished & live_files
+        for file_id in set(self.streams) - live_files:
+            self.streams.pop(file_id)[0].close()
+        return chunks
+
+    @staticmethod
+    def file_id(stat):
+        return (stat.st_dev, stat.st_ino)
+
+    def read_plain(self, log_file, offsets, budget):
+        """Map the new complete lines of an uncompressed file.
+
+        Returns the file id, a memoryview of the lines, their position, the
+        file's fingerprint and whether the lines reach the end of the file.
+        """
+        with open(log_file, "rb") as file:
+            stat = os.fstat(file.fileno())
+            file_id = self.file_id(stat)
+            fingerprint = self.fingerprint(file.read(self.FINGERPRINT_SIZE))
+            offset, known_fingerprint = offsets.get(file_id, (0, None))
+            if stat.st_size < offset or (
+                known_fingerprint is not None and fingerprint != known_fingerprint
+            ):
+                offset = 0
+            if stat.st_size == offset:
+                return file_id, b"", offset, fingerprint, True
+            stop = stat.st_size if budget < 0 else min(offset + budget, stat.st_size)
+            if not rotation_index(log_file):
+                # The live file may be truncated while it is read, which only
+                # shortens a read() but kills a process reading a mapping of it
+                chunk = self.read_live(file, offset, stop, stat.st_size)
+                return file_id, chunk, offset, fingerprint, stop == stat.st_size
+            # The mapping outlives the file object and is unmapped once the
+            # last memoryview of it is gone
+            mapped = mmap.mmap(file.fileno(), stat.st_size, access=mmap.ACCESS_READ)
+
+        # Leave a partially written last line for the next read
+        end = mapped.rfind(b"\n", offset, stop) + 1
+        if not end and stop < stat.st_size:
+            # A line longer than the read limit
+            end = mapped.find(b"\n", stop) + 1
+        chunk = memoryview(mapped)[offset : max(end, offset)]
+        return file_id, chunk, offset, fingerprint, stop == stat.st_size
+
+    def read_live(self, file, offset, stop, size):
+        """Read the complete lines of the live file from offset to stop (past
+        stop for a line longer than the read limit), as a memoryview."""
+        file.seek(offset)
+        data = file.read(stop - offset)
+        # Leave a partially written last line for the next read
+        end = data.rfind(b"\n") + 1
+        if not end and stop < size:
+            # A line longer than the read limit
+            blocks = [data]
+            while not end:
+                block = file.read(self.BLOCK_SIZE)
+                if not block:
+                    break
+                if b"\n" in block:
+                    end = sum(map(len, blocks)) + block.find(b"\n") + 1
+                blocks.append(block)
+            data = b"".join(blocks)
+        return memoryview(data)[:end]
+
+    def read_compressed(self, log_file, file_id, offsets, budget):
+        """Read the new lines of a compressed segment.
+
+        Returns the complete lines read, their position in the decompressed
+        segment, its fingerprint and whether the segment was read to the end.
+        """
+        stream, position, pending = self.streams.pop(file_id, (None, None, b""))
+        known = offsets.get(file_id)
+        if stream is None or known is None or known[0] != position:
+            if stream is not None:
+                stream.close()
+            stream = open_log(log_file)
+            head = stream.read(self.FINGERPRINT_SIZE)
+            fingerprint = self.fingerprint(head)
+            if known is not None and known[1] == fingerprint:
+                position = known[0]
+            else:
+                # Continue where the file it was compressed from stopped
+                position = max(
+                    (
+                        offset
+                        for offset, other_fingerprint in offsets.values()
+                        if fingerprint is not None and other_fingerprint == fingerprint
+                    ),
+                    default=0,
+                )
+            pending = head[position:]
+            skip = position - len(head)
+            while skip > 0:
+                skipped = len(stream.read(min(skip, self.BLOCK_SIZE)))
+                if not skipped:
+                    break
+                skip -= skipped
+        else:
+            fingerprint = known[1]
+
+        size = max(budget - len(pending), 1) if budget >= 0 else -1
+        read = self.read_lines(stream, size)
+        chunk = pending + read
+        if size < 0 or len(read) < size:
+            stream.close()
+            # The archive is complete, so is its last line
+            if chunk and not chunk.endswith(b"\n"):
+                chunk += b"\n"
+            return chunk, position, fingerprint, True
+        # Keep the start of the line the limit stopped in for the next read
+        end = chunk.rfind(b"\n") + 1
+        self.streams[file_id] = (stream, position + end, chunk[end:])
+        return chunk[:end], position, fingerprint, False
+
+    def read_new_data(self):
+        """Return the complete lines written since the previous call as bytes, oldest first."""
+        return b"".join(self.read_new_chunks())
+
+
+class IncrementalLogParser:
+    """Keeps a parsed dataframe up to date by parsing only the lines appended to a log.
+
+    Each refresh adds the new rows as one more Arrow chunk per column and the
+    dataframe's string columns are views of the chunks, so earlier rows are not
+    copied again. Neighbouring chunks are merged once the newer one has grown to
+    half the size of the older one, which keeps the chunk count logarithmic while
+    each row is copied only a logarithmic number of times. Arrow arrays are
+    immutable, so a dataframe returned earlier is never changed by later refreshes.
+    """
+
+    def __init__(self, log_file_path, log_format):
+        self.tail = LogTail(log_file_path)
+        self.log_format = log_format
+        self.columns = log_format["columns"]
+        self.chunks = {column: [] for column in self.columns}
+        self.dataframe = string_dataframe(
+            {column: pa.array([], type=pa.large_string()) for column in self.columns},
+            self.columns,
+        )
+        # Dash serves callbacks from several threads, only one may tail the log
+        self.lock = threading.Lock()
+
+    def append(self, new_arrays):
+        """Add parsed rows as new chunks and publish the new dataframe."""
+        for column in self.columns:
+            chunks = self.chunks[column]
+            chunks.append(new_arrays[column])
+            while len(chunks) > 1 and 2 * len(chunks[-1]) >= len(chunks[-2]):
+                chunks[-2:] = [pa.concat_arrays(chunks[-2:])]
+        self.dataframe = string_dataframe(
+            {
+                column: pa.chunked_array(chunks, type=pa.large_string())
+                for column, chunks in self.chunks.items()
+            },
+            self.columns,
+        )
+
+    def refresh(self):
+        """Parse new log lines, append them to the dataframe and return it."""
+        return refresh_parsers([self])[0]
+
+
+def refresh_parsers(parsers):
+    """Refresh several IncrementalLogParsers at once and return their dataframes."""
+    with ExitStack() as stack:
+        # Always taken in the order given, callers pass the parsers in a fixed order
+        for parser in parsers:
+            stack.enter_context(parser.lock)
+        new_rows = parse_new_lines(
+            [(parser.tail, parser.log_format) for parser in parsers]
+        )
+        for parser, new_arrays in zip(parsers, new_rows):
+            if len(new_arrays[parser.columns[0]]):
+                parser.append(new_arrays)
+        return [parser.dataframe for parser in parsers]
+
+
+def parse_new_lines(sources, limit=None):
+    """Parse the lines appended to several logs, given as (LogTail, log_format) pairs.
+
+    The new lines of every log and rotated file are parsed as one batch of tasks,
+    so large backlogs of all the logs are spread over the parser pool together.
+    limit caps the bytes read from each log, see LogTail.read_new_chunks().
+    Returns the column arrays of each log's new rows.
+    """
+    return parse_tasks(
+        [(tail.read_new_chunks(limit), log_format) for tail, log_format in sources]
+    )
 
 
 # Calculator to generate top 10 values from a dataframe. Supply a column name, counts how often each value occurs, stores in "count" column, then return dataframe with value/count.
@@ -193,92 +1311,235 @@ def truncate_text(text, max_length=30):
     return text if len(text) <= max_length else text[:max_length] + "..."
 
 
-# Cache for country code lookups
-country_code_cache = {}
+# Country codes come from the CleanTalk API by default. With GEOIP_PROVIDER=local
+# in public.env they are looked up in the GEOIP_DATABASE file instead (a CSV or
+# .mmdb IP range database, see geoip.py), which needs no network access.
+geoip_database = None
+geoip_lock = threading.Lock()
+
+# API results are kept in a SQLite cache shared by the dashboard processes
+# (GEO_CACHE in public.env, log_files/geo_cache.db by default), so a restart
+# looks up none of the IPs seen before. Countries expire after GEO_CACHE_TTL
+# seconds, IPs without a country or whose lookup failed after
+# GEO_CACHE_NEGATIVE_TTL seconds.
+geo_cache = None
+geo_cache_lock = threading.Lock()
+
+# The IPs missing from the cache are looked up with the API by a background
+# client, GEOIP_WORKERS concurrent requests of GEOIP_BATCH_SIZE IPs, at most
+# GEOIP_RATE requests per second, retried GEOIP_RETRIES times with backoff.
+CLEANTALK_URL = "https://api.cleantalk.org/?method_name=ip_info&ip={ips}"
+geo_client = None
+geo_client_lock = threading.Lock()
+
+
+def local_geoip_database():
+    """Return the local GeoIP database if it is the selected provider, loading it on first use."""
+    global geoip_database
+    if os.getenv("GEOIP_PROVIDER", "cleantalk").lower() != "local":
+        return None
+    with geoip_lock:
+        if geoip_database is None:
+            path = os.getenv("GEOIP_DATABASE")
+            try:
+                if not path:
+                    raise OSError("GEOIP_DATABASE is not set")
+                geoip_database = load_database(path)
+                print(f"[DEBUG] Loaded {len(geoip_database)} GeoIP ranges from {path}")
+            except (OSError, UnicodeDecodeError) as e:
+                # Without a database every country is unknown, never the API
+                print(f"[ERROR] Failed to load the GeoIP database: {e}")
+                geoip_database = GeoIPDatabase([])
+        return geoip_database
+
+
+def country_cache():
+    """Return the cache of API lookups, opening it on first use (None if it cannot be opened)."""
+    global geo_cache
+    with geo_cache_lock:
+        if geo_cache is None:
+            log_dir = Path(os.getenv("LOG_DIR", Path(__file__).parent / "log_files"))
+            path = os.getenv("GEO_CACHE", str(log_dir / "geo_cache.db"))
+            try:
+                geo_cache = GeoCache(
+                    path,
+                    ttl=float(os.getenv("GEO_CACHE_TTL", DEFAULT_CACHE_TTL)),
+                    negative_ttl=float(
+                        os.getenv("GEO_CACHE_NEGATIVE_TTL", DEFAULT_NEGATIVE_CACHE_TTL)
+                    ),
+                )
+            except sqlite3.Error as e:
+                print(f"[ERROR] Failed to open the country cache {path}: {e}")
+                return None
+        return geo_cache
+
+
+def cleantalk_countries(ips, data):
+    """Return the {ip: country code} of a CleanTalk ip_info response."""
+    countries = {}
+    for ip, country_info in (data.get("data") or {}).items():
+        code = (country_info or {}).get("country_code")
+        if code and isinstance(code, str) and code not in ("Unknown", "Error", ""):
+            countries[ip] = code
+    return countries
+
+
+def cache_countries(results):
+    """Save the results of a batch of API lookups in the country cache."""
+    cache = country_cache()
+    try:
+        if cache is not None:
+            cache.put_many(results)
+    except sqlite3.Error as e:
+        print(f"[ERROR] Failed to update the country cache: {e}")
+
+
+def enrichment_client():
+    """Return the client looking IPs up with the API, creating it on first use."""
+    global geo_client
+    with geo_client_lock:
+        if geo_client is None:
+            geo_client = EnrichmentClient(
+                CLEANTALK_URL,
+                cleantalk_countries,
+                on_results=cache_countries,
+                workers=int(os.getenv("GEOIP_WORKERS", "4")),
+                batch_size=int(os.getenv("GEOIP_BATCH_SIZE", "100")),
+                rate=float(os.getenv("GEOIP_RATE", "1")),
+                timeout=float(os.getenv("GEOIP_TIMEOUT", "5")),
+                retries=int(os.getenv("GEOIP_RETRIES", "4")),
+            )
+        return geo_client
 
 
-@lru_cache(maxsize=1000)
-def get_country_code(ip):
-    """Takes an IP address as string type, uses the Cleantalk API to look up IP Geolocation.
-    Results are cached to avoid repeated API calls."""
-    if ip in country_code_cache:
-        return country_code_cache[ip]
+def api_countries(ips, wait=False):
+    """Return the country code of each distinct IP address from the cache.
 
-    data_list = []
-    url = f"https://api.cleantalk.org/?method_name=ip_info&ip={ip}"
+    The IPs without an unexpired entry are looked up with the API in the
+    background and are None until a later call finds them cached. With wait
+    (or without a cache) the lookups are waited for instead.
+    """
+    cache = country_cache()
+    cached = {}
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            ip_data = data.get("data", {})
-            country_info = ip_data.get(ip, {})
-            result = [
-                {"IP Address": ip, "Country_Code": country_info.get("country_code")}
-            ]
-            country_code_cache[ip] = result
-            return result
-        elif response.status_code == 429:
-            print(f"[!] CleanTalk Rate Limit hit for IP {ip}")
-            return None
+        if cache is not None:
+            cached = cache.get_many(ips)
+    except sqlite3.Error as e:
+        print(f"[ERROR] Failed to read the country cache: {e}")
+
+    missing = [ip for ip in ips if ip not in cached]
+    if missing:
+        futures = enrichment_client().submit(missing)
+        if wait or cache is None:
+            for future in futures:
+                cached.update(future.result())
         else:
             print(
-                f"[!] Error: Unable to retrieve data for IP {ip}. Status code: {response.status_code}"
+                f"[DEBUG] Looking up {len(missing)} of {len(ips)} IPs in the background"
             )
-            return None
-    except requests.RequestException as e:
-        print(f"[!] Request failed for IP {ip}: {e}")
+    return np.array([cached.get(ip) for ip in ips], dtype=object)
+
+
+def country_code(ip):
+    """Return the country code of an IP address, None when it is unknown or cannot be looked up."""
+    if ip == "127.0.0.1" or ip == "localhost":
         return None
+    database = local_geoip_database()
+    if database is not None:
+        return database.country(ip)
+    return api_countries([ip], wait=True)[0]
 
 
-def ip_to_country_code(dataframe):
-    """Convert IP addresses to country codes using the CleanTalk API with caching"""
-    if dataframe.empty or "ip_address" not in dataframe.columns:
-        print("[DEBUG] Empty dataframe or no ip_address column found")
-        return pd.DataFrame(columns=["Country_Code", "frequency"])
+def ip_countries(ips, wait=False):
+    """Return the country code of each distinct IP address, None when it is unknown.
+
+    The local GeoIP database resolves them all at once. With the API, those
+    that are not cached are None until their background lookup is done, unless
+    wait is set (see api_countries()).
+    """
+    ips = np.asarray(ips, dtype=object)
+    local = np.isin(ips, ["127.0.0.1", "localhost"])
+    database = local_geoip_database()
+    if database is None:
+        codes = np.full(len(ips), None, dtype=object)
+        if (~local).any():
+            codes[~local] = api_countries(ips[~local].tolist(), wait)
+        return codes
+    codes = database.countries(ips)
+    codes[local] = None
+    return codes
 
-    ip_counts = dataframe["ip_address"].value_counts().to_dict()
-    country_counts = {}
 
+def known_countries(ips):
+    """Return the {ip: country code or None} of the distinct IP addresses whose
+    country is known now, never waiting for a lookup.
+
+    The local GeoIP database knows them all. With the API the cached countries
+    are known, the other IPs are looked up in the background and left out,
+    including those cached without a country, whose lookup may have failed and
+    is started again once their cache entry expires.
+    """
+    ips = np.asarray(ips, dtype=object)
+    if local_geoip_database() is not None:
+        return dict(zip(ips.tolist(), ip_countries(ips).tolist()))
+    local = np.isin(ips, ["127.0.0.1", "localhost"])
+    known = dict.fromkeys(ips[local].tolist())
+    # Without a cache the results of background lookups would be lost
+    cache = country_cache()
+    if cache is None:
+        return known
+    remote = ips[~local].tolist()
     try:
-        unique_ips = dataframe["ip_address"].unique()
-        print(f"[DEBUG] Processing {len(unique_ips)} unique IPs")
+        cached = cache.get_many(remote)
+    except sqlite3.Error as e:
+        print(f"[ERROR] Failed to read the country cache: {e}")
+        return known
+    missing = [ip for ip in remote if ip not in cached]
+    if missing:
+        enrichment_client().submit(missing)
+    known.update((ip, code) for ip, code in cached.items() if code is not None)
+    return known
 
-        for ip in unique_ips:
-            if ip == "127.0.0.1" or ip == "localhost":
-                continue
 
-            try:
-                get_country = get_country_code(ip)
-                if get_country and len(get_country) > 0:
-                    country_code = get_country[0].get("Country_Code")
-                    if (
-                        country_code
-                        and isinstance(country_code, str)
-                        and country_code not in ("Unknown", "Error", "")
-                    ):
-                        print(f"[DEBUG] IP {ip} -> {country_code}")
-                        country_counts[country_code] = (
-                            country_counts.get(country_code, 0) + ip_counts[ip]
-                        )
-            except Exception as e:
-                print(f"[DEBUG] Error processing IP {ip}: {e}")
-                continue
+def ip_to_country_code(dataframe):
+    """Convert IP addresses to country codes (local GeoIP database or CleanTalk API) and count events per country.
 
-        if not country_counts:
-            return pd.DataFrame(columns=["Country_Code", "frequency"])
+    dataframe has one row per event, or one per IP address with its frequency
+    (event store value counts).
+    """
+    if dataframe.empty or "ip_address" not in dataframe.columns:
+        print("[DEBUG] Empty dataframe or no ip_address column found")
+        return pd.DataFrame(columns=["Country_Code", "frequency"])
 
-        country_df = pd.DataFrame(
-            [
-                {"Country_Code": country, "frequency": count}
-                for country, count in country_counts.items()
-            ]
+    try:
+        # Each distinct address is resolved once, the events are counted per
+        # address from the categorical codes and summed per country
+        ips = pd.Categorical(dataframe["ip_address"])
+        present = ips.codes >= 0
+        if "frequency" in dataframe.columns:
+            weights = dataframe["frequency"].to_numpy()[present]
+        else:
+            weights = None
+        ip_counts = np.bincount(
+            ips.codes[present], weights=weights, minlength=len(ips.categories)
         )
+        codes = ip_countries(ips.categories.to_numpy(dtype=object))
 
-        if not country_df.empty:
-            country_df = country_df.sort_values("frequency", ascending=False)
-            print(f"[DEBUG] Created country code table with {len(country_df)} entries:")
-            print(country_df)
+        country_df = (
+            pd.DataFrame({"Country_Code": codes, "frequency": ip_counts})
+            .groupby("Country_Code", sort=False)["frequency"]
+            .sum()
+            .astype("int64")
+            .reset_index()
+        )
+        country_df = country_df[country_df["frequency"] > 0]
+        if country_df.empty:
+            return pd.DataFrame(columns=["Country_Code", "frequency"])
 
+        country_df = country_df.sort_values(
+            ["frequency", "Country_Code"], ascending=[False, True]
+        )
+        print(f"[DEBUG] Created country code table with {len(country_df)} entries")
         return country_df.reset_index(drop=True)
 
     except Exception as e:
@@ -287,3 +1548,92 @@ def ip_to_country_code(dataframe):
 
         print(traceback.format_exc())
         return pd.DataFrame(columns=["Country_Code", "frequency"])
+
+
+# Levels the source IPs are rolled up to: their /24 and /16 networks (/48 and
+# /32 for IPv6) and, with ASN_DATABASE in public.env pointing at a prefix to
+# ASN table (see geoip.prefix_rows()), their autonomous system
+NETWORK_PREFIXES = {"/24": {4: 24, 6: 48}, "/16": {4: 16, 6: 32}}
+NETWORK_LEVELS = [*NETWORK_PREFIXES, "asn"]
+asn_database = None
+asn_lock = threading.Lock()
+
+
+def local_asn_database():
+    """Return the prefix to ASN table if ASN_DATABASE is set, loading it on first use."""
+    global asn_database
+    path = os.getenv("ASN_DATABASE")
+    if not path:
+        return None
+    with asn_lock:
+        if asn_database is None:
+            try:
+                asn_database = load_prefixes(path)
+                print(f"[DEBUG] Loaded {len(asn_database)} ASN prefixes from {path}")
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"[ERROR] Failed to load the ASN database: {e}")
+                asn_database = PrefixTable([])
+        return asn_database
+
+
+def ip_networks(ips):
+    """Return the network of each distinct IP address at every level of
+    NETWORK_LEVELS, as {level: array}, None when it has none (not an IP
+    address, or no ASN prefix contains it)."""
+    asn_table = local_asn_database()
+    networks = {
+        level: np.full(len(ips), None, dtype=object) for level in NETWORK_LEVELS
+    }
+    for row, ip in enumerate(ips):
+        try:
+            version, value = address_key(ip.strip())
+        except (ValueError, AttributeError):
+            continue
+        for level, lengths in NETWORK_PREFIXES.items():
+            networks[level][row] = network_label(version, value, lengths[version])
+        if asn_table is not None:
+            networks["asn"][row] = asn_table.match(version, value)
+    return networks
+
+
+def network_counts(dataframe):
+    """Count events per source network at every level of NETWORK_LEVELS.
+
+    dataframe has one row per event, or one per IP address with its frequency
+    (event store value counts). Returns level, network and frequency columns,
+    most frequent first within each level.
+    """
+    if dataframe.empty or "ip_address" not in dataframe.columns:
+        return pd.DataFrame(columns=["level", "network", "frequency"])
+
+    try:
+        ips = pd.Categorical(dataframe["ip_address"])
+        present = ips.codes >= 0
+        if "frequency" in dataframe.columns:
+            weights = dataframe["frequency"].to_numpy()[present]
+        else:
+            weights = None
+        ip_counts = np.bincount(
+            ips.codes[present], weights=weights, minlength=len(ips.categories)
+        )
+        counts = []
+        for level, networks in ip_networks(
+            ips.categories.to_numpy(dtype=object)
+        ).items():
+            level_counts = (
+                pd.DataFrame({"network": networks, "frequency": ip_counts})
+                .groupby("network", sort=False)["frequency"]
+                .sum()
+                .astype("int64")
+                .reset_index()
+            )
+            counts.append(level_counts.assign(level=level))
+        result = pd.concat(counts, ignore_index=True)
+        result = result[result["frequency"] > 0]
+        return result.sort_values(
+            ["level", "frequency", "network"], ascending=[True, False, True]
+        ).reset_index(drop=True)[["level", "network", "frequency"]]
+
+    except Exception as e:
+        print(f"[ERROR] Error in network_counts: {e}")
+        return pd.DataFrame(columns=["level", "network", "frequency"])
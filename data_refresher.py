@@ -0,0 +1,132 @@
+# Import library dependencies.
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# This file runs the dashboard's log ingestion on a background thread, so the
+# Dash callbacks never parse logs themselves: they read the latest snapshot the
+# refresher published. However many viewers there are, the logs are ingested
+# by one thread, every interval seconds and as soon as a watched log changes.
+# What is built from a snapshot is cached by its version, see VersionedCache.
+
+
+class DataRefresher:
+    """Background thread calling refresh() then publish() on a schedule.
+
+    refresh() ingests the new log lines and publish() builds and publishes a
+    snapshot of the data. The first snapshot is published from what is already
+    stored, before anything is ingested. watched() returns the paths whose
+    size, modification time or inode changing (checked every poll seconds)
+    triggers a refresh before the interval is over, and request() triggers one
+    right away.
+    """
+
+    def __init__(self, refresh, publish, watched=None, interval=30.0, poll=1.0):
+        self.refresh = refresh
+        self.publish = publish
+        self.watched = watched or (lambda: [])
+        self.interval = interval
+        self.poll = poll
+        # Set once the first snapshot is published
+        self.published = threading.Event()
+        self.wake = threading.Event()
+        self.stopping = False
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def signature(self):
+        """Return the stat of the watched paths, compared between polls."""
+        signature = []
+        for path in self.watched():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature.append((str(path), stat.st_size, stat.st_mtime_ns, stat.st_ino))
+        return signature
+
+    def start(self):
+        """Start the thread, if it is not running yet."""
+        with self.lock:
+            if self.thread is None:
+                self.stopping = False
+                self.thread = threading.Thread(
+                    target=self.run, name="data-refresher", daemon=True
+                )
+                self.thread.start()
+
+    def request(self):
+        """Refresh as soon as possible, without waiting for the interval."""
+        self.wake.set()
+
+    def stop(self, timeout=None):
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.stopping = True
+            self.wake.set()
+            thread.join(timeout)
+
+    def run(self):
+        self.step(self.publish)
+        self.published.set()
+        signature = None
+        last_refresh = None
+        while not self.stopping:
+            current = self.signature()
+            due = last_refresh is None or (
+                time.monotonic() - last_refresh >= self.interval
+            )
+            if due or self.wake.is_set() or current != signature:
+                self.wake.clear()
+                # Taken before ingesting, lines appended meanwhile trigger
+                # another refresh
+                signature = current
+                last_refresh = time.monotonic()
+                if self.step(self.refresh):
+                    self.step(self.publish)
+            self.wake.wait(self.poll)
+
+    def step(self, function):
+        """Call refresh() or publish(), return whether it succeeded."""
+        try:
+            function()
+            return True
+        except Exception as e:
+            print(f"[ERROR] Background refresh failed: {e}")
+            return False
+
+
+class VersionedCache:
+    """Thread safe LRU cache of what is built from a data snapshot.
+
+    Keys start with the snapshot version, so a new snapshot makes the entries
+    of the previous ones unused, and they are evicted first once more than
+    size entries are cached.
+    """
+
+    def __init__(self, size=64):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        """Return the cached value of key, calling build() to make it on a miss."""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        # Built without the lock, concurrent misses of the same key may both
+        # build it, which is only wasted work
+        value = build()
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return value
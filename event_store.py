@@ -0,0 +1,1163 @@
+# Import library dependencies.
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Import project python file dependencies.
+from dashboard_data_parser import (
+    HTTP_CREDS_FORMAT,
+    HTTP_URL_FORMAT,
+    SSH_CMD_FORMAT,
+    SSH_CREDS_FORMAT,
+    LogTail,
+    archived_log_files,
+    parse_new_lines,
+    shift_time_zone,
+    truncate_text,
+    utc_timestamps,
+)
+from sketches import (
+    HyperLogLog,
+    SpaceSaving,
+    hash_strings,
+    merge_grouped_top_k,
+    top_k_capacity,
+)
+
+# This file keeps the parsed honeypot events in a local SQLite database, so the
+# dashboard ingests only the lines appended since the last refresh (even across
+# restarts) and answers its statistics with indexed queries instead of holding
+# every event of every log in memory.
+
+# One table per log family, named after the family
+STORE_FORMATS = {
+    "ssh_creds": SSH_CREDS_FORMAT,
+    "ssh_cmds": SSH_CMD_FORMAT,
+    "http_url": HTTP_URL_FORMAT,
+    "http_creds": HTTP_CREDS_FORMAT,
+}
+
+# Columns the dashboard filters or sorts on. Events are sorted by event_time, the
+# timestamp in milliseconds since 1970 (NULL when the line had no timestamp), so
+# they are in time order and "No timestamp" rows come last.
+INDEXED_COLUMNS = {
+    "ssh_creds": ["event_time", "ip_address", "username"],
+    "ssh_cmds": ["event_time", "Command", "Client"],
+    "http_url": ["event_time", "ip_address"],
+    "http_creds": ["event_time", "ip_address", "username"],
+}
+
+# SQL computing event_time (UTC) from the local timestamp text, for databases
+# created before the column existed or before it was converted to UTC
+EVENT_TIME_SQL = (
+    'CASE WHEN "timestamp" GLOB \'[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] '
+    "[0-9][0-9]:[0-9][0-9]:[0-9][0-9],[0-9][0-9][0-9]' "
+    "THEN CAST(strftime('%s', substr(\"timestamp\", 1, 19), 'utc') AS INTEGER) "
+    "* 1000 "
+    '+ CAST(substr("timestamp", 21, 3) AS INTEGER) END'
+)
+
+# Columns whose exact value frequencies are kept up to date during ingestion,
+# the country distributions need every address
+COUNTED_COLUMNS = {
+    "ssh_creds": ["ip_address"],
+    "ssh_cmds": [],
+    "http_url": ["ip_address"],
+    "http_creds": ["ip_address"],
+}
+
+# Columns with a top 10 panel, tracked by Space-Saving summaries. The summaries
+# are kept in exact mode too, so switching modes needs no rebuild.
+TOP_K_COLUMNS = {
+    "ssh_creds": ["ip_address", "username", "password"],
+    "ssh_cmds": ["Command"],
+    "http_url": ["ip_address", "method", "url"],
+    "http_creds": ["ip_address", "username", "password"],
+}
+
+# Distinct values counted with HyperLogLogs per family and day, each field
+# counts the combination of its columns
+DISTINCT_FIELDS = {
+    "ssh_creds": {
+        "ip_address": ["ip_address"],
+        "credentials": ["username", "password"],
+    },
+    "ssh_cmds": {"ip_address": ["Client"], "Command": ["Command"]},
+    "http_url": {"ip_address": ["ip_address"]},
+    "http_creds": {
+        "ip_address": ["ip_address"],
+        "credentials": ["username", "password"],
+    },
+}
+
+# Milliseconds per HyperLogLog time bucket
+DAY_MS = 24 * 60 * 60 * 1000
+# Bucket of the events without a timestamp, before any valid date
+NO_TIMESTAMP_BUCKET = -(10**9)
+
+# Rollup resolutions (bucket width in milliseconds) with how long their buckets
+# are kept, None keeps them forever. Minute buckets expire first and older
+# periods remain available per hour, then per day.
+ROLLUP_RESOLUTIONS = {
+    60 * 1000: 2 * DAY_MS,
+    60 * 60 * 1000: 90 * DAY_MS,
+    DAY_MS: None,
+}
+# Source IP column of each family, its most frequent IPs are kept per bucket
+ROLLUP_IP_COLUMNS = {
+    "ssh_creds": "ip_address",
+    "ssh_cmds": "Client",
+    "http_url": "ip_address",
+    "http_creds": "ip_address",
+}
+ROLLUP_TOP_IPS = 20
+# Milliseconds the events of an IP whose country is not known yet wait for it
+# in country_pending, see backfill_countries(). They are left out of the
+# country rollups after that.
+COUNTRY_PENDING_TTL = 7 * DAY_MS
+# Points drawn by a time series, time_series() picks the resolution accordingly
+MAX_SERIES_POINTS = 1500
+
+# Bytes of new lines read from each log per ingest transaction
+INGEST_BATCH_BYTES = 64 << 20
+# Rows of a Parquet archive inserted at a time
+ARCHIVE_BATCH_ROWS = 1 << 20
+
+# SQL of the table filter operators, LIKE patterns escape their wildcards with \
+FILTER_OPERATORS = {
+    "=": "= ?",
+    "!=": "!= ?",
+    "<": "< ?",
+    "<=": "<= ?",
+    ">": "> ?",
+    ">=": ">= ?",
+    "contains": "LIKE ? ESCAPE '\\'",
+    "datestartswith": "LIKE ? ESCAPE '\\'",
+}
+
+# Default relative error of the top 10 frequencies, a count can be overestimated
+# by at most this fraction of the family's events
+DEFAULT_TOP_K_ERROR = 0.001
+
+
+def time_range(start=None, end=None):
+    """Return the SQL conditions and parameters keeping the events from start to
+    end (milliseconds since 1970, both included, None for no bound).
+
+    They are answered from the event_time index, so only the events in the range
+    are read, and events without a timestamp never match a range.
+    """
+    conditions, parameters = [], []
+    if start is not None:
+        conditions.append("event_time >= ?")
+        parameters.append(int(start))
+    if end is not None:
+        conditions.append("event_time <= ?")
+        parameters.append(int(end))
+    return conditions, parameters
+
+
+def quote(name):
+    """Quote a table or column name for SQL."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+class EventStore:
+    """SQLite database of parsed log events with per-value frequency counts.
+
+    Every ingest inserts the new events, adds them to the value_counts table and
+    to the top 10 summaries and saves the LogTail read positions in one
+    transaction, so a restarted dashboard continues where it stopped. The
+    database runs in WAL mode, readers are not blocked by an ingest in progress
+    and each call uses its own connection, so the store can be shared by the
+    dashboard's threads.
+
+    The top 10s come from Space-Saving summaries of top_k_capacity(top_k_error)
+    counters per column, read in O(10) however many events are stored. With
+    top_k_error=0 they are counted exactly from the events instead, which is
+    only practical for small databases.
+    """
+
+    def __init__(
+        self,
+        path,
+        top_k_error=DEFAULT_TOP_K_ERROR,
+        country_lookup=None,
+        network_counter=None,
+    ):
+        self.path = str(path)
+        # Returns the {ip: country code or None} of the IPs of an array of
+        # distinct addresses whose country is known, without waiting for the
+        # others. The rollups have no country dimension without it.
+        self.country_lookup = country_lookup
+        # Rolls (ip_address, frequency) counts up to (level, network, frequency)
+        # counts, see dashboard_data_parser.network_counts(). Without it no
+        # network counts are kept.
+        self.network_counter = network_counter
+        # 0 answers the top 10s with exact counts over all stored events
+        self.top_k_error = top_k_error
+        self.top_k_capacity = top_k_capacity(top_k_error or DEFAULT_TOP_K_ERROR)
+        self.tails = {}
+        # Only one ingest at a time, the LogTails are not thread safe
+        self.lock = threading.Lock()
+        # Connection of the read transaction of each thread, see reading()
+        self.local = threading.local()
+        with self.connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            self.create_schema(connection)
+
+    @contextmanager
+    def connect(self):
+        """Open a connection, commit on success and roll back on error.
+
+        Within reading(), the connection of its read transaction is used.
+        """
+        reader = getattr(self.local, "connection", None)
+        if reader is not None:
+            yield reader
+            return
+        with closing(sqlite3.connect(self.path, timeout=30)) as connection:
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with connection:
+                yield connection
+
+    @contextmanager
+    def reading(self):
+        """Make the reads of this thread within the block share one read
+        transaction, so they all see the database in the same state, which the
+        ingests committing meanwhile do not change (WAL readers are not blocked).
+        """
+        if getattr(self.local, "connection", None) is not None:
+            yield
+            return
+        with closing(sqlite3.connect(self.path, timeout=30)) as connection:
+            connection.execute("BEGIN")
+            self.local.connection = connection
+            try:
+                yield
+            finally:
+                self.local.connection = None
+                connection.rollback()
+
+    def create_schema(self, connection):
+        """Create the event, value count and read position tables."""
+        # Databases of version 0 stored the local event times as if they were
+        # UTC, outside of UTC their event times and time buckets are rebuilt
+        local_times = (
+            connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                (next(iter(STORE_FORMATS)),),
+            ).fetchone()
+            and connection.execute("PRAGMA user_version").fetchone()[0] < 1
+        )
+        if local_times and (time.timezone or time.altzone):
+            print("[DEBUG] Converting the stored event times to UTC")
+            for family in STORE_FORMATS:
+                columns = connection.execute(f"PRAGMA table_info({quote(family)})")
+                if "event_time" in [row[1] for row in columns]:
+                    connection.execute(
+                        f"UPDATE {quote(family)} SET event_time = {EVENT_TIME_SQL}"
+                    )
+            for table in ["distinct_counts", "rollups", "country_pending"]:
+                connection.execute(f"DROP TABLE IF EXISTS {table}")
+        for family, log_format in STORE_FORMATS.items():
+            columns = ", ".join(f"{quote(c)} TEXT" for c in log_format["columns"])
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {quote(family)} "
+                f"(id INTEGER PRIMARY KEY, {columns}, event_time INTEGER)"
+            )
+            existing = [
+                row[1]
+                for row in connection.execute(f"PRAGMA table_info({quote(family)})")
+            ]
+            if "event_time" not in existing:
+                connection.execute(
+                    f"ALTER TABLE {quote(family)} ADD COLUMN event_time INTEGER"
+                )
+                connection.execute(
+                    f"UPDATE {quote(family)} SET event_time = {EVENT_TIME_SQL}"
+                )
+            for column in INDEXED_COLUMNS[family]:
+                connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS {quote(f'{family}_{column}')} "
+                    f"ON {quote(family)} ({quote(column)})"
+                )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS value_counts (family TEXT, field TEXT, "
+            "value TEXT, frequency INTEGER, PRIMARY KEY (family, field, value)) "
+            "WITHOUT ROWID"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS value_counts_frequency "
+            "ON value_counts (family, field, frequency)"
+        )
+        # Counters of the Space-Saving summaries, filled from the stored events
+        # the first time so databases from before the summaries keep their history
+        new_top_k = not connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'top_k'"
+        ).fetchone()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS top_k (family TEXT, field TEXT, value TEXT, "
+            "frequency INTEGER, error INTEGER, PRIMARY KEY (family, field, value)) "
+            "WITHOUT ROWID"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS top_k_frequency "
+            "ON top_k (family, field, frequency)"
+        )
+        if new_top_k:
+            for family, columns in TOP_K_COLUMNS.items():
+                for column in columns:
+                    summary = SpaceSaving(self.top_k_capacity)
+                    counts = self.exact_counts(connection, family, column)
+                    summary.update(counts[column], counts["frequency"])
+                    self.save_top_k(connection, family, column, summary)
+            # Exact counts are only kept for the country distributions now
+            for family, columns in COUNTED_COLUMNS.items():
+                connection.execute(
+                    "DELETE FROM value_counts WHERE family = ? AND field NOT IN "
+                    f"({', '.join('?' * len(columns))})",
+                    (family, *columns),
+                )
+        new_distinct_counts = not connection.execute(
+            "SELECT 1 FROM sqlite_master "
+            "WHERE type = 'table' AND name = 'distinct_counts'"
+        ).fetchone()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS distinct_counts (family TEXT, field TEXT, "
+            "bucket INTEGER, registers BLOB, PRIMARY KEY (family, field, bucket)) "
+            "WITHOUT ROWID"
+        )
+        if new_distinct_counts:
+            for family in STORE_FORMATS:
+                for arrays, event_times in self.stored_events(connection, family):
+                    self.count_distinct(connection, family, arrays, event_times)
+        # Events of the IPs whose country was not known when they were ingested,
+        # added to the country rollups by backfill_countries()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS country_pending (resolution INTEGER, "
+            "family TEXT, bucket INTEGER, ip TEXT, events INTEGER, added INTEGER, "
+            "PRIMARY KEY (resolution, family, bucket, ip)) WITHOUT ROWID"
+        )
+        # Event counts per time bucket, in total (empty dimension and value), per
+        # country and for the most frequent source IPs (Space-Saving counters
+        # with their error)
+        new_rollups = not connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rollups'"
+        ).fetchone()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS rollups (resolution INTEGER, family TEXT, "
+            "dimension TEXT, bucket INTEGER, value TEXT, events INTEGER, "
+            "error INTEGER, "
+            "PRIMARY KEY (resolution, family, dimension, bucket, value)) "
+            "WITHOUT ROWID"
+        )
+        if new_rollups:
+            for family in STORE_FORMATS:
+                for arrays, event_times in self.stored_events(connection, family):
+                    self.update_rollups(connection, family, arrays, event_times)
+        # Events per source network of the families with counted source IPs,
+        # filled from their IP counts the first time
+        if self.network_counter is not None:
+            new_network_counts = not connection.execute(
+                "SELECT 1 FROM sqlite_master "
+                "WHERE type = 'table' AND name = 'network_counts'"
+            ).fetchone()
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS network_counts (family TEXT, level TEXT, "
+                "network TEXT, frequency INTEGER, "
+                "PRIMARY KEY (family, level, network)) WITHOUT ROWID"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS network_counts_frequency "
+                "ON network_counts (family, level, frequency)"
+            )
+            if new_network_counts:
+                for family, columns in COUNTED_COLUMNS.items():
+                    if "ip_address" in columns:
+                        counts = pd.read_sql_query(
+                            "SELECT value AS ip_address, frequency FROM value_counts "
+                            "WHERE family = ? AND field = 'ip_address'",
+                            connection,
+                            params=(family,),
+                        )
+                        self.count_networks(connection, family, counts)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS tail_offsets (family TEXT, device INTEGER, "
+            "inode INTEGER, position INTEGER, fingerprint INTEGER, "
+            "finished INTEGER DEFAULT 0, PRIMARY KEY (family, device, inode))"
+        )
+        if "finished" not in [
+            row[1] for row in connection.execute("PRAGMA table_info(tail_offsets)")
+        ]:
+            connection.execute(
+                "ALTER TABLE tail_offsets ADD COLUMN finished INTEGER DEFAULT 0"
+            )
+        connection.execute("PRAGMA user_version = 1")
+        # Parquet archives (see log_archive.py) whose events are stored, either
+        # ingested from the archive or read from the segment before it was
+        # compacted
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS archives (family TEXT, name TEXT, "
+            "PRIMARY KEY (family, name)) WITHOUT ROWID"
+        )
+
+    def stored_events(self, connection, family):
+        """Yield the stored events of a family in batches, like insert_events() gets them."""
+        columns = STORE_FORMATS[family]["columns"]
+        for events in pd.read_sql_query(
+            f"SELECT {', '.join(map(quote, columns))}, event_time "
+            f"FROM {quote(family)}",
+            connection,
+            chunksize=1 << 20,
+        ):
+            arrays = {
+                column: pa.array(events[column], type=pa.string()) for column in columns
+            }
+            yield arrays, pa.array(
+                events["event_time"], type=pa.int64(), from_pandas=True
+            )
+
+    def tail(self, family, log_file_path):
+        """Return the LogTail of a family, resuming from the saved read positions."""
+        if family not in self.tails:
+            tail = LogTail(log_file_path)
+            with self.connect() as connection:
+                rows = connection.execute(
+                    "SELECT device, inode, position, fingerprint, finished "
+                    "FROM tail_offsets WHERE family = ?",
+                    (family,),
+                ).fetchall()
+            tail.offsets = {
+                (device, inode): (offset, fingerprint)
+                for device, inode, offset, fingerprint, _ in rows
+            }
+            tail.finished = {
+                (device, inode) for device, inode, _, _, finished in rows if finished
+            }
+            self.tails[family] = tail
+        return self.tails[family]
+
+    def ingest_logs(self, log_files):
+        """Parse and store the lines appended to the logs since the last ingest.
+
+        log_files maps a family to its log path. Returns the number of new
+        events of each family. The lines are read, parsed and stored in batches
+        of at most INGEST_BATCH_BYTES per log, each in its own transaction, so a
+        large backlog or compressed history never has to fit in memory at once.
+        Parquet archives of compacted segments are stored first, unless their
+        events were already read from the segment.
+        """
+        with self.lock:
+            # Archives hold older lines than the segments left
+            new_events = self.ingest_archives(log_files)
+            tails = {
+                family: self.tail(family, path) for family, path in log_files.items()
+            }
+            while True:
+                saved = {
+                    family: (dict(tail.offsets), set(tail.finished))
+                    for family, tail in tails.items()
+                }
+                try:
+                    new_rows = parse_new_lines(
+                        [
+                            (tail, STORE_FORMATS[family])
+                            for family, tail in tails.items()
+                        ],
+                        limit=INGEST_BATCH_BYTES,
+                    )
+                    with self.connect() as connection:
+                        for family, arrays in zip(tails, new_rows):
+                            self.insert_events(connection, family, arrays)
+                            self.save_offsets(connection, family, tails[family])
+                except Exception:
+                    # Read the same lines again next time
+                    for family, tail in tails.items():
+                        tail.offsets, tail.finished = saved[family]
+                    raise
+                for family, arrays in zip(tails, new_rows):
+                    new_events[family] += len(
+                        arrays[STORE_FORMATS[family]["columns"][0]]
+                    )
+                # Done once a batch found nothing new to read
+                if all(
+                    tail.offsets == saved[family][0] for family, tail in tails.items()
+                ):
+                    return new_events
+
+    def ingest_archives(self, log_files):
+        """Store the events of the Parquet archives not stored yet, one transaction each."""
+        new_events = dict.fromkeys(log_files, 0)
+        for family, path in log_files.items():
+            archives = archived_log_files(path)
+            if not archives:
+                continue
+            with self.connect() as connection:
+                stored = {
+                    name
+                    for (name,) in connection.execute(
+                        "SELECT name FROM archives WHERE family = ?", (family,)
+                    )
+                }
+            columns = STORE_FORMATS[family]["columns"]
+            for archive in archives:
+                name = os.path.basename(archive)
+                if name in stored:
+                    continue
+                with self.connect() as connection:
+                    for batch in pq.ParquetFile(archive).iter_batches(
+                        batch_size=ARCHIVE_BATCH_ROWS, columns=columns
+                    ):
+                        arrays = {
+                            column: batch.column(column).cast(pa.large_string())
+                            for column in columns
+                        }
+                        self.insert_events(connection, family, arrays)
+                        new_events[family] += batch.num_rows
+                    self.record_archive(connection, family, name)
+        return new_events
+
+    def segment_ingested(self, family, file_id, fingerprint, size, compressed):
+        """Return whether the events of a rotation segment are all stored.
+
+        Plain segments must have been read up to size, compressed ones to the end.
+        """
+        with self.connect() as connection:
+            row = connection.execute(
+                "SELECT position, fingerprint, finished FROM tail_offsets "
+                "WHERE family = ? AND device = ? AND inode = ?",
+                (family, *file_id),
+            ).fetchone()
+        if row is None or row[1] != fingerprint:
+            return False
+        return bool(row[2]) if compressed else row[0] >= size
+
+    def record_archive(self, connection, family, name):
+        """Remember that the events of an archive are stored."""
+        connection.execute(
+            "INSERT OR IGNORE INTO archives VALUES (?, ?)", (family, name)
+        )
+
+    def insert_events(self, connection, family, arrays):
+        """Insert parsed rows (Arrow arrays per column) and count their values."""
+        columns = STORE_FORMATS[family]["columns"]
+        if not len(arrays[columns[0]]):
+            return
+        event_times = pa.array(
+            utc_timestamps(arrays["timestamp"]), from_pandas=True
+        ).cast(pa.int64())
+        connection.executemany(
+            f"INSERT INTO {quote(family)} ({', '.join(map(quote, columns))}, "
+            f"event_time) VALUES ({', '.join('?' * (len(columns) + 1))})",
+            zip(
+                *(arrays[column].to_pylist() for column in columns),
+                event_times.to_pylist(),
+            ),
+        )
+        self.count_distinct(connection, family, arrays, event_times)
+        self.update_rollups(connection, family, arrays, event_times)
+        for column in TOP_K_COLUMNS[family]:
+            counts = pc.value_counts(arrays[column])
+            summary = self.load_top_k(connection, family, column)
+            summary.update(
+                counts.field("values").to_numpy(zero_copy_only=False),
+                counts.field("counts").to_numpy(),
+            )
+            self.save_top_k(connection, family, column, summary)
+        for column in COUNTED_COLUMNS[family]:
+            counts = pc.value_counts(arrays[column])
+            connection.executemany(
+                "INSERT INTO value_counts VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (family, field, value) "
+                "DO UPDATE SET frequency = frequency + excluded.frequency",
+                zip(
+                    repeat(family),
+                    repeat(column),
+                    counts.field("values").to_pylist(),
+                    counts.field("counts").to_pylist(),
+                ),
+            )
+            if column == "ip_address" and self.network_counter is not None:
+                self.count_networks(
+                    connection,
+                    family,
+                    pd.DataFrame(
+                        {
+                            "ip_address": counts.field("values").to_numpy(
+                                zero_copy_only=False
+                            ),
+                            "frequency": counts.field("counts").to_numpy(),
+                        }
+                    ),
+                )
+
+    def count_networks(self, connection, family, counts):
+        """Add (ip_address, frequency) counts to the per network counts."""
+        networks = self.network_counter(counts)
+        connection.executemany(
+            "INSERT INTO network_counts VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (family, level, network) "
+            "DO UPDATE SET frequency = frequency + excluded.frequency",
+            zip(
+                repeat(family),
+                networks["level"].tolist(),
+                networks["network"].tolist(),
+                networks["frequency"].tolist(),
+            ),
+        )
+
+    def load_top_k(self, connection, family, column):
+        """Read the Space-Saving summary of a column."""
+        counters = pd.read_sql_query(
+            "SELECT value, frequency, error FROM top_k WHERE family = ? AND field = ?",
+            connection,
+            params=(family, column),
+            index_col="value",
+        )
+        return SpaceSaving(
+            self.top_k_capacity, counters.rename_axis(None).astype("int64")
+        )
+
+    def save_top_k(self, connection, family, column, summary):
+        """Replace the stored counters of a column with those of summary."""
+        connection.execute(
+            "DELETE FROM top_k WHERE family = ? AND field = ?", (family, column)
+        )
+        connection.executemany(
+            "INSERT INTO top_k VALUES (?, ?, ?, ?, ?)",
+            zip(
+                repeat(family),
+                repeat(column),
+                summary.counters.index.tolist(),
+                summary.counters["frequency"].tolist(),
+                summary.counters["error"].tolist(),
+            ),
+        )
+
+    def exact_counts(
+        self, connection, family, column, limit=None, start=None, end=None
+    ):
+        """Count the values of a column over the stored events (from start to end,
+        see time_range()), most frequent first."""
+        conditions, parameters = time_range(start, end)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        rows = connection.execute(
+            f"SELECT {quote(column)}, COUNT(*) AS frequency FROM {quote(family)} "
+            f"{where}GROUP BY {quote(column)} "
+            f"ORDER BY frequency DESC, {quote(column)} LIMIT ?",
+            (*parameters, -1 if limit is None else limit),
+        ).fetchall()
+        return pd.DataFrame(rows, columns=[column, "frequency"])
+
+    def count_distinct(self, connection, family, arrays, event_times):
+        """Add rows to the HyperLogLogs of the days they happened on."""
+        buckets = pc.fill_null(
+            pc.floor(pc.divide(pc.cast(event_times, pa.float64()), DAY_MS)),
+            NO_TIMESTAMP_BUCKET,
+        ).to_numpy()
+        for field, columns in DISTINCT_FIELDS[family].items():
+            values = arrays[columns[0]]
+            if len(columns) > 1:
+                values = pc.binary_join_element_wise(
+                    *(arrays[column].cast(pa.large_string()) for column in columns),
+                    pa.scalar("\0", pa.large_string()),
+                )
+            hashes = hash_strings(values.to_numpy(zero_copy_only=False))
+            for bucket in np.unique(buckets):
+                row = connection.execute(
+                    "SELECT registers FROM distinct_counts "
+                    "WHERE family = ? AND field = ? AND bucket = ?",
+                    (family, field, int(bucket)),
+                ).fetchone()
+                counter = HyperLogLog.from_bytes(row[0]) if row else HyperLogLog()
+                counter.add_hashes(hashes[buckets == bucket])
+                connection.execute(
+                    "INSERT OR REPLACE INTO distinct_counts VALUES (?, ?, ?, ?)",
+                    (family, field, int(bucket), counter.to_bytes()),
+                )
+
+    def update_rollups(self, connection, family, arrays, event_times):
+        """Add rows to the rollups of each resolution and drop the expired buckets."""
+        times = event_times.to_numpy(zero_copy_only=False)
+        timed = ~np.isnan(times)
+        events = pd.DataFrame(
+            {
+                "time": times[timed].astype(np.int64),
+                "ip_address": arrays[ROLLUP_IP_COLUMNS[family]].to_numpy(
+                    zero_copy_only=False
+                )[timed],
+            }
+        )
+        if self.country_lookup is not None:
+            # Never waits for a lookup, the IPs not known yet are pending
+            countries = self.country_lookup(events["ip_address"].unique())
+            events["known"] = events["ip_address"].isin(list(countries))
+            events["country"] = events["ip_address"].map(countries)
+
+        now = int(time.time() * 1000)
+        for resolution, retention in ROLLUP_RESOLUTIONS.items():
+            cutoff = None if retention is None else now - retention
+            if cutoff is not None:
+                for table in ["rollups", "country_pending"]:
+                    connection.execute(
+                        f"DELETE FROM {table} "
+                        "WHERE resolution = ? AND family = ? AND bucket < ?",
+                        (resolution, family, cutoff - cutoff % resolution),
+                    )
+            kept = events if cutoff is None else events[events["time"] >= cutoff]
+            if kept.empty:
+                continue
+            kept = kept.assign(bucket=kept["time"] // resolution * resolution)
+
+            self.add_rollup_counts(
+                connection,
+                resolution,
+                family,
+                "",
+                kept.groupby("bucket").size().rename("events").reset_index(),
+            )
+            if "country" in kept.columns:
+                known = kept[kept["known"]]
+                self.add_rollup_counts(
+                    connection,
+                    resolution,
+                    family,
+                    "country",
+                    known.groupby(["bucket", "country"]).size().reset_index(),
+                )
+                pending = kept[~kept["known"]].groupby(["bucket", "ip_address"])
+                pending = pending.size().rename("events").reset_index()
+                connection.executemany(
+                    "INSERT INTO country_pending VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (resolution, family, bucket, ip) "
+                    "DO UPDATE SET events = events + excluded.events",
+                    zip(
+                        repeat(resolution),
+                        repeat(family),
+                        pending["bucket"].tolist(),
+                        pending["ip_address"].tolist(),
+                        pending["events"].tolist(),
+                        repeat(now),
+                    ),
+                )
+
+            batch = kept.groupby(["bucket", "ip_address"]).size()
+            batch = batch.rename("frequency").rename_axis(["group", "value"])
+            batch = batch.reset_index()
+            first, last = int(batch["group"].min()), int(batch["group"].max())
+            counters = pd.read_sql_query(
+                'SELECT bucket AS "group", value, events AS frequency, error '
+                "FROM rollups WHERE resolution = ? AND family = ? "
+                "AND dimension = 'ip_address' AND bucket BETWEEN ? AND ?",
+                connection,
+                params=(resolution, family, first, last),
+            )
+            counters = counters.astype(
+                {"group": "int64", "frequency": "int64", "error": "int64"}
+            )
+            counters = counters[counters["group"].isin(batch["group"])]
+            counters = merge_grouped_top_k(counters, batch, ROLLUP_TOP_IPS)
+            connection.executemany(
+                "DELETE FROM rollups WHERE resolution = ? AND family = ? "
+                "AND dimension = 'ip_address' AND bucket = ?",
+                [
+                    (resolution, family, bucket)
+                    for bucket in batch["group"].unique().tolist()
+                ],
+            )
+            connection.executemany(
+                "INSERT INTO rollups VALUES (?, ?, 'ip_address', ?, ?, ?, ?)",
+                zip(
+                    repeat(resolution),
+                    repeat(family),
+                    counters["group"].tolist(),
+                    counters["value"].tolist(),
+                    counters["frequency"].tolist(),
+                    counters["error"].tolist(),
+                ),
+            )
+
+    def add_rollup_counts(self, connection, resolution, family, dimension, counts):
+        """Add the events of counts (bucket, events and, but for the totals, a
+        column named after the dimension) to the rollups."""
+        counts = counts.rename(columns={0: "events"})
+        connection.executemany(
+            "INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, 0) "
+            "ON CONFLICT (resolution, family, dimension, bucket, value) "
+            "DO UPDATE SET events = events + excluded.events",
+            zip(
+                repeat(resolution),
+                repeat(family),
+                repeat(dimension),
+                counts["bucket"].tolist(),
+                counts[dimension].tolist() if dimension else repeat(""),
+                counts["events"].tolist(),
+            ),
+        )
+
+    def backfill_countries(self):
+        """Move the pending events of the IPs whose country is now known to the
+        country rollups, return how many IPs were resolved.
+
+        Called after every refresh: the lookups of the pending IPs were started
+        when they were ingested (or are started again, for the IPs whose
+        lookup failed), never waited for. Events still pending after
+        COUNTRY_PENDING_TTL are left without a country.
+        """
+        if self.country_lookup is None:
+            return 0
+        with self.lock, self.connect() as connection:
+            connection.execute(
+                "DELETE FROM country_pending WHERE added < ?",
+                (int(time.time() * 1000) - COUNTRY_PENDING_TTL,),
+            )
+            ips = [
+                row[0]
+                for row in connection.execute(
+                    "SELECT DISTINCT ip FROM country_pending"
+                ).fetchall()
+            ]
+            if not ips:
+                return 0
+            countries = self.country_lookup(np.array(ips, dtype=object))
+            if not countries:
+                return 0
+            resolved = list(countries)
+            pending = pd.concat(
+                pd.read_sql_query(
+                    "SELECT resolution, family, bucket, ip, events "
+                    f"FROM country_pending WHERE ip IN ({', '.join('?' * len(batch))})",
+                    connection,
+                    params=batch,
+                )
+                for batch in (
+                    resolved[start : start + 500]
+                    for start in range(0, len(resolved), 500)
+                )
+            )
+            pending["country"] = pending["ip"].map(countries)
+            counts = pending.groupby(
+                ["resolution", "family", "bucket", "country"], as_index=False
+            )["events"].sum()
+            for (resolution, family), group in counts.groupby(["resolution", "family"]):
+                self.add_rollup_counts(
+                    connection, int(resolution), family, "country", group
+                )
+            connection.executemany(
+                "DELETE FROM country_pending WHERE ip = ?", [(ip,) for ip in resolved]
+            )
+        return len(resolved)
+
+    def save_offsets(self, connection, family, tail):
+        """Replace the saved read positions of a family with those of its LogTail."""
+        connection.execute("DELETE FROM tail_offsets WHERE family = ?", (family,))
+        connection.executemany(
+            "INSERT INTO tail_offsets VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (family, *file_id, offset, fingerprint, file_id in tail.finished)
+                for file_id, (offset, fingerprint) in tail.offsets.items()
+            ],
+        )
+
+    def count_events(self, family, start=None, end=None):
+        """Return the number of stored events of a family (from start to end, see
+        time_range())."""
+        with self.connect() as connection:
+            if start is not None or end is not None:
+                conditions, parameters = time_range(start, end)
+                return connection.execute(
+                    f"SELECT COUNT(*) FROM {quote(family)} "
+                    f"WHERE {' AND '.join(conditions)}",
+                    parameters,
+                ).fetchone()[0]
+            # Events are never deleted, so the largest id is their number, read
+            # from the end of the primary key instead of counting every row
+            return connection.execute(
+                f"SELECT COALESCE(MAX(id), 0) FROM {quote(family)}"
+            ).fetchone()[0]
+
+    def value_counts(self, family, column, limit=None, start=None, end=None):
+        """Return the values of a column with their frequency, most frequent first.
+
+        With start or end (see time_range()) they are counted from the events of
+        that range instead of the value_counts table.
+        """
+        with self.connect() as connection:
+            if start is not None or end is not None:
+                return self.exact_counts(
+                    connection, family, column, limit=limit, start=start, end=end
+                )
+            rows = connection.execute(
+                "SELECT value, frequency FROM value_counts "
+                "WHERE family = ? AND field = ? ORDER BY frequency DESC LIMIT ?",
+                (family, column, -1 if limit is None else limit),
+            ).fetchall()
+        return pd.DataFrame(rows, columns=[column, "frequency"])
+
+    def top_10(
+        self, family, column, truncate=False, max_length=30, start=None, end=None
+    ):
+        """Top 10 values of a column, shaped like top_10_calculator() results.
+
+        With start or end (see time_range()) they are counted exactly from the
+        events of that range, the summaries cover all the stored events.
+        """
+        ranged = start is not None or end is not None
+        try:
+            with self.connect() as connection:
+                if self.top_k_error and not ranged:
+                    rows = connection.execute(
+                        "SELECT value, frequency FROM top_k "
+                        "WHERE family = ? AND field = ? "
+                        "ORDER BY frequency DESC, value LIMIT 10",
+                        (family, column),
+                    ).fetchall()
+                    result = pd.DataFrame(rows, columns=[column, "frequency"])
+                else:
+                    result = self.exact_counts(
+                        connection, family, column, limit=10, start=start, end=end
+                    )
+            if result.empty:
+                return pd.DataFrame({column: ["No Data"], "frequency": [0]})
+            if truncate:
+                result[column] = result[column].apply(
+                    lambda x: truncate_text(str(x), max_length)
+                )
+            return result
+        except sqlite3.Error as e:
+            print(f"[ERROR] Error in top_10: {e}")
+            return pd.DataFrame({column: ["Error"], "frequency": [0]})
+
+    def top_networks(self, families, level, limit=10, start=None, end=None):
+        """Most frequent source networks of a level (see NETWORK_LEVELS) over
+        several families, with their event counts.
+
+        With start or end (see time_range()) the source IPs of the events of
+        that range are counted and rolled up by the network_counter.
+        """
+        if start is not None or end is not None:
+            return self.range_networks(families, level, limit, start, end)
+        try:
+            with self.connect() as connection:
+                rows = connection.execute(
+                    "SELECT network, SUM(frequency) AS frequency FROM network_counts "
+                    f"WHERE level = ? AND family IN ({', '.join('?' * len(families))}) "
+                    "GROUP BY network ORDER BY frequency DESC, network LIMIT ?",
+                    (level, *families, limit),
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"[ERROR] Error in top_networks: {e}")
+            rows = []
+        return pd.DataFrame(rows, columns=["network", "frequency"])
+
+    def range_networks(self, families, level, limit, start, end):
+        """top_networks() of the events from start to end."""
+        families = [
+            family for family in families if "ip_address" in COUNTED_COLUMNS[family]
+        ]
+        if self.network_counter is None or not families:
+            return pd.DataFrame(columns=["network", "frequency"])
+        try:
+            counts = pd.concat(
+                [
+                    self.value_counts(family, "ip_address", start=start, end=end)
+                    for family in families
+                ]
+            )
+        except sqlite3.Error as e:
+            print(f"[ERROR] Error in top_networks: {e}")
+            return pd.DataFrame(columns=["network", "frequency"])
+        counts = counts.astype({"frequency": "int64"})
+        counts = counts.groupby("ip_address", as_index=False)["frequency"].sum()
+        if counts.empty:
+            return pd.DataFrame(columns=["network", "frequency"])
+        networks = self.network_counter(counts)
+        networks = networks[networks["level"] == level]
+        networks = networks.groupby("network", as_index=False)["frequency"].sum()
+        networks = networks.sort_values(
+            ["frequency", "network"], ascending=[False, True]
+        )
+        return networks.head(limit).reset_index(drop=True)
+
+    def distinct_values(self, families, column, start=None, end=None):
+        """Return the distinct values of a column across several families, of the
+        events from start to end (see time_range()) if either is given."""
+        with self.connect() as connection:
+            if start is not None or end is not None:
+                conditions, parameters = time_range(start, end)
+                where = " AND ".join(conditions)
+                rows = connection.execute(
+                    " UNION ".join(
+                        f"SELECT {quote(column)} FROM {quote(family)} WHERE {where}"
+                        for family in families
+                    ),
+                    parameters * len(families),
+                ).fetchall()
+                return pd.DataFrame([row[0] for row in rows], columns=[column])
+            rows = connection.execute(
+                "SELECT DISTINCT value FROM value_counts "
+                f"WHERE field = ? AND family IN ({', '.join('?' * len(families))})",
+                (column, *families),
+            ).fetchall()
+        return pd.DataFrame([row[0] for row in rows], columns=[column])
+
+    def distinct_counter(self, sources, start=None, end=None):
+        """Merged HyperLogLog of (family, field) sources.
+
+        start and end (milliseconds since 1970) restrict it to the days they
+        cover, events without a timestamp are only counted without a range.
+        The result can be merged with the counters of other sensors.
+        """
+        first, last = NO_TIMESTAMP_BUCKET, -NO_TIMESTAMP_BUCKET
+        if start is not None or end is not None:
+            first = NO_TIMESTAMP_BUCKET + 1 if start is None else start // DAY_MS
+            last = last if end is None else end // DAY_MS
+        counter = HyperLogLog()
+        with self.connect() as connection:
+            for family, field in sources:
+                rows = connection.execute(
+                    "SELECT registers FROM distinct_counts "
+                    "WHERE family = ? AND field = ? AND bucket BETWEEN ? AND ?",
+                    (family, field, first, last),
+                )
+                for (registers,) in rows:
+                    counter.merge(HyperLogLog.from_bytes(registers))
+        return counter
+
+    def distinct_count(self, sources, start=None, end=None):
+        """Estimated number of distinct values of (family, field) sources."""
+        try:
+            return self.distinct_counter(sources, start, end).count()
+        except sqlite3.Error as e:
+            print(f"[ERROR] Error in distinct_count: {e}")
+            return 0
+
+    def time_series(self, families, start=None, end=None, dimension=""):
+        """Event counts over time of the given families, from the rollups.
+
+        start and end are milliseconds since 1970 and default to the span of the
+        stored events. The finest resolution that still covers start and keeps
+        the series under MAX_SERIES_POINTS buckets is used. dimension is "" for
+        the event totals, "country" or "ip_address" (the most frequent source IPs
+        of each bucket). Returns a dataframe with time, family, value and events
+        columns, and the resolution in milliseconds.
+        """
+        placeholders = ", ".join("?" * len(families))
+        with self.connect() as connection:
+            if start is None or end is None:
+                first, last = connection.execute(
+                    "SELECT MIN(bucket), MAX(bucket) FROM rollups "
+                    "WHERE resolution = ? AND dimension = '' "
+                    f"AND family IN ({placeholders})",
+                    (DAY_MS, *families),
+                ).fetchone()
+                if first is None:
+                    return (
+                        pd.DataFrame(columns=["time", "family", "value", "events"]),
+                        DAY_MS,
+                    )
+                start = first if start is None else start
+                end = last + DAY_MS - 1 if end is None else end
+
+            # Finest first, the coarsest covers everything
+            now = int(time.time() * 1000)
+            resolution = max(ROLLUP_RESOLUTIONS)
+            for candidate, retention in ROLLUP_RESOLUTIONS.items():
+                if (retention is None or start >= now - retention) and (
+                    end - start
+                ) // candidate < MAX_SERIES_POINTS:
+                    resolution = candidate
+                    break
+            rows = connection.execute(
+                "SELECT bucket, family, value, events FROM rollups "
+                f"WHERE resolution = ? AND dimension = ? AND family IN ({placeholders}) "
+                "AND bucket BETWEEN ? AND ? ORDER BY bucket",
+                (resolution, dimension, *families, start - start % resolution, end),
+            ).fetchall()
+        series = pd.DataFrame(rows, columns=["time", "family", "value", "events"])
+        # Shown in local time, like the log timestamps
+        series["time"] = pd.to_datetime(
+            shift_time_zone(series["time"].to_numpy(np.int64), to_utc=False)
+        )
+        return series, resolution
+
+    def query_events(
+        self, family, offset, limit, sort_by=None, filters=(), start=None, end=None
+    ):
+        """Return one page of the events of a family and the number of matching events.
+
+        sort_by is a list of (column, ascending), newest first by default, and
+        filters a list of (column, operator, value) that must all match, with the
+        operators of FILTER_OPERATORS. start and end restrict the events to a time
+        range, see time_range(). Sorting on timestamp uses the indexed
+        event_time. Raises ValueError for an unknown column or operator.
+        """
+        columns = STORE_FORMATS[family]["columns"]
+        conditions, parameters = time_range(start, end)
+        for column, operator, value in filters:
+            if column not in columns or operator not in FILTER_OPERATORS:
+                raise ValueError(f"Cannot filter {column!r} with {operator!r}")
+            value = str(value)
+            if operator in ["contains", "datestartswith"]:
+                value = re.sub(r"([\\%_])", r"\\\1", value)
+                value = f"%{value}%" if operator == "contains" else f"{value}%"
+            conditions.append(f"{quote(column)} {FILTER_OPERATORS[operator]}")
+            parameters.append(value)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+
+        order = []
+        for column, ascending in sort_by or [("timestamp", False)]:
+            if column not in columns:
+                raise ValueError(f"Cannot sort on {column!r}")
+            column = "event_time" if column == "timestamp" else column
+            order.append(f"{quote(column)} {'ASC' if ascending else 'DESC'}")
+        # Ties in a stable order, so pages neither repeat nor skip rows
+        order.append(f"id {'ASC' if sort_by else 'DESC'}")
+
+        with self.connect() as connection:
+            rows = connection.execute(
+                f"SELECT {', '.join(map(quote, columns))} FROM {quote(family)} "
+                f"{where}ORDER BY {', '.join(order)} LIMIT ? OFFSET ?",
+                (*parameters, limit, offset),
+            ).fetchall()
+            if conditions:
+                total = connection.execute(
+                    f"SELECT COUNT(*) FROM {quote(family)} {where}", parameters
+                ).fetchone()[0]
+        if not conditions:
+            total = self.count_events(family)
+        return pd.DataFrame(rows, columns=columns), total
+
+    def events_since(self, family, last_id, limit):
+        """Return the (at most limit) latest events of a family stored after the
+        event with id last_id, in insertion order, with their id."""
+        columns = ["id", *STORE_FORMATS[family]["columns"]]
+        with self.connect() as connection:
+            rows = connection.execute(
+                f"SELECT {', '.join(map(quote, columns))} FROM {quote(family)} "
+                "WHERE id > ? ORDER BY id DESC LIMIT ?",
+                (last_id, limit),
+            ).fetchall()
+        return pd.DataFrame(rows[::-1], columns=columns)
+
+    def recent_events(self, family, limit):
+        """Return the latest events of a family, newest first."""
+        columns = STORE_FORMATS[family]["columns"]
+        with self.connect() as connection:
+            rows = connection.execute(
+                f"SELECT {', '.join(map(quote, columns))} FROM {quote(family)} "
+                "ORDER BY event_time DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return pd.DataFrame(rows, columns=columns)
@@ -0,0 +1,542 @@
+# Import library dependencies.
+import csv
+import ipaddress
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import maxminddb
+except ImportError:  # Only needed for .mmdb databases
+    maxminddb = None
+
+# This file resolves IP addresses to country codes from a local IP range
+# database, so the dashboard's country statistics need no network access (see
+# GEOIP_PROVIDER in public.env). The ranges are kept in sorted arrays searched
+# with numpy's binary search. API lookups are made in the background by a rate
+# limited client and remembered in a SQLite cache. Source networks (ASNs) are
+# looked up with a longest prefix match in a local routing prefix table.
+
+# Dotted quad IPv4 addresses, converted to integers with Arrow string kernels
+DOTTED_IPV4 = r"^[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}$"
+OCTET_SHIFTS = np.array([24, 16, 8, 0], dtype=np.uint32)
+
+# Country codes meaning "unknown" in the usual databases
+UNKNOWN_COUNTRIES = {"", "-", "ZZ"}
+
+
+# Seconds a cached country is valid, and a lookup that found none or failed
+DEFAULT_CACHE_TTL = 30 * 24 * 60 * 60
+DEFAULT_NEGATIVE_CACHE_TTL = 60 * 60
+
+# Bound parameters per cache query, below SQLite's limit
+CACHE_QUERY_IPS = 500
+
+# Longest wait between two retries of a failed API request, in seconds
+MAX_BACKOFF = 60
+
+# Address bits of each IP version
+ADDRESS_BITS = {4: 32, 6: 128}
+ADDRESS_FAMILIES = {4: socket.AF_INET, 6: socket.AF_INET6}
+
+# IPv4-mapped IPv6 addresses (::ffff:1.2.3.4) are looked up as IPv4
+IPV4_MAPPED_PREFIX = 0xFFFF << 32
+
+
+def integer_key(value):
+    """Return the IP version and value of an integer IPv4 or IPv6 address."""
+    if value <= 0xFFFFFFFF:
+        return 4, value
+    if value >> 32 == 0xFFFF:
+        return 4, value - IPV4_MAPPED_PREFIX
+    return 6, value
+
+
+def address_key(text):
+    """Return the IP version and integer value of an IP address string.
+
+    Raises ValueError if it is not an address. inet_pton() is much faster than
+    the ipaddress module, which matters when loading millions of ranges.
+    """
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, text), "big")
+    except OSError:
+        pass
+    try:
+        packed = socket.inet_pton(socket.AF_INET6, text)
+    except (OSError, ValueError):
+        raise ValueError(f"Not an IP address: {text!r}") from None
+    return integer_key(int.from_bytes(packed, "big"))
+
+
+def parse_range_bound(text):
+    """Parse a range bound given as an IP address or as its integer value."""
+    text = text.strip()
+    if text.isdigit():
+        return integer_key(int(text))
+    return address_key(text)
+
+
+def network_range(network):
+    """Return the (version, start, end) of an ipaddress network."""
+    version, start = integer_key(int(network.network_address))
+    _, end = integer_key(int(network.broadcast_address))
+    return version, start, end
+
+
+def csv_ranges(path):
+    """Yield (version, start, end, country) rows of a CSV range database.
+
+    Rows are either "start,end,country,..." with the bounds as addresses
+    (DB-IP) or integers (IP2Location), or "network,country" with a CIDR
+    network. A header and rows that do not parse are skipped.
+    """
+    with open(path, newline="", encoding="utf-8") as file:
+        for row in csv.reader(file):
+            try:
+                if "/" in row[0]:
+                    version, start, end = network_range(
+                        ipaddress.ip_network(row[0].strip(), strict=False)
+                    )
+                    country = row[1]
+                else:
+                    version, start = parse_range_bound(row[0])
+                    end_version, end = parse_range_bound(row[1])
+                    country = row[2]
+                    if end_version != version:
+                        continue
+            except (ValueError, IndexError):
+                continue
+            yield version, start, end, country
+
+
+def mmdb_ranges(path):
+    """Yield (version, start, end, country) rows of a MaxMind DB (GeoLite2, DB-IP)."""
+    if maxminddb is None:
+        raise OSError(f"maxminddb is not installed, cannot read {path}")
+    with maxminddb.open_database(path) as reader:
+        for network, record in reader:
+            record = record or {}
+            country = record.get("country") or record.get("registered_country") or {}
+            yield (*network_range(network), country.get("iso_code") or "")
+
+
+class GeoIPDatabase:
+    """IP range to country code table.
+
+    The ranges of each IP version are sorted by their first address. IPv4
+    bounds are uint32, IPv6 bounds 16 byte big-endian strings, which numpy
+    compares (and searchsorted() orders) like the addresses. Ranges must not
+    overlap, addresses outside every range have no country.
+    """
+
+    def __init__(self, ranges):
+        rows = {4: [], 6: []}
+        for version, start, end, country in ranges:
+            country = country.strip().upper()
+            rows[version].append(
+                (start, end, None if country in UNKNOWN_COUNTRIES else country)
+            )
+        self.tables = {}
+        for version, version_rows in rows.items():
+            version_rows.sort(key=lambda row: row[0])
+            starts = [row[0] for row in version_rows]
+            ends = [row[1] for row in version_rows]
+            self.tables[version] = (
+                self.keys(version, starts),
+                self.keys(version, ends),
+                np.array([row[2] for row in version_rows], dtype=object),
+            )
+
+    @staticmethod
+    def keys(version, values):
+        """Return the searchable array of integer addresses of one IP version."""
+        if version == 4:
+            return np.array(values, dtype=np.uint32)
+        return np.array([value.to_bytes(16, "big") for value in values], dtype="S16")
+
+    def __len__(self):
+        return sum(len(starts) for starts, _, _ in self.tables.values())
+
+    def search(self, version, keys):
+        """Return the country code of each key (see keys()), None outside the ranges."""
+        starts, ends, countries = self.tables[version]
+        if not len(starts):
+            return np.full(len(keys), None, dtype=object)
+        index = np.maximum(np.searchsorted(starts, keys, side="right") - 1, 0)
+        found = (starts[index] <= keys) & (keys <= ends[index])
+        return np.where(found, countries[index], None)
+
+    def countries(self, ips):
+        """Return the country code of each IP address string (an array of
+        distinct addresses), None when it is unknown.
+
+        Dotted IPv4 addresses are converted to integers in bulk, the others (IPv6,
+        invalid) one by one, then each IP version is resolved with a single
+        searchsorted() over all its addresses.
+        """
+        ips = pa.array(ips, type=pa.string(), from_pandas=True)
+        result = np.full(len(ips), None, dtype=object)
+        dotted = (
+            pc.match_substring_regex(ips, DOTTED_IPV4)
+            .fill_null(False)
+            .to_numpy(zero_copy_only=False)
+        )
+        rows = np.flatnonzero(dotted)
+        if len(rows):
+            octets = pc.list_flatten(pc.split_pattern(ips.take(rows), "."))
+            octets = pc.cast(octets, pa.uint32()).to_numpy().reshape(-1, 4)
+            valid = (octets <= 255).all(axis=1)
+            keys = np.bitwise_or.reduce(octets << OCTET_SHIFTS, axis=1)
+            result[rows[valid]] = self.search(4, keys[valid].astype(np.uint32))
+
+        others = {4: ([], []), 6: ([], [])}
+        for row in np.flatnonzero(~dotted):
+            try:
+                version, value = address_key(ips[row].as_py().strip())
+            except (ValueError, AttributeError):
+                continue
+            others[version][0].append(row)
+            others[version][1].append(value)
+        for version, (version_rows, values) in others.items():
+            if version_rows:
+                result[version_rows] = self.search(version, self.keys(version, values))
+        return result
+
+    def country(self, ip):
+        """Return the country code of an IP address string, None when it is unknown."""
+        try:
+            version, value = address_key(ip.strip())
+        except (ValueError, AttributeError):
+            return None
+        return self.search(version, self.keys(version, [value]))[0]
+
+
+def network_label(version, value, length):
+    """Return the CIDR text of the length bit network of an integer address."""
+    bits = ADDRESS_BITS[version]
+    network = value >> (bits - length) << (bits - length)
+    address = socket.inet_ntop(
+        ADDRESS_FAMILIES[version], network.to_bytes(bits // 8, "big")
+    )
+    return f"{address}/{length}"
+
+
+def prefix_rows(path):
+    """Yield (version, network, length, label) rows of a prefix to ASN table.
+
+    Rows are "network/length,asn,organisation" (comma or tab separated, the
+    organisation is optional) or "address<tab>length<tab>asn" like CAIDA's
+    RouteViews pfx2as files. Multi-origin ASNs ("13335_209242") keep the
+    first. A header and rows that do not parse are skipped.
+    """
+    with open(path, newline="", encoding="utf-8") as file:
+        for line in file:
+            separator = "\t" if "\t" in line else ","
+            try:
+                if "/" in line.split(separator, 1)[0]:
+                    network, asn, *organisation = line.split(separator, 2)
+                    address, length = network.split("/")
+                else:
+                    address, length, asn, *organisation = line.split(separator, 3)
+                version, value = address_key(address.strip())
+                length = int(length)
+                asn = int(asn.strip().upper().removeprefix("AS").split("_")[0])
+            except (ValueError, IndexError):
+                continue
+            # IPv4-mapped prefixes are stored as IPv4
+            if version == 4 and ":" in address:
+                length -= 96
+            if not 0 <= length <= ADDRESS_BITS[version]:
+                continue
+            label = f"AS{asn} {''.join(organisation).strip()}".rstrip()
+            yield version, value, length, label
+
+
+class PrefixTable:
+    """Longest prefix match table, like a routing table.
+
+    Each prefix length has a hash table of its networks, searched from the
+    longest length in use down, so a lookup makes at most one probe per prefix
+    length (O(prefix length), like walking a binary trie) without the memory of
+    a trie node per bit. Used inline when events are ingested.
+    """
+
+    def __init__(self, rows):
+        self.tables = {4: {}, 6: {}}
+        for version, value, length, label in rows:
+            shift = ADDRESS_BITS[version] - length
+            self.tables[version].setdefault(length, {})[value >> shift] = label
+        # (length, networks) from the longest prefix
+        self.lengths = {
+            version: sorted(tables.items(), reverse=True)
+            for version, tables in self.tables.items()
+        }
+
+    def __len__(self):
+        return sum(
+            len(networks)
+            for tables in self.tables.values()
+            for networks in tables.values()
+        )
+
+    def match(self, version, value):
+        """Return the label of the longest prefix containing an integer address, or None."""
+        bits = ADDRESS_BITS[version]
+        for length, networks in self.lengths[version]:
+            label = networks.get(value >> (bits - length))
+            if label is not None:
+                return label
+        return None
+
+    def lookup(self, ip):
+        """Return the label of the longest prefix containing an IP address string, or None."""
+        try:
+            return self.match(*address_key(ip.strip()))
+        except (ValueError, AttributeError):
+            return None
+
+
+def load_prefixes(path):
+    """Load a prefix to ASN table (see prefix_rows())."""
+    return PrefixTable(prefix_rows(path))
+
+
+def load_database(path):
+    """Load a .mmdb or CSV range database."""
+    if str(path).endswith(".mmdb"):
+        return GeoIPDatabase(mmdb_ranges(path))
+    return GeoIPDatabase(csv_ranges(path))
+
+
+class GeoCache:
+    """SQLite cache of looked up country codes, kept across restarts.
+
+    A country is valid for ttl seconds. None, an IP without a country or whose
+    lookup failed, is only cached for negative_ttl seconds, so it is looked up
+    again soon. The database runs in WAL mode and each call uses its own
+    connection, so several dashboard processes and threads can share it.
+    """
+
+    def __init__(
+        self, path, ttl=DEFAULT_CACHE_TTL, negative_ttl=DEFAULT_NEGATIVE_CACHE_TTL
+    ):
+        self.path = str(path)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        with self.connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS countries ("
+                "ip TEXT PRIMARY KEY, country TEXT, expires REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+
+    @contextmanager
+    def connect(self):
+        """Open a connection, commit on success and roll back on error."""
+        with closing(sqlite3.connect(self.path, timeout=30)) as connection:
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with connection:
+                yield connection
+
+    def get_many(self, ips, now=None):
+        """Return {ip: country or None} of the IPs with an unexpired entry."""
+        now = time.time() if now is None else now
+        ips = list(dict.fromkeys(ips))
+        found = {}
+        with self.connect() as connection:
+            for start in range(0, len(ips), CACHE_QUERY_IPS):
+                batch = ips[start : start + CACHE_QUERY_IPS]
+                found.update(
+                    connection.execute(
+                        "SELECT ip, country FROM countries "
+                        f"WHERE ip IN ({', '.join('?' * len(batch))}) AND expires > ?",
+                        [*batch, now],
+                    )
+                )
+        return found
+
+    def put_many(self, countries, now=None):
+        """Cache {ip: country or None}, replacing the previous entries."""
+        now = time.time() if now is None else now
+        with self.connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO countries VALUES (?, ?, ?)",
+                [
+                    (ip, code, now + (self.ttl if code else self.negative_ttl))
+                    for ip, code in countries.items()
+                ],
+            )
+
+    def purge(self, now=None):
+        """Delete the expired entries, return how many there were."""
+        now = time.time() if now is None else now
+        with self.connect() as connection:
+            return connection.execute(
+                "DELETE FROM countries WHERE expires <= ?", (now,)
+            ).rowcount
+
+
+class TokenBucket:
+    """Rate limiter shared by threads, take() waits until a request may be made.
+
+    Tokens refill at rate per second up to burst. pause() empties the bucket
+    for a while, after the API answered with a rate limit error.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            now = time.monotonic()
+            if now > self.updated:
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+            # Reserved now, so each waiting thread gets its own token
+            self.tokens -= 1
+            wait = self.updated - now + max(-self.tokens, 0) / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.tokens = min(self.tokens, 0)
+            self.updated = max(self.updated, time.monotonic() + seconds)
+
+
+class EnrichmentClient:
+    """Looks IP countries up with a remote API on a pool of worker threads.
+
+    url is formatted with the comma separated IPs of a batch, parse(ips, json)
+    returns the {ip: country or None} of a successful response. The requests
+    share one pooled HTTP session, go through a token bucket and are retried
+    with exponential backoff on rate limits (honouring Retry-After), server
+    errors and timeouts. on_results is called with the results of every batch,
+    None for the IPs whose lookup failed.
+    """
+
+    def __init__(
+        self,
+        url,
+        parse,
+        on_results=None,
+        workers=4,
+        batch_size=1,
+        rate=1.0,
+        burst=5,
+        timeout=5.0,
+        retries=4,
+        backoff=1.0,
+    ):
+        self.url = url
+        self.parse = parse
+        self.on_results = on_results
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.bucket = TokenBucket(rate, burst)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="enrichment")
+        # Future of each IP being looked up, so it is requested only once
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def submit(self, ips):
+        """Look the IPs up in the background, return the futures of their
+        batches (each resolves to a {ip: country or None} dict)."""
+        futures = set()
+        with self.lock:
+            new = []
+            for ip in dict.fromkeys(ips):
+                if ip in self.pending:
+                    futures.add(self.pending[ip])
+                else:
+                    new.append(ip)
+            for start in range(0, len(new), self.batch_size):
+                batch = new[start : start + self.batch_size]
+                future = self.executor.submit(self.resolve, batch)
+                futures.add(future)
+                self.pending.update(dict.fromkeys(batch, future))
+        return futures
+
+    def resolve(self, ips):
+        try:
+            results = self.fetch(ips)
+            if self.on_results is not None:
+                self.on_results(results)
+            return results
+        finally:
+            with self.lock:
+                for ip in ips:
+                    self.pending.pop(ip, None)
+
+    def retry_delay(self, attempt, response=None):
+        """Seconds to wait before retrying a request."""
+        if response is not None:
+            try:
+                return min(float(response.headers["Retry-After"]), MAX_BACKOFF)
+            except (KeyError, ValueError):
+                pass
+        return min(self.backoff * 2**attempt, MAX_BACKOFF)
+
+    def fetch(self, ips):
+        """Request the countries of a batch, return {ip: country or None}."""
+        url = self.url.format(ips=",".join(ips))
+        for attempt in range(self.retries + 1):
+            self.bucket.take()
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except requests.RequestException as e:
+                print(f"[!] Request failed for {len(ips)} IPs: {e}")
+                delay = self.retry_delay(attempt)
+            else:
+                if response.status_code == 200:
+                    try:
+                        return {
+                            **dict.fromkeys(ips),
+                            **self.parse(ips, response.json()),
+                        }
+                    except ValueError as e:
+                        print(f"[!] Invalid response for {len(ips)} IPs: {e}")
+                        break
+                if response.status_code == 429:
+                    delay = self.retry_delay(attempt, response)
+                    print(f"[!] Rate limit hit, retrying in {delay:.1f} s")
+                    self.bucket.pause(delay)
+                elif response.status_code >= 500:
+                    delay = self.retry_delay(attempt, response)
+                else:
+                    print(
+                        f"[!] Error: Unable to retrieve data for {len(ips)} IPs. "
+                        f"Status code: {response.status_code}"
+                    )
+                    break
+            if attempt < self.retries:
+                time.sleep(delay)
+        return dict.fromkeys(ips)
+
+    def close(self):
+        """Cancel the queued lookups and close the HTTP session."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
@@ -0,0 +1,65 @@
+# Import library dependencies.
+import json
+import threading
+from collections import deque
+
+# This file pushes what the refresher ingests to the open dashboards as
+# server-sent events: each message is sent once to every connected browser,
+# which appends it to its live feed, instead of the browsers asking for the
+# whole data again. Only the latest messages are kept, for the browsers that
+# reconnect (EventSource sends the id of the last message it received).
+
+
+class LiveFeed:
+    """Bounded, thread safe buffer of numbered messages for server-sent events.
+
+    publish() is called by the thread that ingests the logs, and every
+    connection streams the messages newer than the last one it sent with
+    stream(). A connection missing more than size messages skips the oldest.
+    """
+
+    def __init__(self, size=100):
+        self.messages = deque(maxlen=size)
+        self.last_id = 0
+        self.condition = threading.Condition()
+
+    def publish(self, message):
+        """Add a message (anything json.dumps() encodes) and wake the streams."""
+        with self.condition:
+            self.last_id += 1
+            self.messages.append((self.last_id, message))
+            self.condition.notify_all()
+        return self.last_id
+
+    def since(self, last_id):
+        """Return the (id, message) kept that are newer than last_id."""
+        with self.condition:
+            # An id from before a restart is larger than any current one
+            if last_id > self.last_id:
+                last_id = 0
+            return [(id, message) for id, message in self.messages if id > last_id]
+
+    def wait(self, last_id, timeout):
+        """Return the messages newer than last_id, waiting up to timeout seconds
+        for one to be published."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.last_id != last_id, timeout)
+        return self.since(last_id)
+
+    def stream(self, last_id=None, keepalive=15.0):
+        """Yield the text/event-stream of the messages after last_id, forever.
+
+        Without last_id the stream starts with the next message. A comment is
+        sent after keepalive seconds without messages, so proxies keep the
+        connection open and a closed one is noticed.
+        """
+        if last_id is None:
+            last_id = self.last_id
+        # Browsers wait retry milliseconds before reconnecting
+        yield "retry: 5000\n\n"
+        while True:
+            messages = self.wait(last_id, keepalive)
+            if not messages:
+                yield ": keepalive\n\n"
+            for last_id, message in messages:
+                yield f"id: {last_id}\ndata: {json.dumps(message)}\n\n"
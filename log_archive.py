@@ -0,0 +1,152 @@
+# Import library dependencies.
+import os
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Import project python file dependencies.
+from dashboard_data_parser import (
+    COMPRESSED_SUFFIXES,
+    LogTail,
+    archive_dir,
+    is_compressed,
+    open_log,
+    parse_tasks,
+    read_log_chunks,
+    rotated_log_files,
+    utc_timestamps,
+)
+from event_store import STORE_FORMATS, EventStore
+
+# This file compacts the closed rotation segments of the logs (audits.log.1,
+# audits.log.2.gz, ...) into Parquet archives, see `buzzpy.py compact`. An
+# archive holds the parsed string columns, dictionary encoded and zstd
+# compressed, plus an event_time timestamp column whose row group statistics
+# and min/max file metadata let readers skip the history outside a time range.
+# The segment is deleted once archived, so it is never parsed again.
+
+# Log file of each event family, in the log directory
+LOG_NAMES = {
+    "ssh_creds": "audits.log",
+    "ssh_cmds": "cmd_audits.log",
+    "http_url": "http_url_audits.log",
+    "http_creds": "http_audits.log",
+}
+
+# Rows per Parquet row group, the unit a time range filter skips
+ROW_GROUP_ROWS = 1 << 17
+
+
+def archive_table(arrays, log_format):
+    """Build the Arrow table of an archive from parsed string columns."""
+    event_time = pa.array(utc_timestamps(arrays["timestamp"]), from_pandas=True)
+    table = pa.table(
+        {
+            **{
+                column: arrays[column].cast(pa.string())
+                for column in log_format["columns"]
+            },
+            "event_time": event_time.cast(pa.timestamp("ms")),
+        }
+    )
+    bounds = pc.min_max(table["event_time"].cast(pa.int64()))
+    metadata = {
+        key: str(value.as_py()).encode() if value.is_valid else b""
+        for key, value in [
+            (b"min_event_time", bounds["min"]),
+            (b"max_event_time", bounds["max"]),
+        ]
+    }
+    return table.replace_schema_metadata(metadata)
+
+
+def segment_identity(log_file):
+    """Return the stat and LogTail fingerprint of a segment."""
+    stat = os.stat(log_file)
+    with open_log(log_file) as file:
+        fingerprint = LogTail.fingerprint(file.read(LogTail.FINGERPRINT_SIZE))
+    return stat, fingerprint
+
+
+def being_compressed(log_file):
+    """Return whether a compressed copy of a plain segment is being written."""
+    return not is_compressed(log_file) and any(
+        os.path.exists(f"{log_file}.{suffix}") for suffix in COMPRESSED_SUFFIXES
+    )
+
+
+def compact_segment(family, log_file, store=None):
+    """Archive one closed rotation segment and delete it.
+
+    With an event store the segment is only archived once the store has read
+    all of it, and the archive is recorded as stored, so the dashboard neither
+    loses its events nor stores them twice. Returns the archive path and its
+    number of rows, or None when the segment was left in place.
+    """
+    log_format = STORE_FORMATS[family]
+    stat, fingerprint = segment_identity(log_file)
+    # An empty segment, or one whose first line is still being written
+    if fingerprint is None:
+        return None
+    file_id = LogTail.file_id(stat)
+    if store is not None and not store.segment_ingested(
+        family, file_id, fingerprint, stat.st_size, is_compressed(log_file)
+    ):
+        print(f"[!] Skipping {log_file}, the dashboard has not read all of it yet")
+        return None
+
+    arrays = parse_tasks([(read_log_chunks([log_file]), log_format)])[0]
+    # Renamed by a rotation while it was read, archive it next time
+    if LogTail.file_id(os.stat(log_file)) != file_id:
+        return None
+
+    directory = archive_dir(log_file)
+    directory.mkdir(exist_ok=True)
+    name = (
+        f"{LOG_NAMES[family]}.{stat.st_mtime_ns:020d}."
+        f"{file_id[0]}-{file_id[1]}-{fingerprint}.parquet"
+    )
+    target = directory / name
+    # Written under another name, readers only list complete archives
+    temporary = directory / f".{name}.tmp"
+    pq.write_table(
+        archive_table(arrays, log_format),
+        temporary,
+        row_group_size=ROW_GROUP_ROWS,
+        compression="zstd",
+    )
+    if store is not None:
+        with store.connect() as connection:
+            store.record_archive(connection, family, name)
+    os.replace(temporary, target)
+    if LogTail.file_id(os.stat(log_file)) == file_id:
+        os.remove(log_file)
+    return target, len(arrays["timestamp"])
+
+
+def compact_logs(log_dir, store_path=None):
+    """Archive the closed rotation segments of every log in log_dir.
+
+    store_path is the dashboard's event store, coordinated with when it exists.
+    Returns a list of (segment, archive, rows) of the archived segments.
+    """
+    store = None
+    if store_path is not None and Path(store_path).exists():
+        store = EventStore(store_path)
+    archived = []
+    for family, log_name in LOG_NAMES.items():
+        log_file = Path(log_dir) / log_name
+        for segment in rotated_log_files(log_file):
+            # The live file is still written to
+            if Path(segment) == log_file or being_compressed(segment):
+                continue
+            try:
+                result = compact_segment(family, segment, store)
+            except FileNotFoundError:
+                # Deleted by a rotation while listing
+                continue
+            if result is not None:
+                archived.append((segment, *result))
+    return archived
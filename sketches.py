@@ -0,0 +1,169 @@
+# Import library dependencies.
+import math
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# This file holds the streaming summaries the event store keeps up to date while
+# it ingests events, so the dashboard statistics cost the same no matter how much
+# history has been collected.
+
+
+def top_k_capacity(error):
+    """Number of Space-Saving counters needed for a relative error bound."""
+    return math.ceil(1 / error)
+
+
+class SpaceSaving:
+    """Space-Saving heavy hitters summary (Metwally et al.) with at most capacity counters.
+
+    counters is a DataFrame indexed by value with "frequency" and "error" columns.
+    Every frequency is an upper bound of the true count and frequency - error a
+    lower bound. The error of a counter is at most N / capacity, N being the
+    number of counted events, and it is 0 while the summary holds fewer distinct
+    values than its capacity, so small datasets are counted exactly.
+    """
+
+    def __init__(self, capacity, counters=None):
+        self.capacity = capacity
+        if counters is None:
+            counters = pd.DataFrame(
+                {
+                    "frequency": pd.Series(dtype="int64"),
+                    "error": pd.Series(dtype="int64"),
+                }
+            )
+        self.counters = counters
+
+    def min_frequency(self):
+        """Count assumed for values the summary does not hold."""
+        if len(self.counters) < self.capacity:
+            return 0
+        return int(self.counters["frequency"].min())
+
+    def update(self, values, counts):
+        """Add exact counts of a batch of distinct values."""
+        batch = pd.DataFrame(
+            {"frequency": np.asarray(counts, dtype="int64"), "error": 0},
+            index=pd.Index(values),
+        )
+        self.merge_counters(batch, 0)
+
+    def merge(self, other):
+        """Add the events counted by another summary, for example another sensor's."""
+        self.merge_counters(other.counters, other.min_frequency())
+
+    def merge_counters(self, counters, other_min):
+        # Values missing from one side may have been evicted there with up to
+        # its minimum count, so they are given that count (Agarwal et al.,
+        # mergeable summaries). Keeping the largest counters leaves their sum at
+        # most N, which keeps the error bound.
+        own_min = self.min_frequency()
+        joined = self.counters.join(counters, how="outer", rsuffix="_other")
+        frequency = joined["frequency"].fillna(own_min) + joined[
+            "frequency_other"
+        ].fillna(other_min)
+        error = joined["error"].fillna(own_min) + joined["error_other"].fillna(
+            other_min
+        )
+        merged = pd.DataFrame(
+            {"frequency": frequency.astype("int64"), "error": error.astype("int64")}
+        )
+        if len(merged) > self.capacity:
+            keep = np.argpartition(-merged["frequency"].to_numpy(), self.capacity - 1)
+            merged = merged.iloc[np.sort(keep[: self.capacity])]
+        self.counters = merged
+
+    def top(self, k):
+        """The k most frequent values as (value, frequency, error) rows."""
+        result = self.counters.rename_axis("value").reset_index()
+        result = result.sort_values(
+            ["frequency", "value"], ascending=[False, True], kind="stable"
+        )
+        return list(result.head(k).itertuples(index=False, name=None))
+
+
+def merge_grouped_top_k(counters, batch, capacity):
+    """SpaceSaving.update() for many summaries at once, one per group.
+
+    counters has "group", "value", "frequency" and "error" columns, batch has
+    "group", "value" and exact "frequency" counts. Returns the merged counters,
+    at most capacity per group.
+    """
+    groups = counters.groupby("group")["frequency"]
+    floor = groups.min().where(groups.size() >= capacity, 0)
+    merged = counters.merge(
+        batch, on=["group", "value"], how="outer", suffixes=("", "_batch")
+    )
+    own_min = merged["group"].map(floor).fillna(0)
+    merged["frequency"] = (
+        merged["frequency"].fillna(own_min) + merged["frequency_batch"].fillna(0)
+    ).astype("int64")
+    merged["error"] = merged["error"].fillna(own_min).astype("int64")
+    merged = merged.sort_values(
+        ["group", "frequency", "value"], ascending=[True, False, True]
+    )
+    merged = merged[merged.groupby("group").cumcount() < capacity]
+    return merged[["group", "value", "frequency", "error"]].reset_index(drop=True)
+
+
+def hash_strings(values):
+    """64-bit hashes of strings, the same in every process and on every sensor."""
+    return pd.util.hash_array(np.asarray(values, dtype=object), categorize=False)
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter (Flajolet et al.) with 2**precision registers.
+
+    The relative standard error of count() is about 1.04 / sqrt(2**precision),
+    0.8% with the default precision of 14, for 16 KB of registers. Counters
+    with the same precision merge into the counter of the union of their values.
+    """
+
+    def __init__(self, precision=14, registers=None):
+        self.precision = precision
+        if registers is None:
+            registers = np.zeros(1 << precision, dtype=np.uint8)
+        self.registers = registers
+
+    def add_hashes(self, hashes):
+        """Add values given by their 64-bit hashes (see hash_strings())."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype(np.intp)
+        rest = hashes & np.uint64((1 << width) - 1)
+        # Position of the first 1 bit of the remaining bits, rest < 2**50 is
+        # exact as a float and frexp() gives its bit length
+        rank = width + 1 - np.frexp(rest.astype(np.float64))[1]
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def add(self, values):
+        """Add string values."""
+        self.add_hashes(hash_strings(values))
+
+    def merge(self, other):
+        """Add the values counted by another counter of the same precision."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLogs of different precisions")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        """Estimated number of distinct values."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(int)))
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        """Compact serialization, mostly empty registers compress well."""
+        return zlib.compress(bytes([self.precision]) + self.registers.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = zlib.decompress(data)
+        return cls(data[0], np.frombuffer(data[1:], dtype=np.uint8).copy())
@@ -15,7 +15,9 @@ from pathlib import Path
 
 # Constant variables
 LOGGING_FORMAT = logging.Formatter("%(asctime)s %(message)s")
-HOST_KEY = paramiko.RSAKey(filename="server.key")
+HOST_KEY_FILE = "server.key"
+# Loaded on first use by get_host_key() so importing this module stays cheap
+HOST_KEY = None
 
 # Ensure log directory exists
 log_dir = Path("log_files")
@@ -45,6 +47,14 @@ CREDS_HANDLER.setFormatter(LOGGING_FORMAT)
 CREDS_LOGGER.addHandler(CREDS_HANDLER)
 
 
+def get_host_key():
+    """Load the RSA host key the first time a client needs it"""
+    global HOST_KEY
+    if HOST_KEY is None:
+        HOST_KEY = paramiko.RSAKey(filename=HOST_KEY_FILE)
+    return HOST_KEY
+
+
 # Store the start time of the honeypot for uptime calculations
 HONEYPOT_START_TIME = time.time()
 
@@ -380,7 +390,7 @@ def client_handle(client, addr, username, password, demo_mode=False):
             demo_mode=demo_mode,
         )
 
-        transport.add_server_key(HOST_KEY)
+        transport.add_server_key(get_host_key())
         transport.start_server(server=server)
         channel = transport.accept(100)
 
@@ -413,6 +423,9 @@ def honeypot(address, port, username, password, demo_mode=False):
         password (str): The password for authentication.
         demo_mode (bool): Whether to use demo strings or real strings.
     """
+    # Fail fast on a missing or unreadable key instead of on the first client
+    get_host_key()
+
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     server_socket.bind((address, port))
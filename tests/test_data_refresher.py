@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from data_refresher import DataRefresher, VersionedCache
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+def make_refresher(calls, **kwargs):
+    return DataRefresher(
+        lambda: calls.append("refresh"),
+        lambda: calls.append("publish"),
+        **kwargs,
+    )
+
+
+def test_publishes_stored_data_first_then_refreshes(calls):
+    refresher = make_refresher(calls, interval=60, poll=0.01)
+    refresher.start()
+    try:
+        assert refresher.published.wait(5)
+        wait_until(lambda: len(calls) >= 3)
+        assert calls[:3] == ["publish", "refresh", "publish"]
+        # Nothing changed and the interval is not over
+        time.sleep(0.1)
+        assert len(calls) == 3
+    finally:
+        refresher.stop(5)
+
+
+def test_refreshes_when_a_log_changes_or_on_request(tmp_path, calls):
+    log_file = tmp_path / "audits.log"
+    log_file.write_text("")
+    refresher = make_refresher(
+        calls, watched=lambda: [log_file], interval=60, poll=0.01
+    )
+    refresher.start()
+    try:
+        wait_until(lambda: len(calls) == 3)
+        log_file.write_text("new line\n")
+        wait_until(lambda: len(calls) == 5)
+        refresher.request()
+        wait_until(lambda: len(calls) == 7)
+    finally:
+        refresher.stop(5)
+    assert calls.count("refresh") == 3
+
+
+def test_refreshes_every_interval_and_survives_errors():
+    attempts = []
+
+    def refresh():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise OSError("log unreadable")
+
+    published = threading.Event()
+    refresher = DataRefresher(refresh, published.set, interval=0.05, poll=0.01)
+    refresher.start()
+    try:
+        wait_until(lambda: len(attempts) >= 3)
+    finally:
+        refresher.stop(5)
+    assert published.is_set()
+    assert not refresher.thread
+
+
+def test_versioned_cache_evicts_least_recently_used():
+    cache = VersionedCache(size=2)
+    built = []
+
+    def build(value):
+        built.append(value)
+        return value
+
+    assert cache.get((1, "all"), lambda: build("a")) == "a"
+    assert cache.get((1, "ssh"), lambda: build("b")) == "b"
+    assert cache.get((1, "all"), lambda: build("a2")) == "a"
+    # A new version evicts (1, "ssh"), the least recently used
+    assert cache.get((2, "all"), lambda: build("c")) == "c"
+    assert list(cache.entries) == [(1, "all"), (2, "all")]
+    assert built == ["a", "b", "c"]
+    assert (cache.hits, cache.misses) == (1, 3)
@@ -0,0 +1,451 @@
+import gzip
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import dashboard_data_parser
+import event_store
+from event_store import DAY_MS, EventStore
+
+
+def creds_line(n, username="root"):
+    return (
+        f"2025-01-01 00:00:{n % 60:02d},000 Client 10.0.0.{n % 3} "
+        f"connection attempt username: {username}, password: pass{n % 2}\n"
+    )
+
+
+def cmd_line(n):
+    return f"2025-01-01 00:01:{n % 60:02d},000 Command: b'ls -{n}' Client: 10.0.0.1\n"
+
+
+@pytest.fixture
+def logs(tmp_path):
+    log_files = {
+        "ssh_creds": tmp_path / "audits.log",
+        "ssh_cmds": tmp_path / "cmd_audits.log",
+    }
+    for path in log_files.values():
+        path.touch()
+    return log_files
+
+
+def write(path, text):
+    with open(path, "a") as file:
+        file.write(text)
+
+
+def test_ingests_only_new_lines(tmp_path, logs):
+    store = EventStore(tmp_path / "events.db")
+    write(logs["ssh_creds"], "".join(creds_line(n) for n in range(5)))
+    write(logs["ssh_cmds"], cmd_line(0))
+
+    assert store.ingest_logs(logs) == {"ssh_creds": 5, "ssh_cmds": 1}
+    assert store.ingest_logs(logs) == {"ssh_creds": 0, "ssh_cmds": 0}
+
+    write(logs["ssh_creds"], creds_line(5, username="admin"))
+    assert store.ingest_logs(logs) == {"ssh_creds": 1, "ssh_cmds": 0}
+    assert store.count_events("ssh_creds") == 6
+
+
+def test_restart_resumes_from_saved_positions(tmp_path, logs):
+    write(logs["ssh_creds"], "".join(creds_line(n) for n in range(4)))
+    EventStore(tmp_path / "events.db").ingest_logs(logs)
+
+    write(logs["ssh_creds"], creds_line(4))
+    store = EventStore(tmp_path / "events.db")
+    assert store.ingest_logs(logs)["ssh_creds"] == 1
+    assert store.count_events("ssh_creds") == 5
+
+
+def test_queries(tmp_path, logs):
+    store = EventStore(tmp_path / "events.db")
+    write(logs["ssh_creds"], "".join(creds_line(n) for n in range(7)))
+    write(logs["ssh_cmds"], cmd_line(0) + cmd_line(0) + cmd_line(1))
+    store.ingest_logs(logs)
+
+    top_ips = store.top_10("ssh_creds", "ip_address")
+    assert top_ips.values.tolist()[0] == ["10.0.0.0", 3]
+    assert sorted(top_ips.values.tolist()[1:]) == [["10.0.0.1", 2], ["10.0.0.2", 2]]
+    assert store.top_10("ssh_cmds", "Command").values.tolist()[0] == ["ls -0", 2]
+    assert store.top_10("http_url", "url").values.tolist() == [["No Data", 0]]
+
+    recent = store.recent_events("ssh_creds", 2)
+    assert recent["timestamp"].tolist() == [
+        "2025-01-01 00:00:06,000",
+        "2025-01-01 00:00:05,000",
+    ]
+    new = store.events_since("ssh_creds", 4, limit=2)
+    assert new["id"].tolist() == [6, 7]
+    assert new["timestamp"].tolist()[-1] == "2025-01-01 00:00:06,000"
+    assert store.events_since("ssh_creds", 7, limit=2).empty
+    assert sorted(store.distinct_values(["ssh_creds"], "ip_address")["ip_address"]) == [
+        "10.0.0.0",
+        "10.0.0.1",
+        "10.0.0.2",
+    ]
+
+
+def test_events_without_timestamp_sort_last(tmp_path, logs):
+    store = EventStore(tmp_path / "events.db")
+    write(
+        logs["ssh_creds"],
+        creds_line(1)
+        + "Client 10.0.0.9 connection attempt username: x, password: y\n"
+        + creds_line(2),
+    )
+    store.ingest_logs(logs)
+    assert store.recent_events("ssh_creds", 3)["timestamp"].tolist() == [
+        "2025-01-01 00:00:02,000",
+        "2025-01-01 00:00:01,000",
+        "No timestamp",
+    ]
+
+
+def test_adds_event_time_to_older_databases(tmp_path):
+    path = tmp_path / "events.db"
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            'CREATE TABLE ssh_creds (id INTEGER PRIMARY KEY, "timestamp" TEXT, '
+            '"ip_address" TEXT, "username" TEXT, "password" TEXT)'
+        )
+        connection.execute(
+            "INSERT INTO ssh_creds VALUES (1, '2025-01-01 00:00:01,250', 'a', 'b', 'c')"
+        )
+    connection.close()
+
+    EventStore(path)
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT event_time FROM ssh_creds").fetchone() == (
+            1735689601250,
+        )
+    connection.close()
+
+
+@pytest.fixture
+def tokyo(monkeypatch):
+    """Run in a time zone 9 hours ahead of UTC."""
+    monkeypatch.setenv("TZ", "Asia/Tokyo")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_event_times_are_utc(tmp_path, logs, tokyo, monkeypatch):
+    # 2025-01-01 00:00 in Tokyo is 2024-12-31 15:00 UTC
+    utc = 1735689600000 - 9 * 3600 * 1000
+    monkeypatch.setattr(event_store.time, "time", lambda: utc / 1000 + 3600)
+    store = EventStore(tmp_path / "events.db")
+    write(logs["ssh_creds"], "".join(creds_line(n) for n in range(6)))
+    store.ingest_logs(logs)
+
+    assert store.count_events("ssh_creds", start=utc, end=utc + 60 * 1000) == 6
+    assert store.count_events("ssh_creds", end=utc - 1) == 0
+    # Shown in local time, like the log timestamps
+    series, _ = store.time_series(["ssh_creds"])
+    assert series["time"].min() == pd.Timestamp("2025-01-01 00:00")
+
+
+def test_utc_timestamps_follow_daylight_saving_time(monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        timestamps = dashboard_data_parser.utc_timestamps(
+            pa.array(["2025-01-15 07:00:00,000", "2025-07-15 08:00:00,500", "x"])
+        )
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+    assert [str(t) for t in timestamps] == [
+        "2025-01-15T12:00:00.000",
+        "2025-07-15T12:00:00.500",
+        "NaT",
+    ]
+
+
+def test_converts_local_event_times_of_older_databases(tmp_path, tokyo):
+    path = tmp_path / "events.db"
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            'CREATE TABLE ssh_creds (id INTEGER PRIMARY KEY, "timestamp" TEXT, '
+            '"ip_address" TEXT, "username" TEXT, "password" TEXT, '
+            "event_time INTEGER)"
+        )
+        # Stored by an older version as if the local time was UTC
+        connection.execute(
+            "INSERT INTO ssh_creds VALUES "
+            "(1, '2025-01-01 00:00:01,250', 'a', 'b', 'c', 1735689601250)"
+        )
+    connection.close()
+
+    for _ in range(2):
+        EventStore(path)
+        with sqlite3.connect(path) as connection:
+            assert connection.execute(
+                "SELECT event_time FROM ssh_creds"
+            ).fetchone() == (1735689601250 - 9 * 3600 * 1000,)
+        connection.close()
+
+
+@pytest.mark.parametrize("top_k_error", [0, 0.5])
+def test_top_10_modes(tmp_path, logs, top_k_error):
+    store = EventStore(tmp_path / "events.db", top_k_error=top_k_error)
+    usernames = ["root"] * 6 + ["admin"] * 3 + ["a", "b", "c"]
+    write(
+        logs["ssh_creds"],
+        "".join(creds_line(n, username) for n, username in enumerate(usernames)),
+    )
+    store.ingest_logs(logs)
+
+    top_users = store.top_10("ssh_creds", "username").values.tolist()
+    if top_k_error:
+        # Two counters, the second one absorbed the rarer names
+        assert top_users[0] == ["root", 6]
+        assert len(top_users) == 2
+    else:
+        assert top_users == [["root", 6], ["admin", 3], ["a", 1], ["b", 1], ["c", 1]]
+
+
+def test_top_k_filled_from_older_databases(tmp_path, logs):
+    write(logs["ssh_creds"], "".join(creds_line(n) for n in range(3)))
+    path = tmp_path / "events.db"
+    EventStore(path).ingest_logs(logs)
+    with sqlite3.connect(path) as connection:
+        connection.execute("DROP TABLE top_k")
+    connection.close()
+
+    assert EventStore(path).top_10("ssh_creds", "username").values.tolist() == [
+        ["root", 3]
+    ]
+
+
+def test_distinct_counts_by_day(tmp_path, logs):
+    store = EventStore(tmp_path / "events.db")
+    write(
+        logs["ssh_creds"],
+        "".join(creds_line(n, username=f"user{n % 4}") for n in range(8))
+        + "2025-01-02 00:00:00,000 Client 10.0.0.7 "
+        "connection attempt username: root, password: x\n",
+    )
+    write(logs["ssh_cmds"], cmd_line(0))
+    store.ingest_logs(logs)
+
+    ips = [("ssh_creds", "ip_address"), ("ssh_cmds", "ip_address")]
+    assert store.distinct_count(ips) == 4
+    assert store.distinct_count([("ssh_creds", "credentials")]) == 5
+    assert store.distinct_count([("ssh_cmds", "Command")]) == 1
+    # 2025-01-02 00:00:00 UTC
+    assert store.distinct_count(ips, start=1735776000000) == 1
+    assert store.distinct_count(ips, end=1735776000000 - 1) == 3
+
+    # Counters are filled from the stored events for older databases
+    with sqlite3.connect(tmp_path / "events.db") as connection:
+        connection.execute("DROP TABLE distinct_counts")
+    connection.close()
+    assert EventStore(tmp_path / "events.db").distinct_count(ips) == 4
+
+
+def test_ingests_in_batches_and_remembers_finished_archives(
+    tmp_path, logs, monkeypatch
+):
+    monkeypatch.setattr(event_store, "INGEST_BATCH_BYTES", 1000)
+    with gzip.open(f"{logs['ssh_creds']}.1.gz", "wt") as archive:
+        archive.write("".join(creds_line(n) for n in range(50)))
+    write(logs["ssh_creds"], creds_line(50))
+
+    store = EventStore(tmp_path / "events.db")
+    assert store.ingest_logs(logs)["ssh_creds"] == 51
+    restarted = EventStore(tmp_path / "events.db")
+    assert len(restarted.tail("ssh_creds", logs["ssh_creds"]).finished) == 1
+    assert restarted.ingest_logs(logs)["ssh_creds"] == 0
+
+
+def test_rollups_time_series(tmp_path, logs, monkeypatch):
+    # 2025-01-01 00:00 UTC, with minute buckets still kept
+    monkeypatch.setattr(event_store.time, "time", lambda: 1735689600 + 3600)
+    store = EventStore(
+        tmp_path / "events.db",
+        country_lookup=lambda ips: {
+            ip: None if ip.endswith(".2") else "ES" for ip in ips
+        },
+    )
+    write(logs["ssh_creds"], "".join(creds_line(n) for n in range(6)))
+    write(logs["ssh_cmds"], cmd_line(0))
+    store.ingest_logs(logs)
+
+    series, resolution = store.time_series(["ssh_creds", "ssh_cmds"])
+    assert resolution == 60 * 1000
+    assert series.groupby("family")["events"].sum().to_dict() == {
+        "ssh_cmds": 1,
+        "ssh_creds": 6,
+    }
+    assert series["time"].min() == pd.Timestamp("2025-01-01 00:00")
+
+    countries, _ = store.time_series(["ssh_creds"], dimension="country")
+    assert countries[["value", "events"]].values.tolist() == [["ES", 4]]
+    ips, _ = store.time_series(["ssh_creds"], dimension="ip_address")
+    assert sorted(ips["value"]) == ["10.0.0.0", "10.0.0.1", "10.0.0.2"]
+
+    # Months later only the day buckets are left
+    monkeypatch.setattr(event_store.time, "time", lambda: 1735689600 + 200 * 86400)
+    write(logs["ssh_creds"], creds_line(7))
+    store.ingest_logs(logs)
+    series, resolution = store.time_series(["ssh_creds"])
+    assert resolution == DAY_MS
+    assert series["events"].tolist() == [7]
+
+
+def test_countries_backfilled_once_known(tmp_path, logs, monkeypatch):
+    monkeypatch.setattr(event_store.time, "time", lambda: 1735689600 + 3600)
+    # Only 10.0.0.0 is known at first, the other lookups are in progress
+    known = {"10.0.0.0": "ES"}
+    lookups = []
+
+    def country_lookup(ips):
+        lookups.append(sorted(ips))
+        return {ip: known[ip] for ip in ips if ip in known}
+
+    store = EventStore(tmp_path / "events.db", country_lookup=country_lookup)
+    write(logs["ssh_creds"], "".join(creds_line(n) for n in range(6)))
+    store.ingest_logs(logs)
+    countries, _ = store.time_series(["ssh_creds"], dimension="country")
+    assert countries[["value", "events"]].values.tolist() == [["ES", 2]]
+    assert store.backfill_countries() == 0
+
+    # The lookups completed, one IP has no country
+    known.update({"10.0.0.1": "FR", "10.0.0.2": None})
+    assert store.backfill_countries() == 2
+    assert lookups[-1] == ["10.0.0.1", "10.0.0.2"]
+    countries, _ = store.time_series(["ssh_creds"], dimension="country")
+    assert sorted(countries[["value", "events"]].values.tolist()) == [
+        ["ES", 2],
+        ["FR", 2],
+    ]
+    assert store.backfill_countries() == 0
+
+
+def test_network_counts(tmp_path, logs, monkeypatch):
+    asn_table = tmp_path / "prefixes.tsv"
+    asn_table.write_text("10.0.0.0\t8\t64500\n10.0.0.0/30,64501,Example Org\n")
+    monkeypatch.setenv("ASN_DATABASE", str(asn_table))
+    monkeypatch.setattr(dashboard_data_parser, "asn_database", None)
+    write(logs["ssh_creds"], "".join(creds_line(n) for n in range(5)))
+    EventStore(tmp_path / "events.db").ingest_logs(logs)
+
+    # Filled from the stored IP counts, then kept up to date
+    store = EventStore(
+        tmp_path / "events.db", network_counter=dashboard_data_parser.network_counts
+    )
+    write(logs["ssh_creds"], creds_line(5))
+    store.ingest_logs(logs)
+    assert store.top_networks(["ssh_creds"], "/24").values.tolist() == [
+        ["10.0.0.0/24", 6]
+    ]
+    assert store.top_networks(["ssh_creds"], "asn").values.tolist() == [
+        ["AS64501 Example Org", 6]
+    ]
+    assert store.top_networks(["ssh_cmds"], "/16").empty
+
+
+def test_query_events_pages_sorts_and_filters(tmp_path, logs):
+    store = EventStore(tmp_path / "events.db")
+    write(logs["ssh_creds"], "".join(creds_line(n) for n in range(25)))
+    write(logs["ssh_creds"], creds_line(25, username="adm%n_1"))
+    store.ingest_logs(logs)
+
+    page, total = store.query_events("ssh_creds", 0, 10)
+    assert total == 26 and len(page) == 10
+    # Newest first by default
+    assert page["timestamp"].iloc[0] == "2025-01-01 00:00:25,000"
+    last_page, _ = store.query_events("ssh_creds", 20, 10)
+    assert len(last_page) == 6
+    seen = pd.concat(
+        [store.query_events("ssh_creds", offset, 10)[0] for offset in (0, 10, 20)]
+    )
+    assert seen["timestamp"].is_unique
+
+    page, total = store.query_events(
+        "ssh_creds",
+        0,
+        5,
+        sort_by=[("password", True), ("timestamp", False)],
+        filters=[("ip_address", "=", "10.0.0.1"), ("username", "contains", "roo")],
+    )
+    assert total == 8
+    assert page["password"].tolist() == ["pass0"] * 4 + ["pass1"]
+    assert page["timestamp"].tolist()[:2] == [
+        "2025-01-01 00:00:22,000",
+        "2025-01-01 00:00:16,000",
+    ]
+    # LIKE wildcards in a filter match themselves
+    page, total = store.query_events(
+        "ssh_creds", 0, 10, filters=[("username", "contains", "%n_")]
+    )
+    assert total == 1 and page["username"].tolist() == ["adm%n_1"]
+    _, total = store.query_events(
+        "ssh_creds", 0, 10, filters=[("timestamp", "datestartswith", "2025-01-01")]
+    )
+    assert total == 26
+
+    with pytest.raises(ValueError):
+        store.query_events("ssh_creds", 0, 10, sort_by=[("id; DROP", True)])
+    with pytest.raises(ValueError):
+        store.query_events("ssh_creds", 0, 10, filters=[("username", "~", "x")])
+
+
+def test_time_ranges(tmp_path, logs, monkeypatch):
+    monkeypatch.setenv("ASN_DATABASE", str(tmp_path / "missing.tsv"))
+    monkeypatch.setattr(dashboard_data_parser, "asn_database", None)
+    store = EventStore(
+        tmp_path / "events.db", network_counter=dashboard_data_parser.network_counts
+    )
+    write(
+        logs["ssh_creds"],
+        "".join(creds_line(n) for n in range(6))
+        + "2025-01-02 00:00:00,000 Client 10.0.1.7 "
+        "connection attempt username: admin, password: x\n"
+        + "Client 10.0.0.9 connection attempt username: x, password: y\n",
+    )
+    store.ingest_logs(logs)
+    # 2025-01-02 00:00:00 UTC
+    day_2 = {"start": 1735776000000, "end": 1735776000000 + DAY_MS}
+
+    assert store.count_events("ssh_creds") == 8
+    assert store.count_events("ssh_creds", **day_2) == 1
+    assert store.count_events("ssh_creds", end=day_2["start"] - 1) == 6
+    assert store.top_10("ssh_creds", "username", **day_2).values.tolist() == [
+        ["admin", 1]
+    ]
+    assert store.value_counts("ssh_creds", "ip_address", **day_2).values.tolist() == [
+        ["10.0.1.7", 1]
+    ]
+    assert store.distinct_values(["ssh_creds"], "ip_address", **day_2)[
+        "ip_address"
+    ].tolist() == ["10.0.1.7"]
+    assert store.top_networks(
+        ["ssh_creds", "http_url"], "/24", **day_2
+    ).values.tolist() == [["10.0.1.0/24", 1]]
+    page, total = store.query_events("ssh_creds", 0, 10, end=day_2["start"] - 1)
+    assert total == 6 and len(page) == 6
+
+
+def test_reading_sees_one_state(tmp_path, logs):
+    store = EventStore(tmp_path / "events.db")
+    write(logs["ssh_creds"], "".join(creds_line(n) for n in range(3)))
+    store.ingest_logs(logs)
+
+    with store.reading():
+        assert store.count_events("ssh_creds") == 3
+        # An ingest of another thread commits meanwhile
+        write(logs["ssh_creds"], creds_line(3, username="admin"))
+        ingest = threading.Thread(target=store.ingest_logs, args=(logs,))
+        ingest.start()
+        ingest.join()
+        assert store.count_events("ssh_creds") == 3
+        assert store.top_10("ssh_creds", "username").values.tolist() == [["root", 3]]
+    assert store.count_events("ssh_creds") == 4
@@ -0,0 +1,314 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+import requests
+
+import dashboard_data_parser
+from geoip import EnrichmentClient, GeoCache, load_database, load_prefixes
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / "ranges.csv"
+    path.write_text(
+        "start,end,country\n"
+        "1.0.0.0,1.0.0.255,AU\n"
+        '"16777472","16778239","CN"\n'
+        "2001:db8::,2001:db8::ffff,NL\n"
+        "8.8.8.0/24,US\n"
+        "9.9.9.0,9.9.9.255,ZZ\n"
+        "not,a range\n"
+    )
+    return load_database(path)
+
+
+@pytest.mark.parametrize(
+    "ip, country",
+    [
+        ("1.0.0.0", "AU"),
+        ("1.0.0.255", "AU"),
+        ("1.0.1.7", "CN"),
+        ("1.0.4.0", None),
+        ("0.0.0.1", None),
+        ("8.8.8.8", "US"),
+        ("9.9.9.9", None),
+        ("2001:db8::1", "NL"),
+        ("2001:db8::1:0", None),
+        ("::ffff:1.0.0.1", "AU"),
+        ("not an ip", None),
+    ],
+)
+def test_country_lookup(database, ip, country):
+    assert database.country(ip) == country
+
+
+def test_local_provider_needs_no_network(tmp_path, monkeypatch):
+    path = tmp_path / "ranges.csv"
+    path.write_text("1.0.0.0,1.0.0.255,AU\n")
+    monkeypatch.setenv("GEOIP_PROVIDER", "local")
+    monkeypatch.setenv("GEOIP_DATABASE", str(path))
+    monkeypatch.setattr(dashboard_data_parser, "geoip_database", None)
+
+    def no_network(*args, **kwargs):
+        raise AssertionError("the API was called")
+
+    monkeypatch.setattr(requests.Session, "request", no_network)
+    assert dashboard_data_parser.country_code("1.0.0.9") == "AU"
+    assert dashboard_data_parser.country_code("5.5.5.5") is None
+
+
+def test_missing_local_database_resolves_nothing(tmp_path, monkeypatch):
+    monkeypatch.setenv("GEOIP_PROVIDER", "local")
+    monkeypatch.setenv("GEOIP_DATABASE", str(tmp_path / "missing.csv"))
+    monkeypatch.setattr(dashboard_data_parser, "geoip_database", None)
+    assert dashboard_data_parser.country_code("1.0.0.9") is None
+
+
+def test_countries_in_bulk(database):
+    ips = [
+        "1.0.0.1",
+        "1.0.1.7",
+        "2001:db8::1",
+        "::ffff:8.8.8.8",
+        "256.0.0.1",
+        "x",
+        None,
+    ]
+    assert database.countries(ips).tolist() == [
+        "AU",
+        "CN",
+        "NL",
+        "US",
+        None,
+        None,
+        None,
+    ]
+
+
+@pytest.mark.parametrize("counted", [False, True])
+def test_ip_to_country_code_with_local_database(tmp_path, monkeypatch, counted):
+    path = tmp_path / "ranges.csv"
+    path.write_text("1.0.0.0,1.0.0.255,AU\n2.0.0.0,2.0.0.255,FR\n")
+    monkeypatch.setenv("GEOIP_PROVIDER", "local")
+    monkeypatch.setenv("GEOIP_DATABASE", str(path))
+    monkeypatch.setattr(dashboard_data_parser, "geoip_database", None)
+    events = pd.DataFrame(
+        {"ip_address": ["1.0.0.1", "2.0.0.1", "1.0.0.2", "1.0.0.1", "127.0.0.1"]}
+    )
+    if counted:
+        events = events["ip_address"].value_counts().reset_index(name="frequency")
+
+    countries = dashboard_data_parser.ip_to_country_code(events)
+    assert countries.values.tolist() == [["AU", 3], ["FR", 1]]
+
+
+def test_cache_expires_countries_and_failures(tmp_path):
+    cache = GeoCache(tmp_path / "geo_cache.db", ttl=100, negative_ttl=10)
+    cache.put_many({"1.0.0.1": "AU", "5.5.5.5": None}, now=0)
+    assert cache.get_many(["1.0.0.1", "5.5.5.5", "6.6.6.6"], now=5) == {
+        "1.0.0.1": "AU",
+        "5.5.5.5": None,
+    }
+    assert cache.get_many(["1.0.0.1", "5.5.5.5"], now=50) == {"1.0.0.1": "AU"}
+    assert cache.purge(now=50) == 1
+    # Shared with other processes and kept across restarts
+    reopened = GeoCache(tmp_path / "geo_cache.db")
+    assert reopened.get_many(["1.0.0.1"], now=50) == {"1.0.0.1": "AU"}
+    assert reopened.get_many(["1.0.0.1"], now=150) == {}
+
+
+@pytest.fixture
+def stub_api():
+    """Local CleanTalk-like API. Every IP is in AU except 3.x.x.x, rate limited
+    once per IP first, and 4.x.x.x, always unavailable."""
+    state = {"requests": [], "rate_limited": set(), "active": 0, "most_active": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            ips = parse_qs(urlparse(self.path).query)["ip"][0].split(",")
+            with lock:
+                state["requests"].append(ips)
+                state["active"] += 1
+                state["most_active"] = max(state["most_active"], state["active"])
+                limited = [ip for ip in ips if ip.startswith("3.")]
+                first = not set(limited) <= state["rate_limited"]
+                state["rate_limited"].update(limited)
+            time.sleep(0.05)
+            with lock:
+                state["active"] -= 1
+            if any(ip.startswith("4.") for ip in ips):
+                self.send_response(503)
+                self.end_headers()
+                return
+            if first:
+                self.send_response(429)
+                self.send_header("Retry-After", "0.1")
+                self.end_headers()
+                return
+            body = json.dumps(
+                {"data": {ip: {"country_code": "AU"} for ip in ips}}
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{server.server_port}/?ip={{ips}}"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def test_client_batches_concurrently_and_retries(stub_api):
+    client = EnrichmentClient(
+        stub_api["url"],
+        dashboard_data_parser.cleantalk_countries,
+        workers=2,
+        batch_size=2,
+        rate=100,
+        burst=100,
+        retries=2,
+        backoff=0.01,
+    )
+    try:
+        ips = ["1.0.0.1", "1.0.0.2", "2.0.0.1", "3.0.0.1", "4.0.0.1", "2.0.0.2"]
+        results = {}
+        for future in client.submit(ips + ips):
+            results.update(future.result())
+    finally:
+        client.close()
+    assert results == {
+        "1.0.0.1": "AU",
+        "1.0.0.2": "AU",
+        "2.0.0.1": "AU",
+        "3.0.0.1": "AU",
+        "4.0.0.1": None,
+        "2.0.0.2": None,
+    }
+    # Three batches, the rate limited one and the unavailable one retried
+    assert stub_api["requests"].count(["2.0.0.1", "3.0.0.1"]) == 2
+    assert stub_api["requests"].count(["4.0.0.1", "2.0.0.2"]) == 3
+    assert stub_api["most_active"] <= 2
+
+
+def test_client_times_out(stub_api):
+    client = EnrichmentClient(
+        stub_api["url"],
+        dashboard_data_parser.cleantalk_countries,
+        timeout=0.01,
+        retries=1,
+        backoff=0.01,
+    )
+    try:
+        (future,) = client.submit(["1.0.0.1"])
+        assert future.result() == {"1.0.0.1": None}
+    finally:
+        client.close()
+
+
+def test_api_lookups_fill_in_without_blocking(tmp_path, monkeypatch, stub_api):
+    monkeypatch.setenv("GEOIP_PROVIDER", "cleantalk")
+    monkeypatch.setenv("GEO_CACHE", str(tmp_path / "geo_cache.db"))
+    monkeypatch.setenv("GEOIP_RATE", "100")
+    monkeypatch.setattr(dashboard_data_parser, "CLEANTALK_URL", stub_api["url"])
+    monkeypatch.setattr(dashboard_data_parser, "geo_cache", None)
+    monkeypatch.setattr(dashboard_data_parser, "geo_client", None)
+    ips = ["1.0.0.1", "2.0.0.1", "127.0.0.1"]
+    try:
+        # Unresolved at first, found once the background lookups are done
+        assert dashboard_data_parser.ip_countries(ips).tolist() == [None] * 3
+        for _ in range(100):
+            codes = dashboard_data_parser.ip_countries(ips).tolist()
+            if codes == ["AU", "AU", None]:
+                break
+            time.sleep(0.02)
+        assert codes == ["AU", "AU", None]
+        assert dashboard_data_parser.country_code("2.0.0.2") == "AU"
+    finally:
+        dashboard_data_parser.geo_client.close()
+    requested = len(stub_api["requests"])
+
+    # A restarted dashboard finds them in the cache
+    monkeypatch.setattr(dashboard_data_parser, "geo_cache", None)
+    monkeypatch.setattr(dashboard_data_parser, "geo_client", None)
+    assert dashboard_data_parser.ip_countries(ips, wait=True).tolist() == [
+        "AU",
+        "AU",
+        None,
+    ]
+    assert len(stub_api["requests"]) == requested
+
+
+def test_longest_prefix_match(tmp_path):
+    path = tmp_path / "prefixes.csv"
+    path.write_text(
+        "prefix,asn,organisation\n"
+        "1.0.0.0/8,AS100,Big, Inc\n"
+        "1.2.0.0/16,200,Medium\n"
+        "1.2.3.0/24,300\n"
+        "2001:db8::/32,400,Six\n"
+        "::ffff:9.9.0.0/112,500\n"
+        "5.0.0.0\t8\t600_601\n"
+        "bad/99,1\n"
+    )
+    table = load_prefixes(path)
+    assert len(table) == 6
+    assert table.lookup("1.2.3.4") == "AS300"
+    assert table.lookup("1.2.4.4") == "AS200 Medium"
+    assert table.lookup("1.9.9.9") == "AS100 Big, Inc"
+    assert table.lookup("2001:db8:1::1") == "AS400 Six"
+    assert table.lookup("9.9.1.1") == "AS500"
+    assert table.lookup("5.1.1.1") == "AS600"
+    assert table.lookup("2.2.2.2") is None
+    assert table.lookup("x") is None
+
+
+def test_network_counts_per_level():
+    events = pd.DataFrame(
+        {"ip_address": ["1.2.3.4", "1.2.3.5", "1.2.9.9", "2001:db8:1::1", "x"]}
+    )
+    counts = dashboard_data_parser.network_counts(events)
+    assert counts.values.tolist() == [
+        ["/16", "1.2.0.0/16", 3],
+        ["/16", "2001:db8::/32", 1],
+        ["/24", "1.2.3.0/24", 2],
+        ["/24", "1.2.9.0/24", 1],
+        ["/24", "2001:db8:1::/48", 1],
+    ]
+
+
+def test_known_countries_never_wait(tmp_path, monkeypatch, stub_api):
+    monkeypatch.setenv("GEOIP_PROVIDER", "cleantalk")
+    monkeypatch.setenv("GEO_CACHE", str(tmp_path / "geo_cache.db"))
+    monkeypatch.setenv("GEOIP_RATE", "100")
+    monkeypatch.setenv("GEOIP_RETRIES", "0")
+    # The unavailable IP in a batch of its own
+    monkeypatch.setenv("GEOIP_BATCH_SIZE", "1")
+    monkeypatch.setattr(dashboard_data_parser, "CLEANTALK_URL", stub_api["url"])
+    monkeypatch.setattr(dashboard_data_parser, "geo_cache", None)
+    monkeypatch.setattr(dashboard_data_parser, "geo_client", None)
+    ips = ["1.0.0.1", "4.0.0.1", "127.0.0.1"]
+    try:
+        started = time.monotonic()
+        assert dashboard_data_parser.known_countries(ips) == {"127.0.0.1": None}
+        assert time.monotonic() - started < 0.05
+        for _ in range(100):
+            known = dashboard_data_parser.known_countries(ips)
+            if "1.0.0.1" in known:
+                break
+            time.sleep(0.02)
+        # The failed lookup is cached without a country, but not known
+        assert known == {"1.0.0.1": "AU", "127.0.0.1": None}
+    finally:
+        dashboard_data_parser.geo_client.close()
@@ -0,0 +1,37 @@
+import json
+import threading
+
+from live_feed import LiveFeed
+
+
+def test_since_keeps_only_the_latest_messages():
+    feed = LiveFeed(size=2)
+    for n in range(3):
+        feed.publish({"n": n})
+    assert feed.since(0) == [(2, {"n": 1}), (3, {"n": 2})]
+    assert feed.since(2) == [(3, {"n": 2})]
+    # An id from before a restart
+    assert len(feed.since(10)) == 2
+
+
+def test_wait_returns_on_publish_or_timeout():
+    feed = LiveFeed()
+    assert feed.wait(0, timeout=0.01) == []
+    threading.Timer(0.05, feed.publish, [{"n": 1}]).start()
+    assert feed.wait(0, timeout=5) == [(1, {"n": 1})]
+
+
+def test_stream_sends_new_messages_and_keepalives():
+    feed = LiveFeed()
+    feed.publish({"n": 0})
+    stream = feed.stream(keepalive=0.01)
+    assert next(stream).startswith("retry:")
+    assert next(stream) == ": keepalive\n\n"
+    feed.publish({"n": 1})
+    chunk = next(stream)
+    assert chunk.startswith("id: 2\n")
+    assert json.loads(chunk.split("data: ")[1]) == {"n": 1}
+    # A reconnecting browser gets what it missed
+    stream = feed.stream(last_id=0)
+    next(stream)
+    assert next(stream).startswith("id: 1\n")
@@ -0,0 +1,78 @@
+import gzip
+
+import pandas as pd
+
+from dashboard_data_parser import (
+    SSH_CREDS_FORMAT,
+    archived_log_files,
+    parse_creds_audits_log,
+    read_archives,
+    rotated_log_files,
+)
+from event_store import EventStore
+from log_archive import compact_logs
+
+
+def creds_line(n, day=1):
+    return (
+        f"2025-01-{day:02d} 00:00:{n % 60:02d},000 Client 10.0.0.{n % 3} "
+        f"connection attempt username: user{n}, password: pass{n}\n"
+    )
+
+
+def write_segments(log_dir):
+    (log_dir / "audits.log.2").write_text(
+        "".join(creds_line(n, day=1) for n in range(5))
+    )
+    with gzip.open(log_dir / "audits.log.1.gz", "wt") as archive:
+        archive.write("".join(creds_line(n, day=2) for n in range(5, 8)))
+    (log_dir / "audits.log").write_text(creds_line(8, day=3))
+
+
+def test_compacted_history_parses_the_same(tmp_path):
+    write_segments(tmp_path)
+    before = parse_creds_audits_log(str(tmp_path / "audits.log"))
+
+    archived = compact_logs(tmp_path)
+
+    assert [rows for _, _, rows in archived] == [5, 3]
+    assert rotated_log_files(str(tmp_path / "audits.log")) == [
+        str(tmp_path / "audits.log")
+    ]
+    assert len(archived_log_files(str(tmp_path / "audits.log"))) == 2
+    pd.testing.assert_frame_equal(
+        parse_creds_audits_log(str(tmp_path / "audits.log")), before
+    )
+
+
+def test_archives_are_read_with_time_range_and_projection(tmp_path):
+    write_segments(tmp_path)
+    compact_logs(tmp_path)
+    archives = archived_log_files(str(tmp_path / "audits.log"))
+
+    # 2025-01-02 00:00 UTC onwards
+    arrays = read_archives(
+        archives, SSH_CREDS_FORMAT, columns=["username"], start=1735776000000
+    )
+    assert list(arrays) == ["username"]
+    assert arrays["username"].to_pylist() == ["user5", "user6", "user7"]
+
+
+def test_event_store_and_compaction(tmp_path):
+    write_segments(tmp_path)
+    log_files = {"ssh_creds": tmp_path / "audits.log"}
+    store = EventStore(tmp_path / "events.db")
+
+    # Segments the store has not read are left in place
+    assert compact_logs(tmp_path, tmp_path / "events.db") == []
+
+    assert store.ingest_logs(log_files)["ssh_creds"] == 9
+    assert len(compact_logs(tmp_path, tmp_path / "events.db")) == 2
+    # Already stored from the segments
+    assert store.ingest_logs(log_files)["ssh_creds"] == 0
+
+    # A new store gets the archived history
+    fresh = EventStore(tmp_path / "fresh.db")
+    assert fresh.ingest_logs(log_files)["ssh_creds"] == 9
+    assert fresh.ingest_logs(log_files)["ssh_creds"] == 0
+    assert fresh.count_events("ssh_creds") == 9
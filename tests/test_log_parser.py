@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import dashboard_data_parser
+from dashboard_data_parser import (
+    HTTP_CREDS_FORMAT,
+    HTTP_URL_FORMAT,
+    SSH_CMD_FORMAT,
+    SSH_CREDS_FORMAT,
+    compact_dataframe,
+    parse_line,
+    parse_log_bytes,
+    parse_log_columns,
+    string_dataframe,
+)
+
+TIMESTAMP = "2025-01-01 00:00:00,000"
+
+LINES = {
+    "ssh_creds": (
+        SSH_CREDS_FORMAT,
+        [
+            f"{TIMESTAMP} Client 1.2.3.4 connection attempt username: root, password: 123456",
+            "Client 1.2.3.4 connection attempt username: admin, password: , password: x",
+            f"  {TIMESTAMP} Client 5.6.7.8 connection attempt username: pi, password: raspberry\t",
+            f"{TIMESTAMP} Client 1.2.3.4 connection attempt username: root",
+            f"{TIMESTAMP} Client 9.9.9.9 connection attempt username: café, password: ñ",
+            "",
+        ],
+    ),
+    "ssh_cmds": (
+        SSH_CMD_FORMAT,
+        [
+            f"{TIMESTAMP} Command: b'uname -a' Client: 1.2.3.4",
+            f"{TIMESTAMP} Command: 'ls' Client: 1.2.3.4",
+            'Command: b"cat /etc/passwd" Client: 5.6.7.8',
+            f"{TIMESTAMP} Command: b' Client: 1.2.3.4",
+            f"{TIMESTAMP} Command: echo Client: x Client: 1.2.3.4",
+        ],
+    ),
+    "http_url": (
+        HTTP_URL_FORMAT,
+        [
+            f"{TIMESTAMP} Client 1.2.3.4 | Method: GET | URL: http://x/ | Args: {{}}",
+            f"{TIMESTAMP} Client 1.2.3.4 | Method: POST | URL: http://x/ | Args: {{'a': '| Args: '}}",
+            "no timestamp Client 1.2.3.4 | Method: GET | URL: / | Args: ",
+            f"{TIMESTAMP} Client 1.2.3.4 | Method: GET",
+        ],
+    ),
+    "http_creds": (
+        HTTP_CREDS_FORMAT,
+        [
+            f"{TIMESTAMP} Client 1.2.3.4 attempted login with username: admin and password: admin",
+            f"{TIMESTAMP} Client 1.2.3.4 attempted login with username: a and password:  and password: b",
+            f"{TIMESTAMP}Client 1.2.3.4 attempted login with username: a and password: b",
+        ],
+    ),
+}
+
+
+@pytest.mark.parametrize("family", LINES)
+def test_bulk_parser_matches_line_regex(family):
+    log_format, lines = LINES[family]
+    # Repeat the lines so most of them are far enough from the end for the byte search
+    lines = lines * 20
+    expected = [row for row in (parse_line(line, log_format) for line in lines) if row]
+
+    arrays = parse_log_columns("\r\n".join(lines).encode(), log_format)
+    dataframe = string_dataframe(arrays, log_format["columns"])
+
+    assert list(dataframe.columns) == log_format["columns"]
+    assert dataframe.values.tolist() == expected
+
+
+@pytest.mark.parametrize("family", LINES)
+def test_compact_dtypes(family):
+    log_format, lines = LINES[family]
+    data = "\n".join(lines * 20).encode()
+    strings = string_dataframe(
+        parse_log_columns(data, log_format), log_format["columns"]
+    )
+
+    dataframe = parse_log_bytes(data, log_format)
+
+    assert dataframe["timestamp"].dtype == "datetime64[ms]"
+    for column in log_format["categorical"]:
+        assert dataframe[column].dtype == "category"
+        assert dataframe[column].astype(str).tolist() == strings[column].tolist()
+        # Categories are sorted so sorting still follows the text
+        assert dataframe[column].sort_values().astype(str).tolist() == sorted(
+            strings[column]
+        )
+    timestamps = pd.to_datetime(
+        strings["timestamp"], format="%Y-%m-%d %H:%M:%S,%f", errors="coerce"
+    )
+    assert dataframe["timestamp"].equals(timestamps.astype("datetime64[ms]"))
+    assert dataframe.equals(compact_dataframe(strings.astype(object), log_format))
+
+
+def test_parse_timestamps_rejects_invalid_dates():
+    strings = pa.array(
+        [
+            "2024-02-29 23:59:59,999",
+            "2025-02-29 00:00:00,000",
+            "2025-13-01 00:00:00,000",
+            "2025-01-01 24:00:00,000",
+            "0000-01-01 00:00:00,000",
+            "No timestamp",
+            None,
+        ]
+    )
+    timestamps = dashboard_data_parser.parse_timestamps(strings)
+    assert timestamps[0] == np.datetime64("2024-02-29T23:59:59.999")
+    assert np.isnat(timestamps[1:]).all()
+
+
+def test_empty_data_gives_empty_columns():
+    dataframe = parse_log_bytes(b"", SSH_CREDS_FORMAT)
+    assert list(dataframe.columns) == SSH_CREDS_FORMAT["columns"]
+    assert dataframe.empty
+
+
+def test_split_lines_keeps_whole_lines():
+    data = b"".join(f"line {n}\n".encode() for n in range(100))
+    pieces = dashboard_data_parser.split_lines(data, size=50)
+    assert b"".join(pieces) == data
+    assert all(piece.endswith(b"\n") for piece in pieces)
+    assert len(pieces) > 1
+
+
+def test_parallel_parse_matches_serial(tmp_path, monkeypatch):
+    log_format, lines = LINES["ssh_creds"]
+    log_files = []
+    for index in range(3):
+        path = tmp_path / f"audits.log.{index}"
+        path.write_text("\n".join(lines * (index + 5)))
+        log_files.append(path)
+    serial = dashboard_data_parser.parse_log_files(log_files, log_format)
+
+    monkeypatch.setenv("PARSER_WORKERS", "2")
+    monkeypatch.setattr(dashboard_data_parser, "PARALLEL_MIN_BYTES", 0)
+    monkeypatch.setattr(dashboard_data_parser, "PARSE_TASK_BYTES", 1000)
+    try:
+        parallel = dashboard_data_parser.parse_log_files(log_files, log_format)
+        assert dashboard_data_parser.parse_pool is not None
+    finally:
+        dashboard_data_parser.reset_parse_pool()
+
+    assert len(serial) > 0
+    assert parallel.equals(serial)
+
+
+@pytest.mark.parametrize("family", LINES)
+def test_memory_mapped_logs_parse_in_place(tmp_path, family):
+    log_format, lines = LINES[family]
+    # Non-ASCII text, an invalid byte and no newline after the last line
+    data = "\n".join(lines * 20).encode() + b"\n\xff\n" + lines[0].encode()
+    path = tmp_path / "audits.log.1"
+    path.write_bytes(data)
+
+    chunks = dashboard_data_parser.read_log_chunks([path])
+    assert isinstance(chunks[0], memoryview)
+    mapped = string_dataframe(
+        parse_log_columns(chunks[0], log_format), log_format["columns"]
+    )
+    expected = string_dataframe(
+        parse_log_columns(data, log_format), log_format["columns"]
+    )
+    assert mapped.equals(expected)
+    assert mapped.values.tolist()[-1] == parse_line(lines[0], log_format)
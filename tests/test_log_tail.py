@@ -0,0 +1,232 @@
+import gzip
+import os
+import threading
+
+import pytest
+
+import dashboard_data_parser
+from dashboard_data_parser import (
+    SSH_CREDS_FORMAT,
+    IncrementalLogParser,
+    LogTail,
+    rotated_log_files,
+)
+
+
+def creds_line(n):
+    return (
+        f"2025-01-01 00:00:{n % 60:02d},000 Client 10.0.0.{n % 250} "
+        f"connection attempt username: user{n}, password: pass{n}\n"
+    )
+
+
+def write(path, text, mode="a"):
+    with open(path, mode) as file:
+        file.write(text)
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "audits.log"
+    path.touch()
+    return path
+
+
+@pytest.fixture
+def parser(log_file):
+    return IncrementalLogParser(str(log_file), SSH_CREDS_FORMAT)
+
+
+def usernames(dataframe):
+    return dataframe["username"].tolist()
+
+
+def test_reads_only_appended_lines(log_file):
+    tail = LogTail(str(log_file))
+    write(log_file, creds_line(0) + creds_line(1))
+    assert tail.read_new_data() == (creds_line(0) + creds_line(1)).encode()
+    assert tail.read_new_data() == b""
+    write(log_file, creds_line(2))
+    assert tail.read_new_data() == creds_line(2).encode()
+
+
+def test_partial_last_line_is_read_once_complete(log_file, parser):
+    write(log_file, creds_line(0) + creds_line(1)[:20])
+    assert usernames(parser.refresh()) == ["user0"]
+    write(log_file, creds_line(1)[20:])
+    assert usernames(parser.refresh()) == ["user0", "user1"]
+
+
+def test_rotation_keeps_offsets_with_the_renamed_file(log_file, parser):
+    write(log_file, creds_line(0) + creds_line(1))
+    parser.refresh()
+    # What RotatingFileHandler does: audits.log -> audits.log.1, new audits.log
+    os.rename(log_file, f"{log_file}.1")
+    write(f"{log_file}.1", creds_line(2))
+    write(log_file, creds_line(3), mode="w")
+    assert usernames(parser.refresh()) == ["user0", "user1", "user2", "user3"]
+
+
+def test_deleted_rotations_are_forgotten_but_rows_kept(log_file, parser):
+    write(f"{log_file}.1", creds_line(0))
+    parser.refresh()
+    os.remove(f"{log_file}.1")
+    write(log_file, creds_line(1))
+    assert usernames(parser.refresh()) == ["user0", "user1"]
+    assert len(parser.tail.offsets) == 1
+
+
+def test_truncated_file_is_read_from_start(log_file, parser):
+    write(log_file, creds_line(0) + creds_line(1))
+    parser.refresh()
+    write(log_file, creds_line(2), mode="w")
+    assert usernames(parser.refresh()) == ["user0", "user1", "user2"]
+
+
+def test_rewritten_file_with_same_inode_is_read_from_start(log_file, parser):
+    write(log_file, creds_line(0))
+    parser.refresh()
+    # Same inode, new content already longer than the saved offset
+    write(log_file, creds_line(1) + creds_line(2) + creds_line(3), mode="w")
+    assert usernames(parser.refresh()) == ["user0", "user1", "user2", "user3"]
+
+
+def test_file_renamed_while_listing_is_not_read_twice(log_file, parser, monkeypatch):
+    write(log_file, creds_line(0) + creds_line(1) + creds_line(2))
+    assert len(parser.refresh()) == 3
+
+    # The first listing still has audits.log, renamed before it is opened
+    original = dashboard_data_parser.rotated_log_files
+    listings = iter([[str(log_file)]])
+
+    def stale_listing(path):
+        return next(listings, None) or original(path)
+
+    monkeypatch.setattr(dashboard_data_parser, "rotated_log_files", stale_listing)
+    os.rename(log_file, f"{log_file}.1")
+    assert len(parser.refresh()) == 3
+
+    write(f"{log_file}.1", creds_line(3))
+    assert usernames(parser.refresh()) == ["user0", "user1", "user2", "user3"]
+
+
+def test_concurrent_refreshes_do_not_duplicate_rows(log_file, parser):
+    write(log_file, "".join(creds_line(n) for n in range(5000)))
+    threads = [threading.Thread(target=parser.refresh) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(parser.refresh()) == 5000
+
+
+def test_published_dataframes_are_not_changed_by_later_refreshes(log_file, parser):
+    write(log_file, creds_line(0))
+    first = parser.refresh()
+    write(log_file, "".join(creds_line(n) for n in range(1, 2000)))
+    second = parser.refresh()
+    assert usernames(first) == ["user0"]
+    assert len(second) == 2000
+    assert usernames(second)[:2] == ["user0", "user1"]
+
+
+def lines(start, stop):
+    return "".join(creds_line(n) for n in range(start, stop))
+
+
+def compress(path, suffix="gz"):
+    """Compress a rotated segment the way logrotate does and remove the original."""
+    with open(path, "rb") as source:
+        data = source.read()
+    if suffix == "gz":
+        with gzip.open(f"{path}.gz", "wb") as target:
+            target.write(data)
+    else:
+        zstandard = pytest.importorskip("zstandard")
+        with open(f"{path}.zst", "wb") as target:
+            target.write(zstandard.ZstdCompressor().compress(data))
+    os.remove(path)
+
+
+def test_rotation_segments_in_numeric_order(log_file):
+    for name in ["audits.log.2", "audits.log.10.gz", "audits.log.1", "audits.log.bak"]:
+        (log_file.parent / name).touch()
+    (log_file.parent / "audits.log.gz").touch()
+    assert [os.path.basename(f) for f in rotated_log_files(str(log_file))] == [
+        "audits.log.10.gz",
+        "audits.log.2",
+        "audits.log.1",
+        "audits.log",
+    ]
+
+
+@pytest.mark.parametrize("suffix", ["gz", "zst"])
+def test_compressed_segments_are_streamed(log_file, parser, suffix):
+    write(f"{log_file}.2", lines(0, 2))
+    compress(f"{log_file}.2", suffix)
+    write(log_file, creds_line(2))
+    assert usernames(parser.refresh()) == ["user0", "user1", "user2"]
+    assert len(parser.tail.finished) == 1
+    assert usernames(parser.refresh()) == ["user0", "user1", "user2"]
+
+
+def test_segment_compressed_after_reading_is_skipped(log_file, parser):
+    write(log_file, lines(0, 2))
+    parser.refresh()
+    os.rename(log_file, f"{log_file}.1")
+    write(f"{log_file}.1", creds_line(2))
+    compress(f"{log_file}.1")
+    write(log_file, creds_line(3))
+    assert usernames(parser.refresh()) == ["user0", "user1", "user2", "user3"]
+
+
+def test_read_limit_continues_in_compressed_segments(log_file):
+    write(f"{log_file}.1", lines(0, 500))
+    compress(f"{log_file}.1")
+    write(log_file, lines(500, 600))
+    tail = LogTail(str(log_file))
+
+    batches = []
+    while batch := b"".join(tail.read_new_chunks(limit=4000)):
+        assert len(batch) < 4000 + len(creds_line(0))
+        batches.append(batch)
+        if len(batches) == 3:
+            # A restarted LogTail skips to the saved position in the archive
+            tail, offsets = LogTail(str(log_file)), tail.offsets
+            tail.offsets = offsets
+    assert len(batches) > 10
+    assert b"".join(batches) == lines(0, 600).encode()
+
+
+def test_rotation_segments_are_read_through_memory_maps(log_file):
+    write(f"{log_file}.1", lines(0, 100))
+    write(log_file, lines(100, 200) + creds_line(200)[:20])
+    tail = LogTail(str(log_file))
+
+    batches = []
+    while chunks := tail.read_new_chunks(limit=1000):
+        assert all(isinstance(chunk, memoryview) for chunk in chunks)
+        batches.append(b"".join(chunks))
+    assert len(batches) > 10
+    assert b"".join(batches) == lines(0, 200).encode()
+
+
+def test_live_file_truncated_while_parsed(log_file):
+    write(log_file, lines(0, 100))
+    tail = LogTail(str(log_file))
+    chunks = tail.read_new_chunks()
+    # copytruncate: a mapping of the live file would raise SIGBUS
+    os.truncate(log_file, 0)
+    rows = dashboard_data_parser.parse_log_columns(chunks[0], SSH_CREDS_FORMAT)
+    assert len(rows["username"]) == 100
+    write(log_file, lines(100, 101))
+    assert b"".join(tail.read_new_chunks()) == lines(100, 101).encode()
+
+
+def test_long_line_of_the_live_file_is_read_whole(log_file):
+    line = creds_line(0).replace("pass0", "p" * 5000)
+    write(log_file, line + creds_line(1) + creds_line(2)[:20])
+    tail = LogTail(str(log_file))
+    assert b"".join(tail.read_new_chunks(limit=1000)) == line.encode()
+    assert b"".join(tail.read_new_chunks(limit=1000)) == creds_line(1).encode()
+    assert tail.read_new_chunks(limit=1000) == []
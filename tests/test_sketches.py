@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from sketches import HyperLogLog, SpaceSaving, top_k_capacity
+
+
+def zipf_counts(seed, size=20000, distinct=5000):
+    rng = np.random.default_rng(seed)
+    values = rng.zipf(1.3, size) % distinct
+    return np.unique(values.astype(str), return_counts=True)
+
+
+def check_bounds(summary, exact, total):
+    for value, frequency, error in summary.top(summary.capacity):
+        assert frequency - error <= exact.get(value, 0) <= frequency
+        assert error <= total / summary.capacity
+
+
+def test_top_k_capacity():
+    assert top_k_capacity(0.001) == 1000
+    assert top_k_capacity(0.3) == 4
+
+
+def test_exact_below_capacity():
+    summary = SpaceSaving(10)
+    summary.update(["a", "b"], [3, 1])
+    summary.update(["b", "c"], [4, 1])
+    assert summary.top(2) == [("b", 5, 0), ("a", 3, 0)]
+    assert summary.min_frequency() == 0
+
+
+def test_error_bounds_over_batches():
+    summary = SpaceSaving(100)
+    exact = {}
+    total = 0
+    for seed in range(5):
+        values, counts = zipf_counts(seed)
+        summary.update(values, counts)
+        for value, count in zip(values, counts):
+            exact[value] = exact.get(value, 0) + count
+        total += counts.sum()
+
+    assert len(summary.counters) == 100
+    check_bounds(summary, exact, total)
+    top_exact = sorted(exact, key=exact.get, reverse=True)[:3]
+    assert [row[0] for row in summary.top(3)] == top_exact
+
+
+def test_merge_summaries():
+    first, second = SpaceSaving(50), SpaceSaving(50)
+    exact = {}
+    for summary, seed in ((first, 10), (second, 11)):
+        values, counts = zipf_counts(seed)
+        summary.update(values, counts)
+        for value, count in zip(values, counts):
+            exact[value] = exact.get(value, 0) + count
+
+    first.merge(second)
+    assert len(first.counters) == 50
+    check_bounds(first, exact, sum(exact.values()))
+
+
+def test_hyperloglog_counts_and_merges():
+    first, second = HyperLogLog(), HyperLogLog()
+    first.add([f"10.0.{n // 256}.{n % 256}" for n in range(30000)])
+    second.add([f"10.0.{n // 256}.{n % 256}" for n in range(20000, 50000)])
+    assert first.count() == pytest.approx(30000, rel=0.03)
+
+    first.merge(HyperLogLog.from_bytes(second.to_bytes()))
+    assert first.count() == pytest.approx(50000, rel=0.03)
+
+
+def test_hyperloglog_small_counts_are_exact():
+    counter = HyperLogLog()
+    counter.add(["a", "b", "a", "c"])
+    assert counter.count() == 3
+    assert HyperLogLog().count() == 0
+    with pytest.raises(ValueError):
+        counter.merge(HyperLogLog(precision=10))
@@ -0,0 +1,145 @@
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def dashboard(tmp_path_factory):
+    """The web_dashboard module, reading its logs and event store from a
+    temporary LOG_DIR"""
+    log_dir = tmp_path_factory.mktemp("log_files")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("LOG_DIR", str(log_dir))
+        monkeypatch.setenv("EVENT_STORE", str(log_dir / "events.db"))
+        monkeypatch.setenv("COUNTRY", "False")
+        monkeypatch.delitem(sys.modules, "web_dashboard", raising=False)
+        import web_dashboard
+
+        yield web_dashboard
+    sys.modules.pop("web_dashboard", None)
+
+
+def add_creds_event(dashboard, seconds):
+    """Log an SSH login attempt made at seconds since 1970 and ingest it"""
+    timestamp = time.strftime("%Y-%m-%d %H:%M:%S,000", time.localtime(seconds))
+    with open(dashboard.LOG_FILES["ssh_creds"], "a") as file:
+        file.write(
+            f"{timestamp} Client 10.0.0.1 connection attempt "
+            "username: root, password: x\n"
+        )
+    dashboard.refresh_data()
+
+
+def test_window_end_is_rounded(dashboard):
+    assert dashboard.window_end(119.5) == 60 * 1000
+    assert dashboard.window_end(120) == 120 * 1000
+
+
+def test_time_ranges_move_with_the_clock(dashboard):
+    now = time.time()
+    add_creds_event(dashboard, now - 30 * 60)
+    snapshot = dashboard.publish_snapshot()
+    hour = dashboard.windowed_snapshot(snapshot, "1h", dashboard.window_end(now))
+    assert hour.event_counts["ssh_creds"] == 1
+    assert dashboard.windowed_snapshot(snapshot, "1h", hour.published) is hour
+
+    # An hour later the data and its snapshot version are unchanged, the
+    # event is out of the last hour
+    assert dashboard.publish_snapshot() is snapshot
+    later = dashboard.windowed_snapshot(
+        snapshot, "1h", dashboard.window_end(now + 60 * 60)
+    )
+    assert later.version == snapshot.version
+    assert later.event_counts["ssh_creds"] == 0
+    assert dashboard.windowed_snapshot(snapshot, "all") is snapshot
+
+
+def callback_outputs(dashboard):
+    """Return the outputs ("id.property") of each callback of the dashboard"""
+    return {
+        key: key.strip(".").split("...") if key.startswith("..") else [key]
+        for key in dashboard.app.callback_map
+    }
+
+
+def test_each_panel_callback_renders_only_its_own_container(dashboard, monkeypatch):
+    monkeypatch.setattr(
+        dashboard, "ctx", SimpleNamespace(triggered_id="snapshot-version")
+    )
+    snapshot = dashboard.publish_snapshot()
+    # Without starting the refresher
+    monkeypatch.setattr(dashboard, "latest_snapshot", lambda: snapshot)
+    outputs = callback_outputs(dashboard)
+    for container in [*dashboard.PANELS, "tables-container"]:
+        writers = [
+            properties
+            for properties in outputs.values()
+            if any(output.split(".")[0] == container for output in properties)
+        ]
+        assert len(writers) == 1
+        assert [output.split(".")[0] for output in writers[0]] in (
+            [container],
+            [container, f"{container}-digest"],
+        )
+
+    for container, create in dashboard.PANELS.items():
+        update_panel = dashboard.panel_callbacks[container]
+        components, digest = update_panel("all", "EN", snapshot.version, "all", 0, None)
+        assert components is dashboard.cached_components(create, "all", "EN", snapshot)
+        # Already shown, the panel is left as it is
+        assert update_panel("all", "EN", snapshot.version, "all", 0, digest) == (
+            dashboard.no_update,
+            dashboard.no_update,
+        )
+
+
+def test_new_snapshots_only_refresh_the_table_pages(dashboard):
+    inputs = {
+        key: [item["id"] for item in callback["inputs"]]
+        for key, callback in dashboard.app.callback_map.items()
+    }
+    assert "snapshot-version" not in inputs["tables-container.children"]
+    (pages,) = [key for key in inputs if "event-table" in key]
+    assert "snapshot-version" in inputs[pages]
+
+
+def test_snapshots_are_immutable(dashboard):
+    snapshot = dashboard.publish_snapshot()
+    with pytest.raises(AttributeError):
+        snapshot.version = 0
+    with pytest.raises(AttributeError):
+        snapshot.event_counts = {}
+    with pytest.raises(TypeError):
+        snapshot.event_counts["ssh_creds"] = 0
+    with pytest.raises(TypeError):
+        snapshot.unique_counts["ssh"]["unique_ips"] = 0
+
+
+def test_snapshot_reads_one_state(dashboard, monkeypatch):
+    store = dashboard.event_store
+    before = store.count_events("ssh_creds")
+    top_10 = store.top_10
+    calls = []
+
+    def ingest_meanwhile(*args, **kwargs):
+        # An ingest of another thread commits after the first read of the
+        # snapshot, while the others are still to come
+        if len(calls) == 1:
+            ingest = threading.Thread(
+                target=add_creds_event, args=(dashboard, time.time())
+            )
+            ingest.start()
+            ingest.join()
+        calls.append(args)
+        return top_10(*args, **kwargs)
+
+    monkeypatch.setattr(store, "top_10", ingest_meanwhile)
+    snapshot = dashboard.DashboardSnapshot(0)
+    monkeypatch.undo()
+    assert store.count_events("ssh_creds") == before + 1
+    assert snapshot.event_counts["ssh_creds"] == before
+    ips = snapshot.top_10s[("ssh_creds", "ip_address", False)]
+    assert ips["frequency"].sum() == before
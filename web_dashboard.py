@@ -1,24 +1,50 @@
 # Import library dependencies.
-from dash import Dash, html, dash_table, dcc, Input, Output, no_update, State
+from dash import (
+    Dash,
+    html,
+    dash_table,
+    dcc,
+    Input,
+    Output,
+    no_update,
+    State,
+    MATCH,
+    ctx,
+)
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.utils import PlotlyJSONEncoder
 from dash_bootstrap_templates import load_figure_template
 from pathlib import Path
 from dotenv import load_dotenv
 import os
+import re
 import locale
 import json
+import hashlib
+import sqlite3
+import threading
 import time
+from types import MappingProxyType
+from flask import Response, request
 
 # Import project python file dependencies.
 from dashboard_data_parser import *
+from data_refresher import DataRefresher, VersionedCache
+from live_feed import LiveFeed
+from event_store import STORE_FORMATS, EventStore
+
+# Load dotenv() to capture environment variable.
+dotenv_path = Path("public.env")
+load_dotenv(dotenv_path=dotenv_path)
 
 # Constants.
 # Get base directory of where user is running buzzpy from.
 base_dir = Path(__file__).parent
-# Source log file paths with glob patterns to include rotated files
-log_dir = base_dir / "log_files"
+# Source log file paths with glob patterns to include rotated files, LOG_DIR in
+# public.env reads them from another directory
+log_dir = Path(os.getenv("LOG_DIR", base_dir / "log_files"))
 
 # Define full paths for log files including base directory
 ssh_creds_log_file_path = str(log_dir / "audits.log")
@@ -39,10 +65,6 @@ for log_file in [
     if not Path(log_file).exists():
         Path(log_file).touch()
 
-# Load dotenv() to capture environment variable.
-dotenv_path = Path("public.env")
-load_dotenv(dotenv_path=dotenv_path)
-
 # Load translations from JSON file
 with open(Path(base_dir) / "config" / "locales.json", "r") as f:
     translations = json.load(f)
@@ -88,11 +110,120 @@ def get_translation(key, selected_locale="en_US"):
     return TRANSLATIONS.get(selected_locale, TRANSLATIONS["en_US"]).get(key, key)
 
 
-# Pass log files to dataframe conversion with full paths
-ssh_creds_log_df = parse_creds_audits_log(ssh_creds_log_file_path)
-ssh_cmds_log_df = parse_cmd_audits_log(ssh_cmds_log_file_path)
-http_url_log_df = parse_http_url_audits_log(http_url_log_file_path)
-http_creds_log_df = parse_http_creds_audits_log(http_creds_log_file_path)
+# Log file of each event store table
+LOG_FILES = {
+    "ssh_creds": ssh_creds_log_file_path,
+    "ssh_cmds": ssh_cmds_log_file_path,
+    "http_url": http_url_log_file_path,
+    "http_creds": http_creds_log_file_path,
+}
+
+# Set the value to True in (public.env) if you want country code lookup as default.
+country = os.getenv("COUNTRY", "False")  # Default to False if not set
+print(f"Country code lookup is: {country}")  # Debug print
+
+# Parsed events are kept in a SQLite database (EVENT_STORE in public.env), which
+# remembers how far each log (and rotated copy) has been read. The logs are
+# ingested by refresh_data() on a background thread started by the first
+# dashboard request rather than when this module is imported, see
+# latest_snapshot().
+# TOP_K_ERROR bounds the overestimate of the top 10 frequencies, 0 counts exactly
+event_store = EventStore(
+    os.getenv("EVENT_STORE", str(log_dir / "events.db")),
+    top_k_error=float(os.getenv("TOP_K_ERROR", "0.001")),
+    # Never waits for API lookups, the events of IPs without a known country
+    # are added to the country rollups once it is cached, see refresh_data()
+    country_lookup=known_countries if country == "True" else None,
+    network_counter=network_counts,
+)
+
+# Event families of each service, with the locale key of their name
+SERVICE_FAMILIES = {
+    "ssh": {"ssh_creds": "ssh_creds", "ssh_cmds": "ssh_cmds"},
+    "http": {"http_creds": "http_login", "http_url": "http_reqs"},
+}
+
+# Distinct count cards of each service, as (family, field) sources of the
+# event store's HyperLogLogs
+UNIQUE_COUNTS = {
+    "ssh": {
+        "unique_ips": [("ssh_creds", "ip_address"), ("ssh_cmds", "ip_address")],
+        "unique_credentials": [("ssh_creds", "credentials")],
+        "unique_commands": [("ssh_cmds", "Command")],
+    },
+    "http": {
+        "unique_ips": [("http_url", "ip_address"), ("http_creds", "ip_address")],
+        "unique_credentials": [("http_creds", "credentials")],
+    },
+}
+
+# Services of the service selector
+SERVICES = ["all", "ssh", "http"]
+
+# Seconds before the request covered by each time range, None covers all the
+# stored events
+TIME_RANGES = {
+    "all": None,
+    "1h": 60 * 60,
+    "24h": 24 * 60 * 60,
+    "7d": 7 * 24 * 60 * 60,
+    "30d": 30 * 24 * 60 * 60,
+}
+
+
+def time_bounds(time_range, end):
+    """Return the (start, end) milliseconds of a time range ending at end, (None,
+    None) for all the events"""
+    seconds = TIME_RANGES.get(time_range)
+    if seconds is None:
+        return None, None
+    return end - seconds * 1000, end
+
+
+# Seconds the end of the time ranges is rounded down to, the windows of a
+# snapshot version are read once per step
+WINDOW_STEP = int(os.getenv("WINDOW_STEP", "60"))
+
+
+def window_end(now=None):
+    """Return the end of the time ranges of a request made now (milliseconds
+    since 1970, the current time by default), rounded down to WINDOW_STEP"""
+    now = time.time() if now is None else now
+    return int(now // WINDOW_STEP * WINDOW_STEP) * 1000
+
+
+# Top 10 panels, as (family, column, truncate) event store reads
+TOP_10_PANELS = [
+    ("ssh_creds", "ip_address", False),
+    ("ssh_creds", "username", False),
+    ("ssh_creds", "password", False),
+    ("ssh_cmds", "Command", False),
+    ("http_creds", "ip_address", False),
+    ("http_url", "ip_address", False),
+    ("http_url", "url", False),
+    ("http_url", "url", True),
+    ("http_url", "method", False),
+]
+
+
+def service_families(selected_service):
+    """Return the event families of a service selection, with their name's locale key"""
+    families = {}
+    for service, service_families in SERVICE_FAMILIES.items():
+        if selected_service in ["all", service]:
+            families.update(service_families)
+    return families
+
+
+def unique_count_sources(selected_service):
+    """Return the HyperLogLog sources of each distinct count card of a service selection"""
+    cards = {}
+    for service, counts in UNIQUE_COUNTS.items():
+        if selected_service in ["all", service]:
+            for key, sources in counts.items():
+                cards.setdefault(key, []).extend(sources)
+    return cards
+
 
 # Python Dash (& Dash Bootstrap) Constants.
 # Load the Solar theme from Python Dash Bootstrap
@@ -113,10 +244,6 @@ logo_path = assets_dir / "buzzpylogo.png"
 if logo_path.exists():
     image = f"assets/images/{image}"
 
-# Set the value to True in (public.env) if you want country code lookup as default.
-country = os.getenv("COUNTRY", "False")  # Default to False if not set
-print(f"Country code lookup is: {country}")  # Debug print
-
 # Declare Dash App, apply SOLAR theme.
 app = Dash(__name__, external_stylesheets=[dbc.themes.SOLAR, dbc_css])
 app.title = "Buzzpy"
@@ -135,39 +262,130 @@ language_options = [
     {"label": "ES", "value": "ES"},
 ]
 
+time_range_options = [
+    {"label": label, "value": time_range}
+    for time_range, label in translations["EN"]["time_ranges"].items()
+]
+
+
+def create_unique_cards(selected_service, selected_lang, snapshot):
+    """Create cards with the estimated unique IPs, credential pairs and commands"""
+    trans = translations[selected_lang]
+    cards = snapshot.unique_counts[selected_service]
+    return [
+        dbc.Col(
+            dbc.Card(
+                dbc.CardBody(
+                    [
+                        html.H6(trans[key], className="card-title"),
+                        html.H3(f"{count:,}"),
+                    ]
+                ),
+                className="text-center mb-4",
+            ),
+            width=12 // len(cards),
+        )
+        for key, count in cards.items()
+    ]
+
+
+def create_attack_timeline(selected_service, selected_lang, snapshot):
+    """Create the events over time graph from the event store's rollups"""
+    trans = translations[selected_lang]
+    names = {
+        family: trans[key] for family, key in service_families(selected_service).items()
+    }
+    series = snapshot.timelines[selected_service]
+    if series.empty:
+        return []
+    series = series.assign(family=series["family"].map(names))
+    figure = px.line(
+        series,
+        x="time",
+        y="events",
+        color="family",
+        title=trans["attacks_over_time"],
+        labels={
+            "time": trans["graph"]["time"],
+            "events": trans["graph"]["events"],
+            "family": "",
+        },
+    )
+    return [dbc.Col(dcc.Graph(figure=figure), width=12)]
+
+
+def create_top_networks(selected_service, selected_lang, snapshot):
+    """Create the top source networks graph, with a button per network level"""
+    trans = translations[selected_lang]
+    levels = {
+        level: top
+        for level, top in snapshot.networks[selected_service].items()
+        if not top.empty
+    }
+    if not levels:
+        return []
+    figure = go.Figure(
+        [
+            go.Bar(
+                x=top["network"],
+                y=top["frequency"],
+                name=level.upper(),
+                visible=index == 0,
+                showlegend=False,
+            )
+            for index, (level, top) in enumerate(levels.items())
+        ]
+    )
+    figure.update_layout(
+        title=trans["top_networks"],
+        xaxis_title=trans["table"]["network"],
+        yaxis_title=trans["graph"]["frequency"],
+        updatemenus=[
+            {
+                "type": "buttons",
+                "direction": "right",
+                "x": 1,
+                "y": 1.15,
+                "buttons": [
+                    {
+                        "label": level.upper(),
+                        "method": "update",
+                        "args": [{"visible": [other == level for other in levels]}],
+                    }
+                    for level in levels
+                ],
+            }
+        ],
+    )
+    return [dbc.Col(dcc.Graph(figure=figure), width=12)]
+
 
-def create_service_stats(selected_service, selected_lang="EN"):
+def create_service_stats(selected_service, selected_lang="EN", snapshot=None):
     """Create service-specific statistics based on selected service"""
-    graphs = []
+    snapshot = snapshot or latest_snapshot()
+    return [
+        component
+        for create in STATS_PANELS.values()
+        for component in create(selected_service, selected_lang, snapshot)
+    ]
+
+
+def create_top_10_graphs(selected_service, selected_lang="EN", snapshot=None):
+    """Create the top 10 and country distribution graphs of the selected service"""
+    snapshot = snapshot or latest_snapshot()
     trans = translations[selected_lang]
-    ssh_country_df = pd.DataFrame()  # Initialize empty DataFrame
-    http_country_df = pd.DataFrame()  # Initialize empty DataFrame
+    graphs = []
+    # Country code tables, computed with the snapshot if enabled
+    ssh_country_df = snapshot.countries.get("ssh", pd.DataFrame())
+    http_country_df = snapshot.countries.get("http", pd.DataFrame())
 
     try:
-        # Process country codes first if enabled
-        if country == "True":
-            try:
-                if selected_service in ["all", "ssh"]:
-                    print("[DEBUG] Processing SSH country codes")
-                    ssh_country_df = ip_to_country_code(ssh_creds_log_df)
-
-                if selected_service in ["all", "http"]:
-                    print("[DEBUG] Processing HTTP country codes")
-                    combined_http_df = pd.concat(
-                        [
-                            http_creds_log_df[["ip_address"]],
-                            http_url_log_df[["ip_address"]],
-                        ]
-                    ).drop_duplicates()
-                    http_country_df = ip_to_country_code(combined_http_df)
-            except Exception as e:
-                print(f"[ERROR] Failed to process country codes: {e}")
 
         if selected_service == "http" or selected_service == "all":
             # Calculate HTTP statistics
-            http_ip_data = top_10_calculator(http_creds_log_df, "ip_address")
-            http_url_data = top_10_calculator(http_url_log_df, "url", truncate=True)
-            http_method_data = top_10_calculator(http_url_log_df, "method")
+            http_ip_data = snapshot.top_10s["http_creds", "ip_address", False]
+            http_url_data = snapshot.top_10s["http_url", "url", True]
+            http_method_data = snapshot.top_10s["http_url", "method", False]
 
             if not http_url_data.empty:
                 # Create URL graph with improved layout and hover info
@@ -260,10 +478,10 @@ def create_service_stats(selected_service, selected_lang="EN"):
                         )
 
         if selected_service == "all" or selected_service == "ssh":
-            ssh_ip_data = top_10_calculator(ssh_creds_log_df, "ip_address")
-            ssh_user_data = top_10_calculator(ssh_creds_log_df, "username")
-            ssh_pass_data = top_10_calculator(ssh_creds_log_df, "password")
-            ssh_cmd_data = top_10_calculator(ssh_cmds_log_df, "Command")
+            ssh_ip_data = snapshot.top_10s["ssh_creds", "ip_address", False]
+            ssh_user_data = snapshot.top_10s["ssh_creds", "username", False]
+            ssh_pass_data = snapshot.top_10s["ssh_creds", "password", False]
+            ssh_cmd_data = snapshot.top_10s["ssh_cmds", "Command", False]
 
             # Ensure DataFrames are not empty before creating graphs
             if not ssh_ip_data.empty and "frequency" in ssh_ip_data.columns:
@@ -310,9 +528,9 @@ def create_service_stats(selected_service, selected_lang="EN"):
                     )
 
         if selected_service == "all" or selected_service == "http":
-            http_ip_data = top_10_calculator(http_url_log_df, "ip_address")
-            http_url_data = top_10_calculator(http_url_log_df, "url")
-            http_method_data = top_10_calculator(http_url_log_df, "method")
+            http_ip_data = snapshot.top_10s["http_url", "ip_address", False]
+            http_url_data = snapshot.top_10s["http_url", "url", False]
+            http_method_data = snapshot.top_10s["http_url", "method", False]
 
             # Create URL graph with improved layout and hover info
             url_fig = go.Figure(
@@ -352,29 +570,6 @@ def create_service_stats(selected_service, selected_lang="EN"):
                 bargap=0.2,
             )
 
-            if country == "True":
-                try:
-                    print("[DEBUG] Processing HTTP country codes")
-                    # Combine both HTTP logs for country code lookup
-                    combined_http_df = pd.concat(
-                        [
-                            http_creds_log_df[
-                                ["ip_address"]
-                            ],  # Put creds first as it has known good IPs
-                            http_url_log_df[["ip_address"]],
-                        ]
-                    ).drop_duplicates()
-
-                    http_country_df = ip_to_country_code(combined_http_df)
-                    print(f"[DEBUG] HTTP country DataFrame: {http_country_df.shape}")
-                    print("[DEBUG] HTTP country codes found:")
-                    print(http_country_df)
-                except Exception as e:
-                    print(f"[ERROR] Failed to generate HTTP country codes: {e}")
-                    http_country_df = pd.DataFrame(
-                        {"Country_Code": ["Error"], "frequency": [0]}
-                    )
-
             if selected_service == "all":
                 graphs.extend(
                     [
@@ -616,86 +811,134 @@ def create_service_stats(selected_service, selected_lang="EN"):
 
         return graphs
     except Exception as e:
-        print(f"[ERROR] Error in create_service_stats: {e}")
+        print(f"[ERROR] Error in create_top_10_graphs: {e}")
         return []
 
 
+# Common table style settings
+table_style = {
+    "style_table": {"overflowX": "auto"},
+    "style_header": {
+        "backgroundColor": "#002b36",
+        "color": "#deb439",
+        "font-weight": "bold",
+    },
+    "style_cell": {
+        "backgroundColor": "#073642",
+        "color": "#deb439",
+        "textAlign": "left",
+        "maxWidth": "400px",
+        "whiteSpace": "normal",
+        "wordBreak": "break-word",
+    },
+    "page_size": 10,
+    "page_action": "native",
+    "page_current": 0,
+    "sort_action": "native",
+    "sort_mode": "multi",
+}
+
+
 def create_data_tables(selected_service="all", selected_lang="en"):
-    """Create data tables based on selected service"""
+    """Create the event tables of the selected service. They only depend on the
+    service and the language: page_event_table() queries the page they show,
+    again with each snapshot, so they keep their page, sort and filter."""
     tables = []
     trans = translations[selected_lang]
 
-    # Common table style settings
-    table_style = {
-        "style_table": {"overflowX": "auto"},
-        "style_header": {
-            "backgroundColor": "#002b36",
-            "color": "#deb439",
-            "font-weight": "bold",
-        },
-        "style_cell": {
-            "backgroundColor": "#073642",
-            "color": "#deb439",
-            "textAlign": "left",
-            "maxWidth": "400px",
-            "whiteSpace": "normal",
-            "wordBreak": "break-word",
-        },
-        "page_size": 10,
-        "page_action": "native",
-        "page_current": 0,
-        "sort_action": "native",
-        "sort_mode": "multi",
+    # Event tables only get the page shown, see page_event_table()
+    event_table_style = {
+        **table_style,
+        "page_action": "custom",
+        "sort_action": "custom",
+        "filter_action": "custom",
     }
 
     if selected_service in ["all", "ssh"]:
         # SSH Credentials Table
-        if not ssh_creds_log_df.empty:
-            sorted_creds_df = ssh_creds_log_df.sort_values(
-                by="timestamp", ascending=False
-            )
-            tables.append(
-                html.Div(
-                    [
-                        html.H4(trans["ssh_creds"], className="text-center"),
-                        dash_table.DataTable(
-                            id="ssh-creds-table",
-                            columns=[
-                                {"name": i, "id": i} for i in sorted_creds_df.columns
-                            ],
-                            data=sorted_creds_df.to_dict("records"),
-                            sort_by=[{"column_id": "timestamp", "direction": "desc"}],
-                            **table_style,
-                        ),
-                    ]
-                )
+        tables.append(
+            html.Div(
+                [
+                    html.H4(trans["ssh_creds"], className="text-center"),
+                    dash_table.DataTable(
+                        id={"type": "event-table", "family": "ssh_creds"},
+                        columns=[
+                            {"name": i, "id": i}
+                            for i in STORE_FORMATS["ssh_creds"]["columns"]
+                        ],
+                        sort_by=[{"column_id": "timestamp", "direction": "desc"}],
+                        **event_table_style,
+                    ),
+                ]
             )
+        )
 
         # SSH Commands Table
-        if not ssh_cmds_log_df.empty:
-            sorted_cmds_df = ssh_cmds_log_df.sort_values(
-                by="timestamp", ascending=False
+        tables.append(
+            html.Div(
+                [
+                    html.H4(trans["ssh_cmds"], className="text-center mt-4"),
+                    dash_table.DataTable(
+                        id={"type": "event-table", "family": "ssh_cmds"},
+                        columns=[
+                            {"name": i, "id": i}
+                            for i in STORE_FORMATS["ssh_cmds"]["columns"]
+                        ],
+                        **event_table_style,
+                    ),
+                ]
             )
-            tables.append(
-                html.Div(
-                    [
-                        html.H4(trans["ssh_cmds"], className="text-center mt-4"),
-                        dash_table.DataTable(
-                            id="ssh-commands-table",
-                            columns=[
-                                {"name": i, "id": i} for i in sorted_cmds_df.columns
-                            ],
-                            data=sorted_cmds_df.to_dict("records"),
-                            **table_style,
-                        ),
-                    ]
-                )
+        )
+
+    if selected_service in ["all", "http"]:
+        # HTTP Login Attempts Table
+        tables.append(
+            html.Div(
+                [
+                    html.H4(trans["http_login"], className="text-center mt-4"),
+                    dash_table.DataTable(
+                        id={"type": "event-table", "family": "http_creds"},
+                        columns=[
+                            {"name": i, "id": i}
+                            for i in STORE_FORMATS["http_creds"]["columns"]
+                        ],
+                        **event_table_style,
+                    ),
+                ]
+            )
+        )
+
+        # HTTP URLs Table
+        tables.append(
+            html.Div(
+                [
+                    html.H4(trans["http_reqs"], className="text-center mt-4"),
+                    dash_table.DataTable(
+                        id={"type": "event-table", "family": "http_url"},
+                        columns=[
+                            {"name": i, "id": i}
+                            for i in STORE_FORMATS["http_url"]["columns"]
+                        ],
+                        **event_table_style,
+                    ),
+                ]
             )
+        )
+
+    return tables
+
 
+def create_country_tables(selected_service="all", selected_lang="en", snapshot=None):
+    """Create the country distribution tables of the selected service"""
+    snapshot = snapshot or latest_snapshot()
+    tables = []
+    trans = translations[selected_lang]
+
+    if selected_service in ["all", "ssh"]:
         # Add SSH Country Code Table if enabled
         if country == "True":
             try:
-                ssh_country_df = ip_to_country_code(ssh_creds_log_df)
+                ssh_country_df = snapshot.countries["ssh"]
                 if not ssh_country_df.empty:
                     tables.append(
                         html.Div(
@@ -720,57 +963,10 @@ def create_data_tables(selected_service="all", selected_lang="en"):
                 print(f"Error creating SSH country table: {e}")
 
     if selected_service in ["all", "http"]:
-        # HTTP Login Attempts Table
-        if not http_creds_log_df.empty:
-            sorted_creds_df = http_creds_log_df.sort_values(
-                by="timestamp", ascending=False
-            )
-            tables.append(
-                html.Div(
-                    [
-                        html.H4(trans["http_login"], className="text-center mt-4"),
-                        dash_table.DataTable(
-                            id="http-creds-table",
-                            columns=[
-                                {"name": i, "id": i} for i in sorted_creds_df.columns
-                            ],
-                            data=sorted_creds_df.to_dict("records"),
-                            **table_style,
-                        ),
-                    ]
-                )
-            )
-
-        # HTTP URLs Table
-        if not http_url_log_df.empty:
-            sorted_http_df = http_url_log_df.sort_values(
-                by="timestamp", ascending=False
-            )
-            tables.append(
-                html.Div(
-                    [
-                        html.H4(trans["http_reqs"], className="text-center mt-4"),
-                        dash_table.DataTable(
-                            id="http-urls-table",
-                            columns=[
-                                {"name": i, "id": i} for i in sorted_http_df.columns
-                            ],
-                            data=sorted_http_df.to_dict("records"),
-                            **table_style,
-                        ),
-                    ]
-                )
-            )
-
         # Add HTTP Country Code Table if enabled
         if country == "True":
             try:
-                # Combine both HTTP logs for country code lookup
-                combined_http_df = pd.concat(
-                    [http_url_log_df[["ip_address"]], http_creds_log_df[["ip_address"]]]
-                ).drop_duplicates()
-
-                http_country_df = ip_to_country_code(combined_http_df)
+                http_country_df = snapshot.countries["http"]
                 if not http_country_df.empty:
                     tables.append(
                         html.Div(
@@ -797,21 +993,336 @@ def create_data_tables(selected_service="all", selected_lang="en"):
     return tables
 
 
-def refresh_data():
-    """Refresh data from all log files including rotated ones"""
-    global ssh_creds_log_df, ssh_cmds_log_df, http_url_log_df, http_creds_log_df
+# Graph panels of the dashboard, each updated by its own callback
+STATS_PANELS = {
+    "cards-container": create_unique_cards,
+    "timeline-container": create_attack_timeline,
+    "networks-container": create_top_networks,
+    "graphs-container": create_top_10_graphs,
+}
+
+# Every panel read from the snapshots, the tables of the countries included
+PANELS = {**STATS_PANELS, "country-tables-container": create_country_tables}
 
+
+def refresh_data():
+    """Ingest lines appended to all log files (including rotated ones) since the last refresh"""
     try:
         print("[DEBUG] Refreshing data...")
-        ssh_creds_log_df = parse_creds_audits_log(ssh_creds_log_file_path)
-        ssh_cmds_log_df = parse_cmd_audits_log(ssh_cmds_log_file_path)
-        http_url_log_df = parse_http_url_audits_log(http_url_log_file_path)
-        http_creds_log_df = parse_http_creds_audits_log(http_creds_log_file_path)
-        print("[DEBUG] Data refresh complete")
+        # The four logs are parsed together, in parallel when there is a lot to parse
+        new_events = event_store.ingest_logs(LOG_FILES)
+        print(f"[DEBUG] Data refresh complete, new events: {new_events}")
+        resolved = event_store.backfill_countries()
+        if resolved:
+            print(f"[DEBUG] Added the countries of {resolved} IPs to the rollups")
     except Exception as e:
         print(f"[ERROR] Error refreshing data: {e}")
 
 
+# What a DashboardSnapshot reads from the event store
+DATA_ATTRIBUTES = [
+    "top_10s",
+    "unique_counts",
+    "timelines",
+    "networks",
+    "event_counts",
+    "countries",
+]
+
+
+def read_only(data):
+    """Return dicts (and the dicts in them) as read-only views"""
+    if isinstance(data, dict):
+        return MappingProxyType({key: read_only(value) for key, value in data.items()})
+    return data
+
+
+class DashboardSnapshot:
+    """Everything the dashboard panels show, read from the event store at once.
+
+    Its data is read in one read transaction of the event store, so an ingest
+    committing meanwhile is either entirely in it or not at all. It cannot be
+    changed once built (its dicts are read-only views, and the dataframes in
+    them are never changed either), so the callbacks of every thread read it
+    without locks or copies, and publish_snapshot() replaces it as a whole.
+    """
+
+    def __init__(self, version, time_range="all", published=None):
+        self.version = version
+        # Milliseconds since 1970, the end of the time ranges
+        self.published = published or int(time.time() * 1000)
+        # Events from start to end (see TIME_RANGES), every event when None. The
+        # event store only reads the events of the range, from its event_time
+        # index, and the distinct counts are those of the days of the range.
+        self.time_range = time_range
+        self.start, self.end = time_bounds(time_range, self.published)
+        with event_store.reading():
+            self.read_data()
+        for name in DATA_ATTRIBUTES:
+            setattr(self, name, read_only(getattr(self, name)))
+        self.frozen = True
+
+    def read_data(self):
+        """Read the DATA_ATTRIBUTES from the event store"""
+        bounds = {"start": self.start, "end": self.end}
+        self.top_10s = {
+            (family, column, truncate): event_store.top_10(
+                family, column, truncate=truncate, **bounds
+            )
+            for family, column, truncate in TOP_10_PANELS
+        }
+        self.unique_counts = {
+            service: {
+                key: event_store.distinct_count(sources, **bounds)
+                for key, sources in unique_count_sources(service).items()
+            }
+            for service in SERVICES
+        }
+        self.timelines = {}
+        for service in SERVICES:
+            families = list(service_families(service))
+            self.timelines[service] = event_store.time_series(families, **bounds)[0]
+        self.networks = {
+            service: {
+                level: event_store.top_networks(
+                    list(service_families(service)), level, **bounds
+                )
+                for level in NETWORK_LEVELS
+            }
+            for service in SERVICES
+        }
+        self.event_counts = {
+            family: event_store.count_events(family, **bounds) for family in LOG_FILES
+        }
+        self.countries = {}
+        if country == "True":
+            try:
+                print("[DEBUG] Processing country codes")
+                self.countries = {
+                    "ssh": ip_to_country_code(
+                        event_store.value_counts("ssh_creds", "ip_address", **bounds)
+                    ),
+                    # Combine both HTTP logs for country code lookup
+                    "http": ip_to_country_code(
+                        event_store.distinct_values(
+                            ["http_creds", "http_url"], "ip_address", **bounds
+                        )
+                    ),
+                }
+            except Exception as e:
+                print(f"[ERROR] Failed to process country codes: {e}")
+                self.countries = {
+                    service: pd.DataFrame({"Country_Code": ["Error"], "frequency": [0]})
+                    for service in ["ssh", "http"]
+                }
+
+    def __setattr__(self, name, value):
+        if getattr(self, "frozen", False):
+            raise AttributeError(f"Cannot set {name}, the snapshot is immutable")
+        super().__setattr__(name, value)
+
+    def same_data(self, other):
+        """Return whether another snapshot shows the same data.
+
+        Events are never deleted, so the same event counts mean the same
+        events, only the countries can change while API lookups complete.
+        """
+        return self.event_counts == other.event_counts and all(
+            self.countries.get(service, pd.DataFrame()).equals(
+                other.countries.get(service, pd.DataFrame())
+            )
+            for service in ["ssh", "http"]
+        )
+
+
+# Latest published snapshot. publish_snapshot() replaces it by reference, in
+# one assignment, so a reader gets either the previous or the new snapshot and
+# keeps reading the one it got for the whole callback.
+dashboard_snapshot = None
+snapshot_lock = threading.Lock()
+
+
+def publish_snapshot():
+    """Build a snapshot of the stored data and make it the latest one"""
+    global dashboard_snapshot
+    # Mostly the refresher publishes, the lock keeps the versions increasing
+    # when a snapshot is also built elsewhere (the first request, benchmarks)
+    with snapshot_lock:
+        version = dashboard_snapshot.version + 1 if dashboard_snapshot else 1
+        snapshot = DashboardSnapshot(version)
+        # Unchanged data keeps its version, and the components built from it
+        if dashboard_snapshot is not None and snapshot.same_data(dashboard_snapshot):
+            return dashboard_snapshot
+        dashboard_snapshot = snapshot
+        print(f"[DEBUG] Published dashboard snapshot {version}")
+        return dashboard_snapshot
+
+
+def watched_log_files():
+    """Return the log files (rotated and archived included) the refresher watches"""
+    return [
+        path
+        for log_file in LOG_FILES.values()
+        for path in [*rotated_log_files(log_file), *archived_log_files(log_file)]
+    ]
+
+
+# Number of events of the live feed, the latest ones are pushed after every refresh
+LIVE_FEED_SIZE = int(os.getenv("LIVE_FEED_SIZE", "50"))
+
+# Source address column and details of the live feed events of each family
+LIVE_EVENTS = {
+    "ssh_creds": ("ip_address", "{username} / {password}"),
+    "ssh_cmds": ("Client", "{Command}"),
+    "http_url": ("ip_address", "{method} {url}"),
+    "http_creds": ("ip_address", "{username} / {password}"),
+}
+
+# Messages pushed to the dashboards, see live_events()
+live_feed = LiveFeed()
+# Id of the last event of each family pushed to the live feed
+live_positions = {}
+
+
+def new_live_events():
+    """Return the events count of each family with new events, and (at most
+    LIVE_FEED_SIZE of) these events, since the last call"""
+    counts, events = {}, []
+    for family, (source, details) in LIVE_EVENTS.items():
+        # The feed starts with the events ingested after the first call
+        if family not in live_positions:
+            live_positions[family] = event_store.count_events(family)
+            continue
+        new = event_store.events_since(family, live_positions[family], LIVE_FEED_SIZE)
+        if new.empty:
+            continue
+        live_positions[family] = counts[family] = int(new["id"].iloc[-1])
+        events.extend(
+            {
+                "family": family,
+                "timestamp": row["timestamp"],
+                "ip_address": row[source],
+                "details": details.format(**row),
+            }
+            for row in new.to_dict("records")
+        )
+    events.sort(key=lambda event: str(event["timestamp"]))
+    return counts, events[-LIVE_FEED_SIZE:]
+
+
+def publish_live():
+    """Publish a snapshot, and push its version and the new events to the
+    dashboards when they changed"""
+    previous = dashboard_snapshot
+    snapshot = publish_snapshot()
+    counts, events = new_live_events()
+    message = {"counts": counts, "events": events}
+    if snapshot is not previous:
+        message["version"] = snapshot.version
+    if counts or snapshot is not previous:
+        live_feed.publish(message)
+
+
+# Logs are ingested every REFRESH_INTERVAL seconds, and as soon as a log
+# changes (checked every REFRESH_POLL seconds) or the refresh button is clicked
+refresher = DataRefresher(
+    refresh_data,
+    publish_live,
+    watched=watched_log_files,
+    interval=float(os.getenv("REFRESH_INTERVAL", "30")),
+    poll=float(os.getenv("REFRESH_POLL", "1")),
+)
+
+# Seconds a request waits for the first snapshot before building it itself
+FIRST_SNAPSHOT_WAIT = 10
+
+
+# Graphs and tables built for a (snapshot version, service, language), the most
+# recently used COMPONENT_CACHE_SIZE of them are kept
+component_cache = VersionedCache(int(os.getenv("COMPONENT_CACHE_SIZE", "64")))
+
+
+def plain_figures(component):
+    """Replace the Plotly figures of a component tree with their JSON data.
+
+    Dash encodes plain lists and dicts much faster than Figure objects, which
+    it would convert (and validate) again for every response.
+    """
+    if isinstance(component, (list, tuple)):
+        for child in component:
+            plain_figures(child)
+    elif isinstance(component, dcc.Graph):
+        if isinstance(component.figure, go.Figure):
+            component.figure = json.loads(component.figure.to_json())
+    elif hasattr(component, "children"):
+        plain_figures(component.children)
+    return component
+
+
+def component_key(create, selected_service, selected_lang, snapshot):
+    """Return the component_cache key of create(selected_service, selected_lang,
+    snapshot)"""
+    return (
+        snapshot.version,
+        snapshot.time_range,
+        snapshot.end,
+        create.__name__,
+        selected_service,
+        selected_lang,
+    )
+
+
+def cached_components(create, selected_service, selected_lang, snapshot):
+    """Return create(selected_service, selected_lang, snapshot), built once per
+    snapshot version and time range. The result is shared by every request and
+    never changed."""
+    return component_cache.get(
+        component_key(create, selected_service, selected_lang, snapshot),
+        lambda: plain_figures(create(selected_service, selected_lang, snapshot)),
+    )
+
+
+def cached_digest(create, selected_service, selected_lang, snapshot):
+    """Return a digest of the JSON the browser receives for cached_components(),
+    which tells whether a panel shows them already"""
+
+    def digest():
+        components = cached_components(
+            create, selected_service, selected_lang, snapshot
+        )
+        text = json.dumps(components, cls=PlotlyJSONEncoder, sort_keys=True)
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    return component_cache.get(
+        (*component_key(create, selected_service, selected_lang, snapshot), "digest"),
+        digest,
+    )
+
+
+def latest_snapshot():
+    """Return the latest snapshot, starting the refresher on first use"""
+    refresher.start()
+    refresher.published.wait(FIRST_SNAPSHOT_WAIT)
+    return dashboard_snapshot or publish_snapshot()
+
+
+# Snapshots of the time ranges of the recent versions, built on first use
+snapshot_windows = VersionedCache(2 * len(TIME_RANGES))
+
+
+def windowed_snapshot(snapshot, time_range, end=None):
+    """Return the snapshot of the events of a time range (see TIME_RANGES) of
+    the data of snapshot, ending at end (window_end() by default). Unchanged
+    data keeps its snapshot version, the window still moves with the clock."""
+    if TIME_RANGES.get(time_range) is None:
+        return snapshot
+    end = window_end() if end is None else end
+    return snapshot_windows.get(
+        (snapshot.version, time_range, end),
+        lambda: DashboardSnapshot(snapshot.version, time_range, end),
+    )
+
+
 # Get default translations
 default_trans = translations["EN"]
 
@@ -913,11 +1424,16 @@ app.index_string = """
 # Define web application layout.
 app.layout = dbc.Container(
     [
-        dcc.Interval(
-            id="interval-component",
-            interval=30 * 1000,  # Changed to 30 seconds from 10 seconds
-            n_intervals=0,
-        ),
+        # Version of the snapshot the panels show, pushed by the server along
+        # with the live feed messages, see assets/live_feed.js
+        dcc.Store(id="snapshot-version"),
+        # Digest of what each panel shows, see cached_digest()
+        *[dcc.Store(id=f"{panel}-digest") for panel in PANELS],
+        # Moves the time ranges forward while the data is unchanged
+        dcc.Interval(id="window-step", interval=WINDOW_STEP * 1000),
+        dcc.Store(id="live-message"),
+        # Translated service name of each family, for the live feed
+        dcc.Store(id="live-services"),
         # Honeypot Title and Logo
         dbc.Row(
             dbc.Col(
@@ -966,6 +1482,20 @@ app.layout = dbc.Container(
                                 "marginRight": "10px",
                             },
                         ),
+                        dcc.Dropdown(
+                            id="time-range",
+                            options=time_range_options,
+                            value="all",
+                            clearable=False,
+                            style={
+                                "backgroundColor": "#b58900",
+                                "color": "grey",
+                                "borderRadius": "8px",
+                                "width": "200px",
+                                "display": "inline-block",
+                                "marginRight": "10px",
+                            },
+                        ),
                         dbc.Button(
                             default_trans["refresh_button"],
                             id="refresh-button",
@@ -984,18 +1514,55 @@ app.layout = dbc.Container(
             ),
             className="mb-4",
         ),
-        # Loading container for graphs with skeleton state
+        # Live events, appended as they are pushed
+        html.H3(
+            id="live-title",
+            style={
+                "textAlign": "center",
+                "font-family": "Consolas, sans-serif",
+                "font-weight": "bold",
+            },
+        ),
         dbc.Row(
-            id="skeleton-graphs",
-            children=[
-                dbc.Col(create_skeleton_graph(), width=6),
-                dbc.Col(create_skeleton_graph(), width=6),
-                dbc.Col(create_skeleton_graph(), width=6),
-                dbc.Col(create_skeleton_graph(), width=6),
-            ],
+            [
+                dbc.Col(
+                    dbc.Card(
+                        dbc.CardBody(
+                            [
+                                html.H6(
+                                    id=f"live-label-{family}", className="card-title"
+                                ),
+                                html.H3("-", id=f"live-count-{family}"),
+                            ]
+                        ),
+                        className="text-center mb-4",
+                    ),
+                    width=3,
+                )
+                for family in LIVE_EVENTS
+            ]
+        ),
+        html.Div(
+            dash_table.DataTable(
+                id="live-feed",
+                data=[],
+                **{**table_style, "page_size": LIVE_FEED_SIZE},
+            ),
+            className="dbc mb-4",
         ),
-        # Dynamic Graphs Section
-        dbc.Row(id="graphs-container", align="center", class_name="mb-4"),
+        # Graph panels, each loaded by its own callback
+        *[
+            dcc.Loading(
+                dbc.Row(
+                    id=panel,
+                    children=dbc.Col(create_skeleton_graph(), width=12),
+                    align="center",
+                    class_name="mb-4",
+                ),
+                type="dot",
+            )
+            for panel in STATS_PANELS
+        ],
         # Intelligence Data Section
         html.Div(
             [
@@ -1009,74 +1576,285 @@ app.layout = dbc.Container(
                 ),
             ]
         ),
-        # Loading container for tables with skeleton state
-        html.Div(
-            id="skeleton-tables",
-            children=[
-                create_skeleton_table(),
-                create_skeleton_table(),
-            ],
-        ),
         # Data Tables Section
-        html.Div(id="tables-container", className="dbc"),
+        dcc.Loading(
+            html.Div(
+                id="tables-container",
+                children=[create_skeleton_table(), create_skeleton_table()],
+                className="dbc",
+            ),
+            type="dot",
+        ),
+        html.Div(id="country-tables-container", className="dbc"),
+    ]
+)
+
+
+# Family names of the live feed, with their locale key
+LIVE_SERVICES = {
+    family: key
+    for service_families in SERVICE_FAMILIES.values()
+    for family, key in service_families.items()
+}
+
+
+@app.callback(
+    Output("intelligence-title", "children"),
+    Output("refresh-button", "children"),
+    Output("service-selector", "options"),
+    Output("time-range", "options"),
+    Output("live-title", "children"),
+    Output("live-services", "data"),
+    Output("live-feed", "columns"),
+    *[Output(f"live-label-{family}", "children") for family in LIVE_EVENTS],
+    Input("language-selector", "value"),
+)
+def update_labels(selected_lang):
+    """Translate the titles, the refresh button, the service and time range
+    options and the live feed labels"""
+    trans = translations[selected_lang]
+    service_opts = [
+        {"label": trans["services"][opt["value"]], "value": opt["value"]}
+        for opt in service_options
     ]
+    time_range_opts = [
+        {"label": trans["time_ranges"][time_range], "value": time_range}
+        for time_range in TIME_RANGES
+    ]
+    live_services = {family: trans[key] for family, key in LIVE_SERVICES.items()}
+    live_columns = [
+        {"name": trans["table"][column], "id": column}
+        for column in ["timestamp", "service", "ip_address", "details"]
+    ]
+    return (
+        trans["title"],
+        trans["refresh_button"],
+        service_opts,
+        time_range_opts,
+        trans["live_feed"],
+        live_services,
+        live_columns,
+        *[live_services[family] for family in LIVE_EVENTS],
+    )
+
+
+@app.callback(Input("refresh-button", "n_clicks"), prevent_initial_call=True)
+def request_refresh(n_clicks):
+    """Ask for the logs to be ingested now, the new snapshot is pushed"""
+    refresher.request()
+
+
+# Applies a pushed message in the browser: appends its events to the live feed
+# (keeping its page_size latest ones), sets the counters of the families with
+# new events and the snapshot version, which updates the panels when it changed
+app.clientside_callback(
+    """
+    function (message, rows, size, services, version) {
+        const noUpdate = window.dash_clientside.no_update;
+        const families = %s;
+        if (!message) {
+            return [noUpdate, noUpdate, ...families.map(() => noUpdate)];
+        }
+        const added = message.events.map((event) => ({
+            timestamp: event.timestamp,
+            service: (services || {})[event.family] || event.family,
+            ip_address: event.ip_address,
+            details: event.details,
+        }));
+        const counts = families.map((family) =>
+            family in message.counts
+                ? message.counts[family].toLocaleString("en-US")
+                : noUpdate
+        );
+        return [
+            added.length ? added.reverse().concat(rows || []).slice(0, size) : noUpdate,
+            message.version && message.version !== version ? message.version : noUpdate,
+            ...counts,
+        ];
+    }
+    """ % json.dumps(list(LIVE_EVENTS)),
+    Output("live-feed", "data"),
+    Output("snapshot-version", "data"),
+    *[Output(f"live-count-{family}", "children") for family in LIVE_EVENTS],
+    Input("live-message", "data"),
+    State("live-feed", "data"),
+    State("live-feed", "page_size"),
+    State("live-services", "data"),
+    State("snapshot-version", "data"),
+)
+
+
+@app.server.route(app.config.routes_pathname_prefix + "live")
+def live_events():
+    """Stream the live feed messages as server-sent events.
+
+    The stream starts with the current event counts and snapshot version,
+    then the messages after the Last-Event-ID of a reconnecting browser, or
+    the next ones.
+    """
+    last_id = request.headers.get("Last-Event-ID", "")
+    last_id = int(last_id) if last_id.isdigit() else live_feed.last_id
+    current = {
+        "counts": {family: event_store.count_events(family) for family in LIVE_EVENTS},
+        "events": [],
+        "version": latest_snapshot().version,
+    }
+
+    def stream():
+        yield f"data: {json.dumps(current)}\n\n"
+        yield from live_feed.stream(last_id)
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        # Sent as they are written, neither cached nor buffered by proxies
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def register_panel(container, create):
+    """Update container with create(service, language, snapshot) whenever one
+    of them or the time range changes, or the time range moves on, independently
+    of the other panels"""
+
+    @app.callback(
+        Output(container, "children"),
+        Output(f"{container}-digest", "data"),
+        Input("service-selector", "value"),
+        Input("language-selector", "value"),
+        Input("snapshot-version", "data"),
+        Input("time-range", "value"),
+        Input("window-step", "n_intervals"),
+        State(f"{container}-digest", "data"),
+    )
+    def update_panel(selected_service, selected_lang, version, time_range, step, shown):
+        if ctx.triggered_id == "window-step" and TIME_RANGES.get(time_range) is None:
+            return no_update, no_update
+        try:
+            snapshot = windowed_snapshot(latest_snapshot(), time_range)
+            # A snapshot changing other panels only leaves this one as it is
+            digest = cached_digest(create, selected_service, selected_lang, snapshot)
+            if digest == shown:
+                return no_update, no_update
+            components = cached_components(
+                create, selected_service, selected_lang, snapshot
+            )
+            return components, digest
+        except Exception as e:
+            print(f"[ERROR] Updating {container} failed: {e}")
+            return [], None
+
+    return update_panel
+
+
+# Callback of each panel, by container
+panel_callbacks = {
+    container: register_panel(container, create) for container, create in PANELS.items()
+}
+
+
+@app.callback(
+    Output("tables-container", "children"),
+    Input("service-selector", "value"),
+    Input("language-selector", "value"),
+    Input("time-range", "value"),
 )
+def update_tables(selected_service, selected_lang, time_range):
+    """Create the event tables again, from their first page, when the service,
+    the language or the time range changes. New snapshots only refresh their
+    page, see page_event_table()"""
+    try:
+        return create_data_tables(selected_service, selected_lang)
+    except Exception as e:
+        print(f"[ERROR] Updating tables-container failed: {e}")
+        return []
+
+
+# Operators of the DataTable filter syntax (the case sensitive "s" and
+# insensitive "i" variants included), with their FILTER_OPERATORS name
+TABLE_FILTER_OPERATORS = {
+    **dict.fromkeys(["=", "eq"], "="),
+    **dict.fromkeys(["!=", "ne"], "!="),
+    **dict.fromkeys(["<", "lt"], "<"),
+    **dict.fromkeys(["<=", "le"], "<="),
+    **dict.fromkeys([">", "gt"], ">"),
+    **dict.fromkeys([">=", "ge"], ">="),
+    "contains": "contains",
+    "datestartswith": "datestartswith",
+}
+FILTER_PART = re.compile(r"^\s*\{([^}]+)\}\s+([si]?)(\S+)\s+(.*?)\s*$")
+
+
+def split_filter_part(filter_part):
+    """Split a DataTable filter expression into (column, operator, value), None
+    if its operator is not supported"""
+    match = FILTER_PART.match(filter_part)
+    if match is None:
+        return None
+    column, _, operator, value = match.groups()
+    if operator not in TABLE_FILTER_OPERATORS:
+        return None
+    if len(value) > 1 and value[0] == value[-1] and value[0] in "'\"`":
+        value = value[1:-1].replace("\\" + value[0], value[0])
+    return column, TABLE_FILTER_OPERATORS[operator], value
+
+
+def parse_filter_query(filter_query):
+    """Return the (column, operator, value) filters of a DataTable filter_query"""
+    filters = []
+    for filter_part in (filter_query or "").split(" && "):
+        if filter_part.strip():
+            parsed = split_filter_part(filter_part)
+            if parsed is not None:
+                filters.append(parsed)
+    return filters
 
 
 @app.callback(
     [
-        Output("graphs-container", "children"),
-        Output("tables-container", "children"),
-        Output("intelligence-title", "children"),
-        Output("refresh-button", "children"),
-        Output("service-selector", "options"),
-        Output("skeleton-graphs", "style"),
-        Output("skeleton-tables", "style"),
+        Output({"type": "event-table", "family": MATCH}, "data"),
+        Output({"type": "event-table", "family": MATCH}, "page_count"),
+    ],
+    [
+        Input({"type": "event-table", "family": MATCH}, "page_current"),
+        Input({"type": "event-table", "family": MATCH}, "page_size"),
+        Input({"type": "event-table", "family": MATCH}, "sort_by"),
+        Input({"type": "event-table", "family": MATCH}, "filter_query"),
+        Input("snapshot-version", "data"),
+        Input("window-step", "n_intervals"),
+    ],
+    [
+        State({"type": "event-table", "family": MATCH}, "id"),
+        State("time-range", "value"),
     ],
-    [Input("refresh-button", "n_clicks"), Input("language-selector", "value")],
-    [State("service-selector", "value")],
 )
-def update_dashboard(n_clicks, selected_lang, selected_service):
-    """Update dashboard with manual refresh and localization"""
+def page_event_table(
+    page_current, page_size, sort_by, filter_query, version, step, table_id, time_range
+):
+    """Query the page of an event table the browser shows, sorted and filtered,
+    again when a new snapshot is published or the time range moves on"""
+    if ctx.triggered_id == "window-step" and TIME_RANGES.get(time_range) is None:
+        return no_update, no_update
+    page_current = page_current or 0
+    # The range of the panels
+    start, end = time_bounds(time_range, window_end())
     try:
-        print("[DEBUG] Refreshing data...")
-        refresh_data()  # Refresh data from all log files
-        # Add artificial delay to show loading state
-        time.sleep(0.5)
-
-        trans = translations[selected_lang]
-        service_opts = [
-            {"label": trans["services"][opt["value"]], "value": opt["value"]}
-            for opt in service_options
-        ]
-
-        graphs = create_service_stats(selected_service, selected_lang)
-        tables = create_data_tables(selected_service, selected_lang)
-
-        print("[DEBUG] Dashboard update completed successfully")
-        return (
-            graphs,
-            tables,
-            trans["title"],
-            trans["refresh_button"],
-            service_opts,
-            {"display": "none"},  # Hide skeleton graphs
-            {"display": "none"},  # Hide skeleton tables
-        )
-    except Exception as e:
-        print(f"[ERROR] Dashboard update failed: {e}")
-        import traceback
-
-        print(traceback.format_exc())
-        return (
-            [],
-            [],
-            translations["EN"]["title"],
-            translations["EN"]["refresh_button"],
-            service_options,
-            {"display": "none"},
-            {"display": "none"},
+        page, total = event_store.query_events(
+            table_id["family"],
+            page_current * page_size,
+            page_size,
+            sort_by=[
+                (sort["column_id"], sort["direction"] == "asc")
+                for sort in sort_by or []
+            ],
+            filters=parse_filter_query(filter_query),
+            start=start,
+            end=end,
         )
+    except (ValueError, sqlite3.Error) as e:
+        print(f"[ERROR] Failed to query the {table_id['family']} table: {e}")
+        return [], 1
+    return page.to_dict("records"), max(-(-total // page_size), 1)
 
 
 if __name__ == "__main__":